@@ -1,8 +1,9 @@
+from copy import copy as _copy
 from inspect import isclass
 from hearthstone.enums import CardType, Mulligan, PlayState, Zone
 from .dsl import LazyValue, Selector
 from .entity import Entity
-from .logging import log
+from .logging import TraceRecord, log
 from .exceptions import InvalidAction
 
 
@@ -51,6 +52,7 @@ class EventListener:
 
 class Action:  # Lawsuit
 	ARGS = ()
+	_matcher = None
 
 	def __init__(self, *args, **kwargs):
 		self._args = args
@@ -84,15 +86,23 @@ class Action:  # Lawsuit
 			if event.at != at:
 				continue
 			if isinstance(event.trigger, self.__class__) and event.trigger.matches(entity, args):
-				log.info("%r triggers off %r from %r", entity, self, source)
+				source.game.log("%r triggers off %r from %r", entity, self, source)
 				entity.trigger_event(source, event, args)
 
 	def broadcast(self, source, at, *args):
-		for entity in source.game.entities:
-			self._broadcast(entity, source, at, *args)
-
-		for entity in source.game.hands:
-			self._broadcast(entity, source, at, *args)
+		game = source.game
+		registry = game.registry
+		for view in ("entities", "hands"):
+			entities = getattr(game, view)
+			version = registry.version
+			# Only visit the entities listening to this action
+			for i in registry.listeners(view, self.__class__, at):
+				self._broadcast(entities[i], source, at, *args)
+				if registry.version != version:
+					# The listeners may have changed: check every entity left
+					for entity in entities[i + 1:]:
+						self._broadcast(entity, source, at, *args)
+					break
 
 	def queue_broadcast(self, obj, args):
 		self.event_queue.append((obj, args))
@@ -105,19 +115,71 @@ class Action:  # Lawsuit
 	def get_args(self, source):
 		return self._args
 
+	def record(self, source, targets):
+		"""
+		Write a TraceRecord of the action targeting the entities found in
+		\a targets to the trace sink of the source's game
+		"""
+		game = source.game
+		targets = tuple(target.entity_id for target in targets if isinstance(target, Entity))
+		game.trace.record(TraceRecord(game.tick, self.__class__.__name__, source.entity_id, targets))
+
 	def matches(self, source, args):
-		for arg, match in zip(args, self._args):
-			if match is None:
-				# Allow matching Action(None, None, z) to Action(x, y, z)
-				continue
-			if arg is None:
-				# We got an arg of None and a match not None. Bad.
-				return False
-			# this stuff is stupidslow
-			res = match.eval([arg], source)
-			if not res or res[0] is not arg:
-				return False
-		return True
+		"""
+		Whether the arguments \a args of a broadcast action match the
+		arguments of this action, as an event trigger of \a source
+		"""
+		if self._matcher is None:
+			self._matcher = self.compile_matcher()
+		return self._matcher(source, args)
+
+	def compile_matcher(self):
+		"""
+		Compile the arguments of the action into a function matching the
+		arguments of broadcasts (see matches()). An argument of None
+		matches anything; other arguments are selectors, which must select
+		the broadcast argument (see Selector.matcher()).
+		"""
+		checks = [
+			(i, match) for i, match in enumerate(self._args) if match is not None
+		]
+		# Identity checks (eg. SELF) are the cheapest and most selective
+		checks.sort(key=lambda check: not getattr(check[1], "identity", False))
+		checks = tuple((i, _arg_matcher(match)) for i, match in checks)
+
+		if not checks:
+			return lambda source, args: True
+
+		if len(checks) == 1:
+			(index, check), = checks
+
+			def matches(source, args):
+				if index >= len(args):
+					return True
+				arg = args[index]
+				return arg is not None and check(arg, source)
+			return matches
+
+		def matches(source, args):
+			count = len(args)
+			for index, check in checks:
+				if index >= count:
+					continue
+				arg = args[index]
+				if arg is None or not check(arg, source):
+					return False
+			return True
+		return matches
+
+
+def _arg_matcher(match):
+	if isinstance(match, Selector):
+		return match.matcher()
+
+	def check(arg, source):
+		res = match.eval([arg], source)
+		return bool(res) and res[0] is arg
+	return check
 
 
 class ActionArg(LazyValue):
@@ -135,19 +197,23 @@ class ActionArg(LazyValue):
 	def evaluate(self, source):
 		# This is used when an event listener triggers and the callback
 		# Action has arguments of the type Action.FOO
-		# XXX we rely on source.event_args to be set, but it's very racey.
-		# If multiple events happen on an entity at once, stuff will go wrong.
-		assert source.event_args
-		return source.event_args[self.index]
+		event_args = source.game.get_event_args(source)
+		assert event_args
+		return event_args[self.index]
 
 
 class GameAction(Action):
 	def trigger(self, source):
+		self._trigger(source)
+		source.game.process_deaths()
+
+	def _trigger(self, source):
 		args = self.get_args(source)
+		if source.game.trace is not None:
+			self.record(source, args)
 		source.game.manager.action(self, source, *args)
 		self.do(source, *args)
 		source.game.manager.action_end(self, source, *args)
-		source.game.process_deaths()
 
 
 class Attack(GameAction):
@@ -165,14 +231,14 @@ class Attack(GameAction):
 		defender.defending = True
 		source.game.proposed_attacker = attacker
 		source.game.proposed_defender = defender
-		log.info("%r attacks %r", attacker, defender)
+		source.game.log("%r attacks %r", attacker, defender)
 		self.broadcast(source, EventListener.ON, attacker, defender)
 
 		defender = source.game.proposed_defender
 		source.game.proposed_attacker = None
 		source.game.proposed_defender = None
 		if attacker.should_exit_combat:
-			log.info("Attack has been interrupted.")
+			source.game.log("Attack has been interrupted.")
 			attacker.attack_target = None
 			defender.defending = False
 			return
@@ -229,7 +295,7 @@ class Death(GameAction):
 	ARGS = ("ENTITY", )
 
 	def do(self, source, target):
-		log.info("Processing Death for %r", target)
+		source.game.log("Processing Death for %r", target)
 		self.broadcast(source, EventListener.ON, target)
 		if target.deathrattles:
 			source.game.queue_actions(source, [Deathrattle(target)])
@@ -262,7 +328,7 @@ class Joust(GameAction):
 		return challenger and challenger[0], defender and defender[0]
 
 	def do(self, source, challenger, defender):
-		log.info("Jousting %r vs %r", challenger, defender)
+		source.game.log("Jousting %r vs %r", challenger, defender)
 		for action in self.callback:
 			log.debug("%r joust callback: %r", self, action)
 			source.game.queue_actions(source, [action], event_args=[challenger, defender])
@@ -341,7 +407,7 @@ class Play(GameAction):
 		return (source, ) + super().get_args(source)
 
 	def do(self, source, player, card, target, index, choose):
-		log.info("%s plays %r (target=%r, index=%r)", player, card, target, index)
+		source.game.log("%s plays %r (target=%r, index=%r)", player, card, target, index)
 
 		player.pay_mana(card.cost)
 
@@ -417,9 +483,9 @@ class Overload(GameAction):
 
 	def do(self, source, player, amount):
 		if player.cant_overload:
-			log.info("%r cannot overload %s", source, player)
+			source.game.log("%r cannot overload %s", source, player)
 			return
-		log.info("%r overloads %s for %i", source, player, amount)
+		source.game.log("%r overloads %s for %i", source, player, amount)
 		self.broadcast(source, EventListener.ON, player, amount)
 		player.overloaded += amount
 
@@ -475,6 +541,13 @@ class TargetedAction(Action):
 		return ret
 
 	def trigger(self, source):
+		# Actions defined in card scripts are shared between every game.
+		# Keep the per-call state (trigger_index, event_queue) on a copy.
+		action = _copy(self)
+		action.event_queue = []
+		return action._trigger(source)
+
+	def _trigger(self, source):
 		ret = []
 
 		if self.source is not None:
@@ -493,14 +566,19 @@ class TargetedAction(Action):
 			args = self.get_args(source)
 			targets = self.get_targets(source, args[0])
 			args = args[1:]
-			source.game.manager.action(self, source, targets, *args)
-			log.info("%r triggering %r targeting %r", source, self, targets)
+			game = source.game
+			if game.trace is not None:
+				self.record(source, targets)
+			game.manager.action(self, source, targets, *args)
+			if game.verbose:
+				log.info("%r triggering %r targeting %r", source, self, targets)
 			for target in targets:
 				target_args = self.get_target_args(source, target)
 				ret.append(self.do(source, target, *target_args))
 
 				for action in self.callback:
-					log.info("%r queues up callback %r", self, action)
+					if game.verbose:
+						log.info("%r queues up callback %r", self, action)
 					ret += source.game.queue_actions(source, [action], event_args=[target] + target_args)
 
 			source.game.manager.action_end(self, source, targets, *self._args)
@@ -520,7 +598,7 @@ class Buff(TargetedAction):
 
 	def get_target_args(self, source, target):
 		buff = self._args[1]
-		buff = source.controller.card(buff)
+		buff = source.controller.enchantment(buff)
 		buff.source = source
 		return [buff]
 
@@ -539,10 +617,10 @@ class Bounce(TargetedAction):
 	"""
 	def do(self, source, target):
 		if len(target.controller.hand) >= target.controller.max_hand_size:
-			log.info("%r is bounced to a full hand and gets destroyed", target)
+			source.game.log("%r is bounced to a full hand and gets destroyed", target)
 			return source.game.queue_actions(source, [Destroy(target)])
 		else:
-			log.info("%r is bounced back to %s's hand", target, target.controller)
+			source.game.log("%r is bounced back to %s's hand", target, target.controller)
 			target.zone = Zone.HAND
 
 
@@ -555,6 +633,7 @@ class CopyDeathrattles(TargetedAction):
 	def do(self, source, target, entities):
 		for entity in entities:
 			for deathrattle in entity.deathrattles:
+				target.touch("additional_deathrattles")
 				target.additional_deathrattles.append(deathrattle)
 
 
@@ -615,7 +694,7 @@ class Deathrattle(TargetedAction):
 			source.game.queue_actions(target, actions)
 
 			if target.controller.extra_deathrattles:
-				log.info("Triggering deathrattles for %r again", target)
+				source.game.log("Triggering deathrattles for %r again", target)
 				source.game.queue_actions(target, actions)
 
 
@@ -638,14 +717,14 @@ class Battlecry(TargetedAction):
 		player = card.controller
 
 		if card.has_target() and not target:
-			log.info("%r has no target, action exits early", card)
+			source.game.log("%r has no target, action exits early", card)
 			return
 
 		if card.has_combo and player.combo:
-			log.info("Activating %r combo targeting %r", card, target)
+			source.game.log("Activating %r combo targeting %r", card, target)
 			actions = card.get_actions("combo")
 		else:
-			log.info("Activating %r action targeting %r", card, target)
+			source.game.log("Activating %r action targeting %r", card, target)
 			actions = card.get_actions("play")
 
 		if actions:
@@ -690,7 +769,7 @@ class Discover(TargetedAction):
 		return [[target.card(card) for card in cards]]
 
 	def do(self, source, target, cards):
-		log.info("%r discovers %r for %s", source, cards, target)
+		source.game.log("%r discovers %r for %s", source, cards, target)
 		source.game.queue_actions(source, [GenericChoice(target, cards)])
 
 
@@ -725,10 +804,10 @@ class Fatigue(TargetedAction):
 
 	def do(self, source, target):
 		if target.cant_fatigue:
-			log.info("%s can't fatigue and does not take damage", target)
+			source.game.log("%s can't fatigue and does not take damage", target)
 			return
 		target.fatigue_counter += 1
-		log.info("%s takes %i fatigue damage", target, target.fatigue_counter)
+		source.game.log("%s takes %i fatigue damage", target, target.fatigue_counter)
 		return source.game.queue_actions(source, [Hit(target.hero, target.fatigue_counter)])
 
 
@@ -799,14 +878,14 @@ class Give(TargetedAction):
 	ARGS = ("TARGET", "CARD")
 
 	def do(self, source, target, cards):
-		log.info("Giving %r to %s", cards, target)
+		source.game.log("Giving %r to %s", cards, target)
 		ret = []
 		if not hasattr(cards, "__iter__"):
 			# Support Give on multiple cards at once (eg. Echo of Medivh)
 			cards = [cards]
 		for card in cards:
 			if len(target.hand) >= target.max_hand_size:
-				log.info("Give(%r) fails because %r's hand is full", card, target)
+				source.game.log("Give(%r) fails because %r's hand is full", card, target)
 				continue
 			card.controller = target
 			card.zone = Zone.HAND
@@ -842,7 +921,7 @@ class Heal(TargetedAction):
 		amount = min(amount, target.damage)
 		if amount:
 			# Undamaged targets do not receive heals
-			log.info("%r heals %r for %i", source, target, amount)
+			source.game.log("%r heals %r for %i", source, target, amount)
 			target.damage -= amount
 			self.queue_broadcast(self, (source, EventListener.ON, target, amount))
 
@@ -881,7 +960,7 @@ class Morph(TargetedAction):
 		return [card]
 
 	def do(self, source, target, card):
-		log.info("Morphing %r into %r", target, card)
+		source.game.log("Morphing %r into %r", target, card)
 		target.clear_buffs()
 		target_zone = target.zone
 		target.zone = Zone.SETASIDE
@@ -911,11 +990,11 @@ class Retarget(TargetedAction):
 		assert len(new_target) == 1
 		new_target = new_target[0]
 		if target.type in (CardType.HERO, CardType.MINION) and target.attacking:
-			log.info("Retargeting %r's attack to %r", target, new_target)
+			source.game.log("Retargeting %r's attack to %r", target, new_target)
 			source.game.proposed_defender.defending = False
 			source.game.proposed_defender = new_target
 		else:
-			log.info("Retargeting %r from %r to %r", target, target.target, new_target)
+			source.game.log("Retargeting %r from %r to %r", target, target.target, new_target)
 			target.target = new_target
 
 		return new_target
@@ -926,7 +1005,7 @@ class Reveal(TargetedAction):
 	Reveal secret targets.
 	"""
 	def do(self, source, target):
-		log.info("Revealing secret %r", target)
+		source.game.log("Revealing secret %r", target)
 		self.broadcast(source, EventListener.ON, target)
 		target.zone = Zone.GRAVEYARD
 
@@ -938,7 +1017,7 @@ class SetCurrentHealth(TargetedAction):
 	ARGS = ("TARGET", "AMOUNT")
 
 	def do(self, source, target, amount):
-		log.info("Setting current health on %r to %i", target, amount)
+		source.game.log("Setting current health on %r to %i", target, amount)
 		maxhp = target.max_health
 		target.damage = max(0, maxhp - amount)
 
@@ -974,7 +1053,7 @@ class Silence(TargetedAction):
 	Silence minion targets.
 	"""
 	def do(self, source, target):
-		log.info("Silencing %r", self)
+		source.game.log("Silencing %r", self)
 		self.broadcast(source, EventListener.ON, target)
 
 		target.clear_buffs()
@@ -984,6 +1063,7 @@ class Silence(TargetedAction):
 
 		# Wipe the event listeners
 		target._events = []
+		target.game.registry.invalidate()
 		target.silenced = True
 
 
@@ -1001,7 +1081,7 @@ class Summon(TargetedAction):
 		return super()._broadcast(entity, source, at, *args)
 
 	def do(self, source, target, cards):
-		log.info("%s summons %r", target, cards)
+		source.game.log("%s summons %r", target, cards)
 		if not isinstance(cards, list):
 			cards = [cards]
 
@@ -1028,7 +1108,7 @@ class Shuffle(TargetedAction):
 	ARGS = ("TARGET", "CARD")
 
 	def do(self, source, target, cards):
-		log.info("%r shuffles into %s's deck", cards, target)
+		source.game.log("%r shuffles into %s's deck", cards, target)
 		if not isinstance(cards, list):
 			cards = [cards]
 
@@ -1068,9 +1148,9 @@ class SwapHealth(TargetedAction):
 
 	def do(self, source, target, other, buff):
 		other = other[0]
-		buff1 = source.controller.card(buff)
+		buff1 = source.controller.enchantment(buff)
 		buff1.health = other.health
-		buff2 = source.controller.card(buff)
+		buff2 = source.controller.enchantment(buff)
 		buff2.health = target.health
 		buff1.apply(target)
 		buff2.apply(other)
@@ -1095,7 +1175,7 @@ class Steal(TargetedAction):
 		return [controller]
 
 	def do(self, source, target, controller):
-		log.info("%s takes control of %r", controller, target)
+		source.game.log("%s takes control of %r", controller, target)
 		zone = target.zone
 		target.zone = Zone.SETASIDE
 		target.controller = controller
@@ -1108,7 +1188,7 @@ class UnlockOverload(TargetedAction):
 	Unlock the target player's overload, both current and owed.
 	"""
 	def do(self, source, target):
-		log.info("%s overload gets cleared", target)
+		source.game.log("%s overload gets cleared", target)
 		target.overloaded = 0
 		target.overload_locked = 0
 
@@ -1,4 +1,3 @@
-from .logging import log
 from .managers import CardManager
 
 
@@ -12,11 +11,16 @@ class AuraBuff:
 		return "<AuraBuff %r -> %r>" % (self.source, self.entity)
 
 	def update_tags(self, tags):
+		journal = self.entity._journal
+		if journal is not None:
+			journal.save_object(self)
 		self.tags.update(tags)
 		self.tick = self.source.game.tick
+		self.entity.touch("slots")
 
 	def destroy(self):
-		log.info("Destroying %r", self)
+		self.source.log("Destroying %r", self)
+		self.entity.touch("slots")
 		self.entity.slots.remove(self)
 		self.source.game.active_aura_buffs.remove(self)
 
@@ -36,9 +40,34 @@ class Refresh:
 		self.tags = tags
 		self.buff = buff
 		self.priority = priority
+		self._structural = None
+
+	@property
+	def structural(self):
+		"""
+		Whether the refresh always has the same effect until the game's
+		EntityRegistry is invalidated: its selector is structural and its
+		tags are constants (callables are only evaluated when read).
+		"""
+		if self._structural is None:
+			self._structural = self.selector.is_structural() and all(
+				isinstance(value, int) or callable(value) for value in (self.tags or {}).values()
+			)
+		return self._structural
+
+	def get_targets(self, source):
+		if not self.structural:
+			return self.selector.eval(source.game, source)
+		views = source.game.registry.views
+		# Cards compare equal by id: key on the source's identity
+		key = (self, id(source))
+		cached = views.get(key)
+		if cached is None or cached[0] is not source:
+			cached = views[key] = (source, self.selector.eval(source.game, source))
+		return cached[1]
 
 	def trigger(self, source):
-		entities = self.selector.eval(source.game, source)
+		entities = self.get_targets(source)
 		for entity in entities:
 			if self.buff:
 				entity.refresh_buff(source, self.buff)
@@ -57,29 +86,49 @@ class Refresh:
 
 class TargetableByAuras:
 	def refresh_buff(self, source, id):
-		for slot in self.slots[:]:
-			if slot.source is source:
-				self.slots.remove(slot)
-				self.slots.append(slot)
-				slot.tick = source.game.tick
+		game = source.game
+		for buff in self.buffs:
+			# Keep the buff applied by this aura on the previous refresh
+			if buff.source is source and buff.id == id and buff.tick is not None and buff.tick < game.tick:
 				break
 		else:
-			log.info("Aura from %r buffs %r with %r", source, self, id)
+			source.log("Aura from %r buffs %r with %r", source, self, id)
 			buff = source.buff(self, id)
-			buff.tick = source.game.tick
-			source.game.active_aura_buffs.append(buff)
+			game.active_aura_buffs.append(buff)
+		buff.tick = game.tick
+		game.refreshed_auras.append((self, buff))
 
 	def refresh_tags(self, source, tags):
-		for slot in self.slots[:]:
+		for slot in self.slots:
 			if slot.source is source:
 				slot.update_tags(tags)
-				# Move the buff position at the end again
-				self.slots.remove(slot)
-				self.slots.append(slot)
 				break
 		else:
-			buff = AuraBuff(source, self)
-			log.info("Creating %r", buff)
-			buff.update_tags(tags)
-			self.slots.append(buff)
-			source.game.active_aura_buffs.append(buff)
+			slot = AuraBuff(source, self)
+			source.log("Creating %r", slot)
+			slot.update_tags(tags)
+			self.touch("slots")
+			self.slots.append(slot)
+			source.game.active_aura_buffs.append(slot)
+		source.game.refreshed_auras.append((self, slot))
+
+	def sort_auras(self, order, tick):
+		"""
+		Move the buffs and aura slots refreshed at \a tick at the end of
+		their lists, sorted by \a order (a dict of positions by id()).
+		Auras keep their buffs from one refresh to the next; this orders
+		them as if each aura had removed and reapplied its buff.
+		"""
+		for attr in ("buffs", "slots"):
+			items = getattr(self, attr)
+			fresh = [item for item in items if item.tick == tick]
+			if not fresh:
+				continue
+			fresh.sort(key=lambda item: order[id(item)])
+			ordered = [item for item in items if item.tick != tick] + fresh
+			if any(a is not b for a, b in zip(items, ordered)):
+				self.touch(attr)
+				items[:] = ordered
+				if attr == "buffs":
+					# Entity views list the buffs of each card in order
+					self.game.registry.invalidate()
@@ -2,18 +2,54 @@ from itertools import chain
 from hearthstone.enums import CardType, PlayReq, Race, Rarity, Step, Zone
 from . import actions, cards, rules
 from .aura import TargetableByAuras
-from .entity import BaseEntity, Entity, boolean_property, int_property, slot_property
+from .entity import BaseEntity, Entity, boolean_property, cached_stat, int_property, lazy_attribute, slot_property
 from .managers import CardManager
-from .targeting import is_valid_target
 from .utils import CardList
 from .exceptions import InvalidAction
 
 
 THE_COIN = "GAME_005"
 
+# Prototype class of each card id (see prototype())
+_prototypes = {}
+
 
 def Card(id):
 	data = cards.db[id]
+	cls = _prototypes.get(id)
+	if cls is None or cls.data is not data:
+		cls = _prototypes[id] = prototype(data)
+	return cls(data)
+
+
+def card_attributes(cls, data):
+	"""
+	Returns the attributes of a \a cls card set from its card \a data,
+	including its tags as set by the setters of \a cls.
+	"""
+	ret = {
+		"data": data,
+		"id": data.id,
+		"requirements": data.requirements,
+		"targeting": data.targeting,
+		"_events": data.scripts.events,
+	}
+	if issubclass(cls, PlayableCard):
+		ret["entourage"] = CardList(data.entourage)
+	card = cls.__new__(cls)
+	card.tags.update(data.tags)
+	ret.update((k, v) for k, v in card.__dict__.items() if k not in ("manager", "tags"))
+	return ret
+
+
+def prototype(data):
+	"""
+	Returns the class of the cards of \a data: a subclass of the card
+	type holding the card data, requirements, targeting, event listeners
+	and tags.
+	They are shared by every card of that id, which only holds the state
+	changed during the game.
+	"""
 	subclass = {
 		CardType.HERO: Hero,
 		CardType.MINION: Minion,
@@ -24,25 +60,25 @@ def Card(id):
 	}[data.type]
 	if subclass is Spell and data.secret:
 		subclass = Secret
-	return subclass(data)
+	return type(subclass.__name__, (subclass, ), card_attributes(subclass, data))
 
 
 class BaseCard(BaseEntity):
 	Manager = CardManager
 	delayed_destruction = False
+	data = None
+	choose = None
+	parent_card = None
+	aura = False
+	heropower_damage = 0
+	_controller = None
+	_zone = Zone.INVALID
 
 	def __init__(self, data):
-		self.data = data
 		super().__init__()
-		self.requirements = data.requirements.copy()
-		self.id = data.id
-		self.controller = None
-		self.choose = None
-		self.parent_card = None
-		self.aura = False
-		self.heropower_damage = 0
-		self._zone = Zone.INVALID
-		self.tags.update(data.tags)
+		if data is not self.data:
+			# Not a prototype of the card (see Card())
+			self.__dict__.update(card_attributes(self.__class__, data))
 
 	def __str__(self):
 		return self.name
@@ -64,6 +100,16 @@ class BaseCard(BaseEntity):
 	def game(self):
 		return self.controller.game
 
+	@property
+	def controller(self):
+		return self._controller
+
+	@controller.setter
+	def controller(self, value):
+		self._controller = value
+		if value is not None:
+			value.game.registry.invalidate()
+
 	@property
 	def zone(self):
 		return self._zone
@@ -97,16 +143,18 @@ class BaseCard(BaseEntity):
 			self.play_counter = self.game.play_counter
 			self.game.play_counter += 1
 
+		self.game.registry.invalidate()
+
 	def buff(self, target, buff, **kwargs):
 		"""
 		Summon \a buff and apply it to \a target
 		If keyword arguments are given, attempt to set the given
 		values to the buff. Example:
-		player.buff(target, health=random.randint(1, 5))
+		player.buff(target, health=self.game.random.randint(1, 5))
 		NOTE: Any Card can buff any other Card. The controller of the
 		Card that buffs the target becomes the controller of the buff.
 		"""
-		ret = self.controller.card(buff, self)
+		ret = self.controller.enchantment(buff, self)
 		ret.source = self
 		ret.apply(target)
 		for k, v in kwargs.items():
@@ -128,16 +176,16 @@ class PlayableCard(BaseCard, Entity, TargetableByAuras):
 	windfury = int_property("windfury")
 	playable_zone = Zone.HAND
 
+	cant_play = False
+	has_battlecry = False
+	has_combo = False
+	overload = 0
+	target = None
+	rarity = Rarity.INVALID
+	morphed = None
+
 	def __init__(self, data):
-		self.cant_play = False
-		self.entourage = CardList(data.entourage)
-		self.has_battlecry = False
-		self.has_combo = False
-		self.overload = 0
-		self.target = None
-		self.rarity = Rarity.INVALID
 		self.choose_cards = CardList()
-		self.morphed = None
 		super().__init__(data)
 
 	@property
@@ -147,6 +195,7 @@ class PlayableCard(BaseCard, Entity, TargetableByAuras):
 		return self.base_events + self._events
 
 	@property
+	@cached_stat
 	def cost(self):
 		ret = 0
 		if self.zone == Zone.HAND:
@@ -321,7 +370,7 @@ class PlayableCard(BaseCard, Entity, TargetableByAuras):
 
 	@property
 	def targets(self):
-		return [card for card in self.game.characters if is_valid_target(self, card)]
+		return self.targeting.targets(self)
 
 
 class LiveEntity(PlayableCard, Entity):
@@ -332,6 +381,11 @@ class LiveEntity(PlayableCard, Entity):
 	incoming_damage_multiplier = int_property("incoming_damage_multiplier")
 	max_health = int_property("max_health")
 
+	# Changes to the health (or durability) of the entity or its death
+	_death_attributes = frozenset((
+		"damage", "_max_health", "_max_durability", "_to_be_destroyed", "_zone", "buffs", "slots",
+	))
+
 	def __init__(self, data):
 		super().__init__(data)
 		self._to_be_destroyed = False
@@ -340,6 +394,11 @@ class LiveEntity(PlayableCard, Entity):
 		self.predamage = 0
 		self.turns_in_play = 0
 
+	def may_die(self):
+		controller = self._controller
+		if controller is not None:
+			controller.game.pending_deaths.append(self)
+
 	def _set_zone(self, zone):
 		super()._set_zone(zone)
 		# See issue #283 (Malorne, Anu'barak)
@@ -408,13 +467,11 @@ class Character(LiveEntity):
 	cant_be_targeted_by_hero_powers = boolean_property("cant_be_targeted_by_hero_powers")
 	min_health = boolean_property("min_health")
 
-	def __init__(self, data):
-		self.frozen = False
-		self.attack_target = None
-		self.cannot_attack_heroes = False
-		self.num_attacks = 0
-		self.race = Race.INVALID
-		super().__init__(data)
+	frozen = False
+	attack_target = None
+	cannot_attack_heroes = False
+	num_attacks = 0
+	race = Race.INVALID
 
 	@property
 	def attackable(self):
@@ -493,10 +550,8 @@ class Character(LiveEntity):
 
 
 class Hero(Character):
-	def __init__(self, data):
-		self.armor = 0
-		self.power = None
-		super().__init__(data)
+	armor = 0
+	power = None
 
 	@property
 	def entities(self):
@@ -558,14 +613,12 @@ class Minion(Character):
 		"stealthed", "taunt", "windfury", "cannot_attack_heroes",
 	)
 
-	def __init__(self, data):
-		self.always_wins_brawls = False
-		self.divine_shield = False
-		self.enrage = False
-		self.poisonous = False
-		self.silenced = False
-		self._summon_index = None
-		super().__init__(data)
+	always_wins_brawls = False
+	divine_shield = False
+	enrage = False
+	poisonous = False
+	silenced = False
+	_summon_index = None
 
 	@property
 	def ignore_scripts(self):
@@ -654,10 +707,8 @@ class Minion(Character):
 
 
 class Spell(PlayableCard):
-	def __init__(self, data):
-		self.immune_to_spellpower = False
-		self.receives_double_spelldamage_bonus = False
-		super().__init__(data)
+	immune_to_spellpower = False
+	receives_double_spelldamage_bonus = False
 
 	def get_damage(self, amount, target):
 		if not self.immune_to_spellpower:
@@ -706,12 +757,28 @@ class Enchantment(BaseCard):
 
 	buffs = []
 	slots = []
+	# Game tick of the last refresh of a buff applied by an aura
+	tick = None
+	one_turn_effect = False
+	owner = None
 
 	def __init__(self, data):
-		self.one_turn_effect = False
 		self.additional_deathrattles = []
 		super().__init__(data)
 
+	def __setattr__(self, name, value):
+		super().__setattr__(name, value)
+		# Buffs change the health of their owner
+		if self.owner is not None:
+			self.owner.may_die()
+
+	@lazy_attribute
+	def entity_id(self):
+		# Set by GameManager.new_entity() when the game has observers
+		if self._journal is not None:
+			self._journal.record(self, "entity_id")
+		return self.game.manager.next_id()
+
 	@property
 	def deathrattles(self):
 		if not self.has_deathrattle:
@@ -730,12 +797,14 @@ class Enchantment(BaseCard):
 
 	def _set_zone(self, zone):
 		if zone == Zone.PLAY:
+			self.owner.touch("buffs")
 			self.owner.buffs.append(self)
 		elif zone == Zone.REMOVEDFROMGAME:
 			if self.zone == zone:
 				# Can happen if a Destroy is queued after a bounce, for example
 				self.logger.warning("Trying to remove %r which is already gone", self)
 				return
+			self.owner.touch("buffs")
 			self.owner.buffs.remove(self)
 			if self in self.game.active_aura_buffs:
 				self.game.active_aura_buffs.remove(self)
@@ -768,6 +837,7 @@ class Weapon(rules.WeaponRules, LiveEntity):
 		return max(0, self.max_durability - self.damage)
 
 	@property
+	@cached_stat
 	def max_durability(self):
 		ret = self._max_durability
 		ret += self._getattr("max_health", 0)
@@ -1,16 +1,67 @@
+import hashlib
 import os
+import pickle
+import tempfile
+from importlib import import_module
+from threading import Lock
+from xml.etree import ElementTree
 from pkg_resources import resource_filename
+import hearthstone
 from hearthstone import cardxml
 from hearthstone.enums import CardType
+from .. import __version__
+from ..actions import EventListener
 from ..logging import log
 from ..rules import FORGETFUL, POISONOUS
-from ..utils import get_script_definition
+from ..targeting import compile_requirements
+from ..utils import CARD_SETS
 
 
-class CardDB(dict):
+def get_cache_dir():
+	"""
+	Directory of the card database cache. Set FIREPLACE_CACHE_DIR to
+	override it, or to an empty string to disable the cache.
+	"""
+	ret = os.environ.get("FIREPLACE_CACHE_DIR")
+	if ret is None:
+		ret = os.path.join(os.environ.get("XDG_CACHE_HOME") or "~/.cache", "fireplace")
+	return os.path.expanduser(ret) if ret else None
+
+
+class LazyXML:
+	"""
+	The xml attribute of the cards read from the cache (see CardDB.load()),
+	which do not store their xml element: the elements of every card are
+	read from \a filename on first access to any of them.
+	"""
 	def __init__(self, filename):
 		self.filename = filename
+		self.elements = None
+
+	def __get__(self, obj, type=None):
+		if obj is None:
+			return self
+		if self.elements is None:
+			xml = ElementTree.parse(self.filename)
+			self.elements = {e.attrib["CardID"]: e for e in xml.findall("Entity")}
+		ret = obj.__dict__["xml"] = self.elements[obj.id]
+		return ret
+
+
+class CardDB(dict):
+	# Card attributes with an index for filter()
+	INDEXED_ATTRIBUTES = (
+		"type", "race", "rarity", "card_class", "cost", "collectible", "spare_part",
+	)
+
+	def __init__(self, filename, cache_dir=None):
+		self.filename = filename
+		self.cache_dir = cache_dir
 		self.initialized = False
+		self._lock = Lock()
+		self._indexes = {}
+		self._filter_cache = {}
+		self._positions = {}
 
 	def __getitem__(self, *args):
 		if not self.initialized:
@@ -23,12 +74,11 @@ class CardDB(dict):
 		return super().__iter__()
 
 	@staticmethod
-	def merge(id, card):
+	def merge(id, card, carddef=None):
 		"""
-		Find the xmlcard and the card definition of \a id
-		Then return a merged class of the two
+		Merge the xmlcard of \a id with its card definition \a carddef
+		(see get_script_definition()), and return the merged card
 		"""
-		carddef = get_script_definition(id)
 		if carddef:
 			card.scripts = type(id, (carddef, ), {})
 		else:
@@ -81,56 +131,204 @@ class CardDB(dict):
 		if card.forgetful:
 			card.scripts.events.append(FORGETFUL)
 
+		card.targeting = compile_requirements(card.requirements, card.type)
+
+		# Compile the event triggers now rather than on their first broadcast
+		for events in (card.scripts.events, card.scripts.secret, card.scripts.Hand.events):
+			for listener in events:
+				if isinstance(listener, EventListener) and listener.trigger._matcher is None:
+					listener.trigger._matcher = listener.trigger.compile_matcher()
+
 		return card
 
 	def initialize(self):
-		log.info("Initializing card database")
-		self.initialized = True
-		if not os.path.exists(self.filename):
-			raise RuntimeError("%r does not exist. Create it with `bootstrap`." % (self.filename))
+		with self._lock:
+			# Another thread may have finished loading while we waited
+			if self.initialized:
+				return
+			log.info("Initializing card database")
+			if not os.path.exists(self.filename):
+				raise RuntimeError("%r does not exist. Create it with `bootstrap`." % (self.filename))
+
+			db, cardsets = self.load()
+			for id, card in db.items():
+				carddef = None
+				if id in cardsets:
+					carddef = getattr(import_module("fireplace.cards.%s" % (cardsets[id])), id)
+				self[id] = self.merge(id, card, carddef)
+				self._positions[id] = len(self._positions)
+
+			# Only publish the database once every card has been merged
+			self.initialized = True
+			log.info("Merged %i cards", len(self))
+
+	def load(self):
+		"""
+		Returns the xml cards by id and the card set module defining the
+		script of each card that has one.
+		Both are read from the cache when it is up to date, and written
+		to it otherwise.
+		"""
+		key = self.cache_key()
+		path = os.path.join(self.cache_dir, "carddb.pickle") if self.cache_dir else None
+		if path and os.path.exists(path):
+			try:
+				with open(path, "rb") as f:
+					cache = pickle.load(f)
+			except Exception as e:
+				log.warning("Could not read card database cache %r: %s", path, e)
+			else:
+				if cache["key"] == key:
+					log.info("Loaded card database cache %r", path)
+					db = {}
+					xml = LazyXML(self.filename)
+					classes = {}
+					for id, (cls, state) in cache["cards"].items():
+						lazy = classes.get(cls)
+						if lazy is None:
+							lazy = classes[cls] = type(cls.__name__, (cls, ), {"xml": xml})
+						db[id] = card = lazy.__new__(lazy)
+						card.__dict__.update(state)
+					return db, cache["cardsets"]
 
 		db, xml = cardxml.load(self.filename)
-		for id, card in db.items():
-			self[id] = self.merge(id, card)
+		cardsets = {}
+		for cardset in CARD_SETS:
+			module = import_module("fireplace.cards.%s" % (cardset))
+			for id in db:
+				if id not in cardsets and hasattr(module, id):
+					cardsets[id] = cardset
 
-		log.info("Merged %i cards", len(self))
+		if path:
+			# The xml element of each card is by far the largest and slowest
+			# to unpickle; every tag we need has been parsed out of it already.
+			# It is read again from the xml file if needed (see LazyXML).
+			cards = {}
+			for id, card in db.items():
+				state = card.__dict__.copy()
+				state.pop("xml", None)
+				cards[id] = (card.__class__, state)
+			try:
+				self.write_cache(path, {"key": key, "cards": cards, "cardsets": cardsets})
+			except Exception as e:
+				log.warning("Could not write card database cache %r: %s", path, e)
+
+		return db, cardsets
+
+	def cache_key(self):
+		"""
+		Returns a key identifying the card database: the xml file, the
+		card scripts and the versions of fireplace and hearthstone.
+		"""
+		files = [self.filename]
+		cards_dir = os.path.dirname(__file__)
+		for dirpath, dirnames, filenames in os.walk(cards_dir):
+			dirnames.sort()
+			files += [os.path.join(dirpath, name) for name in sorted(filenames) if name.endswith(".py")]
+		key = [__version__, getattr(hearthstone, "__version__", "")]
+		for filename in files:
+			stat = os.stat(filename)
+			key.append("%s:%i:%i" % (os.path.relpath(filename, cards_dir), stat.st_mtime_ns, stat.st_size))
+		return hashlib.sha1("\n".join(key).encode("utf-8")).hexdigest()
+
+	@staticmethod
+	def write_cache(path, cache):
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		# Write then rename so that concurrent processes never read a partial cache
+		fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+		try:
+			with os.fdopen(fd, "wb") as f:
+				pickle.dump(cache, f, pickle.HIGHEST_PROTOCOL)
+			os.replace(tmp, path)
+		except Exception:
+			os.unlink(tmp)
+			raise
 
 	def filter(self, **kwargs):
 		"""
 		Returns a list of card IDs matching the given filters. Each filter, if not
 		None, is matched against the registered card database.
-		cards.
+		A list of values matches any of them.
 		Examples arguments:
 		\a collectible: Whether the card is collectible or not.
 		\a type: The type of the card (hearthstone.enums.CardType)
 		\a race: The race (tribe) of the card (hearthstone.enums.Race)
 		\a rarity: The rarity of the card (hearthstone.enums.Rarity)
 		\a cost: The mana cost of the card
+
+		Results are cached and shared between callers: they must not be
+		modified in place.
 		"""
 		if not self.initialized:
 			self.initialize()
 
-		cards = self.values()
-
 		if "type" not in kwargs:
 			kwargs["type"] = [CardType.SPELL, CardType.WEAPON, CardType.MINION]
 
-		for attr, value in kwargs.items():
+		filters = []
+		for attr, value in sorted(kwargs.items()):
 			if value is not None:
-				# What? this doesn't work?
-				# cards = __builtins__["filter"](lambda c: getattr(c, attr) == value, cards)
-				cards = [
-					card for card in cards if (isinstance(value, list) and getattr(card, attr) in value) or
-					getattr(card, attr) == value
-				]
+				if isinstance(value, list):
+					value = tuple(value)
+				filters.append((attr, value))
+		filters = tuple(filters)
+
+		try:
+			return self._filter_cache[filters]
+		except KeyError:
+			pass
+		except TypeError:
+			# Unhashable filter value
+			return self._filter(filters)
+		ret = self._filter_cache[filters] = self._filter(filters)
+		return ret
+
+	def _filter(self, filters):
+		ids = None
+		scanned = []
+		for attr, value in filters:
+			if attr not in self.INDEXED_ATTRIBUTES:
+				scanned.append((attr, value))
+				continue
+			index = self._get_index(attr)
+			if isinstance(value, tuple):
+				matches = set()
+				for v in value:
+					matches |= index.get(v, frozenset())
+			else:
+				matches = index.get(value, frozenset())
+			ids = matches if ids is None else ids & matches
+
+		if ids is None:
+			cards = self.values()
+		else:
+			cards = [self[id] for id in sorted(ids, key=self._positions.__getitem__)]
+
+		for attr, value in scanned:
+			cards = [
+				card for card in cards if (isinstance(value, tuple) and getattr(card, attr) in value) or
+				getattr(card, attr) == value
+			]
 
 		return [card.id for card in cards]
 
+	def _get_index(self, attr):
+		"""
+		Returns the index of the card ids by value of \a attr
+		"""
+		ret = self._indexes.get(attr)
+		if ret is None:
+			index = {}
+			for id, card in self.items():
+				index.setdefault(getattr(card, attr), set()).add(id)
+			ret = self._indexes[attr] = {k: frozenset(v) for k, v in index.items()}
+		return ret
+
 
 # Here we import every card from every set and load the cardxml database.
 # For every card, we will "merge" the class with its Python definition if
 # it exists.
 if "db" not in globals():
 	xmlfile = resource_filename("fireplace", "CardDefs.xml")
-	db = CardDB(xmlfile)
+	db = CardDB(xmlfile, get_cache_dir())
 	filter = db.filter
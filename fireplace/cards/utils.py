@@ -1,4 +1,3 @@
-import random
 from hearthstone.enums import CardClass, CardType, GameTag, Race, Rarity
 from ..actions import *
 from ..aura import Refresh
@@ -1,4 +1,3 @@
-from ..logging import log
 from .lazynum import LazyValue
 
 
@@ -16,7 +15,7 @@ class Copy(LazyValue):
 		"""
 		Return a copy of \a entity
 		"""
-		log.info("Creating a copy of %r", entity)
+		source.log("Creating a copy of %r", entity)
 		return source.controller.card(entity.id, source)
 
 	def evaluate(self, source) -> [str]:
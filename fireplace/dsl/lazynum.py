@@ -1,6 +1,5 @@
 import copy
 import operator
-import random
 from .evaluator import Evaluator
 
 
@@ -114,4 +113,4 @@ class RandomNumber(LazyNum):
 		return "%s(%r)" % (self.__class__.__name__, self.choices)
 
 	def evaluate(self, source):
-		return self.num(random.choice(self.choices))
+		return self.num(source.game.random.choice(self.choices))
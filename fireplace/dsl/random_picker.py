@@ -1,4 +1,3 @@
-import random
 from hearthstone.enums import CardType, Race, Rarity
 from .lazynum import LazyValue
 
@@ -37,6 +36,8 @@ class RandomCardPicker(LazyValue):
 		return cards.filter(**filters)
 
 	def get_cards(self, source):
+		if not self.lazy_filters:
+			return self.cards
 		filters = self.filters.copy()
 		# Iterate through the filters, evaluating the LazyValues as we go
 		for k, v in filters.items():
@@ -45,12 +46,8 @@ class RandomCardPicker(LazyValue):
 		return self._filter_cards(filters)
 
 	def evaluate(self, source) -> str:
-		if self.lazy_filters:
-			# If the card has lazy filters, we need to evaluate them
-			cards = self.get_cards(source)
-		else:
-			cards = self.cards
-		ret = random.sample(cards, self.count)
+		cards = self.get_cards(source)
+		ret = source.game.random.sample(cards, self.count)
 		return [source.controller.card(card, source=source) for card in ret]
 
 
@@ -68,12 +65,10 @@ RandomSparePart = lambda: RandomCardPicker(spare_part=True)
 
 
 class RandomEntourage(RandomCardPicker):
-	def evaluate(self, source, **kwargs):
-		self._cards = source.entourage
-		return super().evaluate(source, **kwargs)
+	def get_cards(self, source):
+		return source.entourage
 
 
 class RandomID(RandomCardPicker):
-	def evaluate(self, source, **kwargs):
-		self._cards = self.args
-		return super().evaluate(source, **kwargs)
+	def get_cards(self, source):
+		return self.args
@@ -1,5 +1,4 @@
 import operator
-import random
 from enum import IntEnum
 from hearthstone.enums import CardType, GameTag, Race, Rarity, Zone
 from .. import enums
@@ -31,6 +30,11 @@ class Selector:
 	class Unmerge:
 		pass
 
+	_compiled = None
+	_matcher = None
+	# Whether the selector only selects one entity known from the source
+	identity = False
+
 	def __init__(self, tag=None):
 		self.program = []
 		self.slice = None
@@ -92,31 +96,81 @@ class Selector:
 	def eval(self, entities, source):
 		if not entities:
 			return []
-		self.opc = 0  # outer program counter
+		if self._compiled is None:
+			self._compiled = self.compile()
+		return self._compiled(entities, source)
+
+	def compile(self):
+		"""
+		Translate the program into a Python function with the same
+		signature and results as interpret().
+		Programs which cannot be compiled are left to the interpreter.
+		"""
+		try:
+			return SelectorCompiler(self).compile()
+		except IndexError:
+			# Stack underflow: the interpreter will raise at the same point
+			return self.interpret
+
+	def matcher(self):
+		"""
+		Returns a predicate of (entity, source), true if \a entity is
+		selected out of [entity], as by eval([entity], source).
+		Used to match event arguments (see Action.matches()).
+		"""
+		if self._matcher is None:
+			self._matcher = self.compile_matcher()
+		return self._matcher
+
+	def compile_matcher(self):
+		program = self.program
+		if program and not self.slice and not any(
+			op in (Selector.MergeFilter, Selector.Merge, Selector.Unmerge) for op in program
+		):
+			try:
+				return SelectorCompiler(self).compile_predicate()
+			except IndexError:
+				pass
+
+		def match(entity, source):
+			res = self.eval([entity], source)
+			return bool(res) and res[0] is entity
+		return match
+
+	def interpret(self, entities, source):
+		"""
+		Run the program through the reference stack interpreter.
+		The program counters are local to the call: selectors are shared
+		between every card and every game, and may be evaluated reentrantly.
+		"""
+		if not entities:
+			return []
+		program = self.program
+		opc = 0  # outer program counter
 		result = []
-		while self.opc < len(self.program):
-			if self.program[self.opc] != Selector.MergeFilter:
-				result += [e for e in entities if self.test(e, source)]
-				self.opc = self.pc
-				if self.opc >= len(self.program):
+		while opc < len(program):
+			if program[opc] != Selector.MergeFilter:
+				result += [e for e in entities if self.test(e, source, opc)]
+				opc = self._skip(opc)
+				if opc >= len(program):
 					break
 			else:
-				self.opc += 1
+				opc += 1
 			# handle merge step:
-			merge_input = CardList([e for e in entities if self.test(e, source)])
-			self.opc = self.pc
+			merge_input = CardList([e for e in entities if self.test(e, source, opc)])
+			opc = self._skip(opc)
 			merge_output = CardList()
-			while self.opc < len(self.program):
-				op = self.program[self.opc]
-				self.opc += 1
+			while opc < len(program):
+				op = program[opc]
+				opc += 1
 				if op == Selector.Unmerge:
 					break
-				merge_output += op.merge(self, merge_input)
+				merge_output += op.merge(self, merge_input, source)
 			negated = False
 			combined = False
-			while self.opc < len(self.program):
+			while opc < len(program):
 				# special handling for operators on merged collections:
-				op = self.program[self.opc]
+				op = program[opc]
 				if op == Selector._or:
 					result += [e for e in merge_output]
 					combined = True
@@ -127,7 +181,7 @@ class Selector:
 					negated = not negated
 				else:
 					break
-				self.opc += 1
+				opc += 1
 			if not combined:
 				# assume or
 				result += merge_output
@@ -137,12 +191,14 @@ class Selector:
 
 		return result
 
-	def test(self, entity, source):
+	def test(self, entity, source, pc=0):
+		"""
+		Evaluate the test expression starting at \a pc against \a entity
+		"""
 		stack = []
-		self.pc = self.opc  # program counter
-		while self.pc < len(self.program):
-			op = self.program[self.pc]
-			self.pc += 1
+		while pc < len(self.program):
+			op = self.program[pc]
+			pc += 1
 			if op == Selector.Merge or op == Selector.MergeFilter:
 				break
 			if callable(op):
@@ -152,6 +208,17 @@ class Selector:
 				stack.append(val)
 		return stack[-1]
 
+	def _skip(self, pc):
+		"""
+		Returns the program counter following the test expression at \a pc
+		"""
+		while pc < len(self.program):
+			op = self.program[pc]
+			pc += 1
+			if op == Selector.Merge or op == Selector.MergeFilter:
+				break
+		return pc
+
 	# boolean ops:
 	def _and(self, stack):
 		a = stack.pop()
@@ -166,6 +233,23 @@ class Selector:
 	def _not(self, stack):
 		stack.append(not stack.pop())
 
+	def is_structural(self):
+		"""
+		Whether the result only depends on the zones, controllers and
+		positions of the entities and on static card data, ie. it can
+		only change along with the game's EntityRegistry.
+		"""
+		for op in self.program:
+			if isinstance(op, (CardType, Race, Rarity, Zone)):
+				continue
+			if op in (Selector._and, Selector._or, Selector._not):
+				continue
+			if op in (Selector.MergeFilter, Selector.Merge, Selector.Unmerge):
+				continue
+			if not getattr(op, "structural", False):
+				return False
+		return True
+
 
 class AttrSelector(Selector):
 	"""
@@ -180,6 +264,14 @@ class AttrSelector(Selector):
 		def __repr__(self):
 			return "Attr(%s(%r, %r))" % (self.op.__name__, self.tag, self.value)
 
+		@property
+		def structural(self):
+			# The source's controller (or its opponent)
+			return (
+				self.tag == GameTag.CONTROLLER and isinstance(self.value, Controller) and
+				self.value.selector is None
+			)
+
 		def test(self, entity, source):
 			value = self.value
 			if isinstance(value, LazyValue):
@@ -225,12 +317,16 @@ class SelfSelector(Selector):
 	Selects the source.
 	"""
 	class IsSelf:
+		structural = True
+
 		def __repr__(self):
 			return "SELF"
 
 		def test(self, entity, source):
 			return entity is source
 
+	identity = True
+
 	def __init__(self):
 		self.program = [self.IsSelf()]
 
@@ -240,6 +336,9 @@ class SelfSelector(Selector):
 	def eval(self, entities, source):
 		return [source]
 
+	def compile_matcher(self):
+		return lambda entity, source: entity is source
+
 SELF = SelfSelector()
 
 
@@ -248,9 +347,13 @@ class OwnerSelector(Selector):
 	Selects the source's owner.
 	"""
 	class IsOwner:
+		structural = True
+
 		def test(self, entity, source):
 			return entity is source.owner
 
+	identity = True
+
 	def __init__(self):
 		self.program = [self.IsOwner()]
 
@@ -262,6 +365,9 @@ class OwnerSelector(Selector):
 			return [source.owner]
 		return []
 
+	def compile_matcher(self):
+		return lambda entity, source: entity is source.owner
+
 OWNER = OwnerSelector()
 
 
@@ -295,6 +401,7 @@ def LazySelector(value):
 
 TARGET = FuncSelector(lambda entity, source: entity is source.target)
 TARGET.eval = lambda entity, source: [source.target]
+TARGET.identity = True
 
 
 class MinMaxSelector(Selector):
@@ -309,11 +416,11 @@ class MinMaxSelector(Selector):
 		def __repr__(self):
 			return "<%s(%s)>" % (self.func.__name__, self.tag)
 
-		def merge(self, selector, entities):
+		def merge(self, selector, entities, source):
 			key = lambda x: x.tags.get(self.tag, 0)
 			highest = self.func(entities, key=key).tags.get(self.tag, 0)
 			ret = [e for e in entities if e.tags.get(self.tag) == highest]
-			return random.sample(ret, min(len(ret), 1))
+			return source.game.random.sample(ret, min(len(ret), 1))
 
 	def __init__(self, selector, tag, func):
 		self.slice = None
@@ -338,7 +445,9 @@ class AdjacentSelector(Selector):
 	Selects the minions adjacent to the targets.
 	"""
 	class SelectAdjacent:
-		def merge(self, selector, entities):
+		structural = True
+
+		def merge(self, selector, entities, source):
 			result = []
 			for e in entities:
 				result.extend(e.adjacent_minions)
@@ -372,8 +481,8 @@ class RandomSelector(Selector):
 		def __repr__(self):
 			return "<RANDOM(%s)>" % (self.times)
 
-		def merge(self, selector, entities):
-			return random.sample(entities, min(len(entities), self.times))
+		def merge(self, selector, entities, source):
+			return source.game.random.sample(entities, min(len(entities), self.times))
 
 	def __init__(self, selector):
 		self.slice = None
@@ -440,6 +549,244 @@ Rarity.test = lambda self, entity, *args: entity is not None and self == getattr
 Zone.test = lambda self, entity, *args: entity is not None and self == entity.zone
 
 
+def _candidates(entities, zones, types):
+	"""
+	Narrow down \a entities to the given zones and card types, using the
+	registry's views when \a entities is a game.
+	"""
+	registry = getattr(entities, "registry", None)
+	if registry is None:
+		return entities
+	return registry.select(zones, types)
+
+
+class SelectorCompiler:
+	"""
+	Compiles a Selector program into a single Python function.
+
+	The test sections of the program (ops up to a Merge or MergeFilter)
+	become one boolean expression over `entity` and `source`, with the
+	enum tests above inlined. Merge sections keep the interpreter's
+	semantics but run on the compiled filters.
+	Tests which only pass in given zones or for given card types only
+	scan the matching registry view when evaluated against a game.
+	"""
+	COMPARISONS = {
+		operator.eq: "==",
+		operator.ge: ">=",
+		operator.gt: ">",
+		operator.le: "<=",
+		operator.lt: "<",
+	}
+
+	ENUM_TESTS = {
+		CardType: "(entity is not None and %s == entity.type)",
+		GameTag: "(entity is not None and bool(entity.tags.get(%s)))",
+		Race: "(entity is not None and %s == getattr(entity, 'race', RACE_INVALID))",
+		Rarity: "(entity is not None and %s == getattr(entity, 'rarity', RARITY_INVALID))",
+		Zone: "(entity is not None and %s == entity.zone)",
+	}
+
+	def __init__(self, selector):
+		self.selector = selector
+		self.program = selector.program
+		self.namespace = {
+			"CardList": CardList,
+			"_candidates": _candidates,
+			"RACE_INVALID": Race.INVALID,
+			"RARITY_INVALID": Rarity.INVALID,
+		}
+
+	def const(self, value):
+		name = "_k%i" % (len(self.namespace))
+		self.namespace[name] = value
+		return name
+
+	def compile_op(self, op):
+		"""
+		Return the source of an expression equivalent to the op's test
+		"""
+		if type(op) in self.ENUM_TESTS:
+			return self.ENUM_TESTS[type(op)] % (self.const(op))
+		if isinstance(op, AttrSelector.IsAttrValue):
+			value = self.const(op.value)
+			if isinstance(op.value, LazyValue):
+				value += ".evaluate(source)"
+			tag = "entity.tags.get(%s, 0)" % (self.const(op.tag))
+			if op.op in self.COMPARISONS:
+				return "(%s %s %s)" % (tag, self.COMPARISONS[op.op], value)
+			return "%s(%s, %s)" % (self.const(op.op), tag, value)
+		if isinstance(op, SelfSelector.IsSelf):
+			return "(entity is source)"
+		if isinstance(op, OwnerSelector.IsOwner):
+			return "(entity is source.owner)"
+		if isinstance(op, FuncSelector.MatchesFunc):
+			return "%s(entity, source)" % (self.const(op.func))
+		return "%s(%s, entity, source)" % (self.const(type(op).test), self.const(op))
+
+	def compile_test(self, pc):
+		"""
+		Compile the test section starting at \a pc, the same way
+		Selector.test() would run it.
+		Returns the expression source, the zones and card types an entity
+		must be in to pass the test (None if unconstrained) and the pc after
+		the section.
+		"""
+		stack = []
+		while pc < len(self.program):
+			op = self.program[pc]
+			pc += 1
+			if op == Selector.Merge or op == Selector.MergeFilter:
+				break
+			if op == Selector._and:
+				a = stack.pop()
+				b = stack.pop()
+				stack.append((
+					"(%s and %s)" % (b[0], a[0]),
+					self._intersect(b[1], a[1]),
+					self._intersect(b[2], a[2]),
+				))
+			elif op == Selector._or:
+				a = stack.pop()
+				b = stack.pop()
+				stack.append((
+					"(%s or %s)" % (b[0], a[0]),
+					self._union(b[1], a[1]),
+					self._union(b[2], a[2]),
+				))
+			elif op == Selector._not:
+				stack.append(("(not %s)" % (stack.pop()[0]), None, None))
+			else:
+				zones = frozenset([op]) if isinstance(op, Zone) else None
+				types = frozenset([op]) if isinstance(op, CardType) else None
+				stack.append((self.compile_op(op), zones, types))
+		expr, zones, types = stack[-1]
+		return expr, zones, types, pc
+
+	@staticmethod
+	def _intersect(a, b):
+		if a is None:
+			return b
+		if b is None:
+			return a
+		return a & b
+
+	@staticmethod
+	def _union(a, b):
+		if a is None or b is None:
+			return None
+		return a | b
+
+	def make_filter(self, expr, zones=None, types=None):
+		if zones is None and types is None:
+			candidates = "entities"
+		else:
+			# Evaluating against a game: start from the registry's view
+			# of the only zones and types which can pass the test.
+			candidates = "_candidates(entities, %s, %s)" % (self.const(zones), self.const(types))
+		return eval(
+			"lambda entities, source: [entity for entity in %s if %s]" % (candidates, expr),
+			self.namespace
+		)
+
+	def compile_predicate(self):
+		"""
+		Compile a program without merges into a predicate of (entity, source)
+		"""
+		expr, zones, types, pc = self.compile_test(0)
+		return eval("lambda entity, source: bool(%s)" % (expr), self.namespace)
+
+	def make_merge(self, test, merge_ops, combinators):
+		selector = self.selector
+
+		def merge(entities, source, result):
+			merge_input = CardList(test(entities, source))
+			merge_output = CardList()
+			for op in merge_ops:
+				merge_output += op.merge(selector, merge_input, source)
+			negated = False
+			combined = False
+			for op in combinators:
+				if op == Selector._or:
+					result += merge_output
+					combined = True
+				elif op == Selector._and:
+					result = [e for e in result if (e in merge_output) != negated]
+					combined = True
+				else:
+					negated = not negated
+			if not combined:
+				result += merge_output
+			return result
+
+		return merge
+
+	def compile(self):
+		# Mirrors the control flow of Selector.interpret(), which does not
+		# depend on the entities being evaluated.
+		program = self.program
+		steps = []
+		opc = 0
+		while opc < len(program):
+			if program[opc] != Selector.MergeFilter:
+				expr, zones, types, opc = self.compile_test(opc)
+				steps.append((expr, zones, types))
+				if opc >= len(program):
+					break
+			else:
+				opc += 1
+			expr, zones, types, opc = self.compile_test(opc)
+			merge_ops = []
+			while opc < len(program):
+				op = program[opc]
+				opc += 1
+				if op == Selector.Unmerge:
+					break
+				merge_ops.append(op)
+			combinators = []
+			while opc < len(program):
+				op = program[opc]
+				if op != Selector._or and op != Selector._and and op != Selector._not:
+					break
+				combinators.append(op)
+				opc += 1
+			test = self.make_filter(expr, zones, types)
+			steps.append(self.make_merge(test, merge_ops, combinators))
+
+		slice_ = self.selector.slice
+
+		if len(steps) == 1 and isinstance(steps[0], tuple):
+			# The common case: a single filter over the entities
+			func = self.make_filter(*steps[0])
+			if slice_:
+				return lambda entities, source: func(entities, source)[slice_]
+			return func
+
+		for i, step in enumerate(steps):
+			if isinstance(step, tuple):
+				steps[i] = self._filter_step(self.make_filter(*step))
+
+		def run(entities, source):
+			if len(steps) > 1 and not hasattr(entities, "registry"):
+				# Every step iterates the full collection
+				entities = list(entities)
+			result = []
+			for step in steps:
+				result = step(entities, source, result)
+			if slice_:
+				result = result[slice_]
+			return result
+
+		return run
+
+	@staticmethod
+	def _filter_step(func):
+		def step(entities, source, result):
+			result += func(entities, source)
+			return result
+		return step
+
+
 BATTLECRY = Selector(GameTag.BATTLECRY)
 CHARGE = Selector(GameTag.CHARGE)
 DAMAGED = Selector(GameTag.DAMAGE)
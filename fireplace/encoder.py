@@ -0,0 +1,278 @@
+"""
+NumPy encoding of game states for machine learning agents
+
+Requires numpy (`pip install fireplace[encoder]`).
+"""
+from operator import attrgetter
+import numpy as np
+from hearthstone.enums import GameTag
+from . import cards, legal
+from .managers import CARD_ATTRIBUTE_MAP, PlayerManager
+
+
+MAX_HAND_SIZE = 10
+MAX_MINIONS = 7
+MAX_CHOICES = 3
+# Choose One options are numbered from 1, 0 is a card without options
+MAX_CHOOSE = 2
+
+MINION_TAGS = (
+	GameTag.ATK,
+	GameTag.HEALTH,
+	GameTag.DAMAGE,
+	GameTag.COST,
+	GameTag.TAUNT,
+	GameTag.DIVINE_SHIELD,
+	GameTag.STEALTH,
+	GameTag.WINDFURY,
+	GameTag.CHARGE,
+	GameTag.POISONOUS,
+	GameTag.FROZEN,
+	GameTag.SILENCED,
+	GameTag.ENRAGED,
+	GameTag.EXHAUSTED,
+	GameTag.NUM_ATTACKS_THIS_TURN,
+	GameTag.NUM_TURNS_IN_PLAY,
+	GameTag.CANT_ATTACK,
+	GameTag.CANT_BE_TARGETED_BY_ABILITIES,
+	GameTag.SPELLPOWER,
+)
+
+HERO_TAGS = (
+	GameTag.ATK,
+	GameTag.HEALTH,
+	GameTag.DAMAGE,
+	GameTag.ARMOR,
+	GameTag.FROZEN,
+	GameTag.NUM_ATTACKS_THIS_TURN,
+)
+
+WEAPON_TAGS = (
+	GameTag.ATK,
+	GameTag.DURABILITY,
+	GameTag.DAMAGE,
+)
+
+PLAYER_TAGS = (
+	GameTag.CURRENT_PLAYER,
+	GameTag.FIRST_PLAYER,
+	GameTag.RESOURCES,
+	GameTag.RESOURCES_USED,
+	GameTag.TEMP_RESOURCES,
+	GameTag.OVERLOAD_LOCKED,
+	GameTag.OVERLOAD_OWED,
+	GameTag.CURRENT_SPELLPOWER,
+	GameTag.FATIGUE,
+	GameTag.COMBO_ACTIVE,
+	GameTag.NUM_CARDS_PLAYED_THIS_TURN,
+	GameTag.NUM_MINIONS_PLAYED_THIS_TURN,
+)
+
+# Counters following the PLAYER_TAGS features of each player
+PLAYER_COUNTERS = ("hand", "deck", "field", "secrets")
+
+# Target slots: none, the heroes of the player and of the opponent, then
+# the minions of the player and of the opponent by position.
+NUM_TARGETS = 3 + 2 * MAX_MINIONS
+
+# Flat action space of the legal-action masks (see action_index())
+PLAY_OFFSET = 1
+POWER_OFFSET = PLAY_OFFSET + MAX_HAND_SIZE * (MAX_CHOOSE + 1) * NUM_TARGETS
+ATTACK_OFFSET = POWER_OFFSET + NUM_TARGETS
+CHOOSE_OFFSET = ATTACK_OFFSET + (MAX_MINIONS + 1) ** 2
+NUM_ACTIONS = CHOOSE_OFFSET + MAX_CHOICES
+
+
+def _getter(map, tags):
+	# Reads all the features of an entity in one call, as a tuple
+	return attrgetter(*(map[tag] for tag in tags))
+
+
+_minion_features = _getter(CARD_ATTRIBUTE_MAP, MINION_TAGS)
+_hero_features = _getter(CARD_ATTRIBUTE_MAP, HERO_TAGS)
+_weapon_features = _getter(CARD_ATTRIBUTE_MAP, WEAPON_TAGS)
+_player_features = _getter(PlayerManager.map, PLAYER_TAGS)
+
+_vocabulary = None
+
+
+def card_vocabulary():
+	"""
+	Returns the index of every card id of the card database, from 1 in
+	sorted order so that it only changes with the database. 0 stands for
+	no card (or a hidden card).
+	"""
+	global _vocabulary
+	if _vocabulary is None:
+		_vocabulary = {id: i for i, id in enumerate(sorted(cards.db), 1)}
+	return _vocabulary
+
+
+def _target_slots(player):
+	"""
+	Returns the target slot of each character of the game, seen by \a player
+	"""
+	ret = {player.hero: 1, player.opponent.hero: 2}
+	for offset, field in ((3, player.field), (3 + MAX_MINIONS, player.opponent.field)):
+		for i, minion in enumerate(field[:MAX_MINIONS]):
+			ret[minion] = offset + i
+	return ret
+
+
+def action_index(action, player, slots=None):
+	"""
+	Returns the index of the legal action \a action of \a player in the
+	legal-action masks, or None if it does not fit the action space.
+	"""
+	if slots is None:
+		slots = _target_slots(player)
+	kind, entity, target, choose = action
+	target = slots.get(target, 0)
+	if kind == legal.END_TURN:
+		return 0
+	elif kind == legal.PLAY:
+		position = player.hand.index(entity)
+		if choose is not None:
+			choose = 1 + [card.id for card in entity.choose_cards].index(choose)
+			if choose > MAX_CHOOSE:
+				return None
+		if position >= MAX_HAND_SIZE:
+			return None
+		return PLAY_OFFSET + (position * (MAX_CHOOSE + 1) + (choose or 0)) * NUM_TARGETS + target
+	elif kind == legal.POWER:
+		return POWER_OFFSET + target
+	elif kind == legal.ATTACK:
+		# Characters are numbered from 0 (the hero) to MAX_MINIONS on each side
+		attacker = slots.get(entity, 0)
+		attacker = 0 if attacker == 1 else attacker - 2
+		defender = 0 if target == 2 else target - 2 - MAX_MINIONS
+		if not 0 <= attacker <= MAX_MINIONS or not 0 <= defender <= MAX_MINIONS:
+			return None
+		return ATTACK_OFFSET + attacker * (MAX_MINIONS + 1) + defender
+	elif kind == legal.CHOOSE:
+		position = player.choice.cards.index(entity)
+		if position >= MAX_CHOICES:
+			return None
+		return CHOOSE_OFFSET + position
+
+
+def find_action(player, index):
+	"""
+	Returns the legal action of \a player at \a index of the legal-action
+	masks, or None.
+	"""
+	slots = _target_slots(player)
+	for action in player.legal_actions():
+		if action_index(action, player, slots) == index:
+			return action
+
+
+class StateEncoder:
+	"""
+	Encodes games into preallocated arrays, for batches of up to
+	\a batch_size games. Each game is seen by one of its players: index 0
+	of the player axis is that player and index 1 the opponent.
+
+	- player: (batch, 2, features) PLAYER_TAGS then PLAYER_COUNTERS
+	- hero: (batch, 2, features) HERO_TAGS
+	- weapon: (batch, 2, features) WEAPON_TAGS, zero without a weapon
+	- board: (batch, 2, MAX_MINIONS, features) MINION_TAGS by position
+	- board_ids: (batch, 2, MAX_MINIONS) card indices (see card_vocabulary())
+	- hand_ids: (batch, MAX_HAND_SIZE) card indices of the player's hand
+	- mask: (batch, NUM_ACTIONS) legal actions of the player (see action_index())
+
+	The arrays are reused: encode() overwrites the previous batch.
+	"""
+	def __init__(self, batch_size=1, dtype=np.int32):
+		self.batch_size = batch_size
+		self.vocabulary = card_vocabulary()
+		self.player = np.zeros((batch_size, 2, len(PLAYER_TAGS) + len(PLAYER_COUNTERS)), dtype)
+		self.hero = np.zeros((batch_size, 2, len(HERO_TAGS)), dtype)
+		self.weapon = np.zeros((batch_size, 2, len(WEAPON_TAGS)), dtype)
+		self.board = np.zeros((batch_size, 2, MAX_MINIONS, len(MINION_TAGS)), dtype)
+		self.board_ids = np.zeros((batch_size, 2, MAX_MINIONS), dtype)
+		self.hand_ids = np.zeros((batch_size, MAX_HAND_SIZE), dtype)
+		self.mask = np.zeros((batch_size, NUM_ACTIONS), np.bool_)
+
+	@property
+	def arrays(self):
+		return {
+			"player": self.player,
+			"hero": self.hero,
+			"weapon": self.weapon,
+			"board": self.board,
+			"board_ids": self.board_ids,
+			"hand_ids": self.hand_ids,
+			"mask": self.mask,
+		}
+
+	def encode(self, games, players=None):
+		"""
+		Encode \a games, seen by \a players (by default the current player
+		of each game). Returns the arrays truncated to the batch.
+		"""
+		count = len(games)
+		if count > self.batch_size:
+			raise ValueError("Batch of %i games exceeds %i" % (count, self.batch_size))
+		if not count:
+			return {name: array[:0] for name, array in self.arrays.items()}
+		if players is None:
+			players = [game.current_player for game in games]
+		arrays = self.arrays
+		for array in arrays.values():
+			array[:count] = 0
+
+		# Features are gathered into flat lists and written with one
+		# assignment per array for the whole batch.
+		vocabulary = self.vocabulary
+		player_rows, hero_rows = [], []
+		weapon_index, weapon_rows = [], []
+		minion_index, minion_rows, minion_ids = [], [], []
+		hand_index, hand_ids = [], []
+		mask_index = []
+		for i, player in enumerate(players):
+			for side, p in enumerate((player, player.opponent)):
+				row = i * 2 + side
+				player_rows.append(_player_features(p) + (
+					len(p.hand), len(p.deck), len(p.field), len(p.secrets),
+				))
+				hero_rows.append(_hero_features(p.hero))
+				if p.weapon is not None:
+					weapon_index.append(row)
+					weapon_rows.append(_weapon_features(p.weapon))
+				offset = row * MAX_MINIONS
+				for position, minion in enumerate(p.field[:MAX_MINIONS]):
+					minion_index.append(offset + position)
+					minion_rows.append(_minion_features(minion))
+					minion_ids.append(vocabulary.get(minion.id, 0))
+
+			offset = i * MAX_HAND_SIZE
+			for position, card in enumerate(player.hand[:MAX_HAND_SIZE]):
+				hand_index.append(offset + position)
+				hand_ids.append(vocabulary.get(card.id, 0))
+
+			actions = player.legal_actions()
+			if actions:
+				slots = _target_slots(player)
+				offset = i * NUM_ACTIONS
+				for action in actions:
+					index = action_index(action, player, slots)
+					if index is not None:
+						mask_index.append(offset + index)
+
+		self.player[:count] = np.array(player_rows).reshape(count, 2, -1)
+		self.hero[:count] = np.array(hero_rows).reshape(count, 2, -1)
+		if weapon_rows:
+			self.weapon.reshape(-1, len(WEAPON_TAGS))[weapon_index] = weapon_rows
+		if minion_rows:
+			self.board.reshape(-1, len(MINION_TAGS))[minion_index] = minion_rows
+			self.board_ids.reshape(-1)[minion_index] = minion_ids
+		self.hand_ids.reshape(-1)[hand_index] = hand_ids
+		self.mask.reshape(-1)[mask_index] = True
+		return {name: array[:count] for name, array in arrays.items()}
+
+	def encode_game(self, game, player=None):
+		"""
+		Encode a single \a game, seen by \a player
+		"""
+		return self.encode([game], None if player is None else [player])
@@ -3,26 +3,124 @@ from hearthstone.enums import CardType
 from . import logging
 
 
+def _registry(entity):
+	"""
+	Returns the registry of the game of \a entity, or None for an entity
+	which is not (yet) part of a game
+	"""
+	try:
+		return entity.game.registry
+	except AttributeError:
+		return None
+
+
+class lazy_attribute:
+	"""
+	Decorator for an instance attribute computed on first access.
+	The value is stored on the instance, where it takes precedence over
+	the (non-data) descriptor from then on.
+	"""
+	def __init__(self, func):
+		self.func = func
+		self.name = func.__name__
+
+	def __get__(self, obj, type=None):
+		if obj is None:
+			return self
+		ret = obj.__dict__[self.name] = self.func(obj)
+		return ret
+
+
 class BaseEntity(object):
 	base_events = []
 	logger = logging.log
 	ignore_scripts = False
 	type = CardType.INVALID
+	play_counter = 0
+	# Names of the attributes changed since the last pop_changes(),
+	# once tracked (see track_changes())
+	_changes = None
+	# Event listeners of the entity. Shared with the card data until the
+	# first change: replaced, never modified in place.
+	_events = []
+	# Attributes whose change can kill the entity (see may_die())
+	_death_attributes = frozenset()
+	# Journal recording the changes to the entity, if any (see fireplace.journal)
+	_journal = None
 
 	def __init__(self):
-		self.manager = self.Manager(self)
-		self.play_counter = 0
-		self.tags = self.manager
-		self.uuid = uuid.uuid4()
+		self._stats = {}
+
+	@lazy_attribute
+	def manager(self):
+		return self.Manager(self)
+
+	@lazy_attribute
+	def tags(self):
+		return self.manager
 
-		if self.data:
-			self._events = self.data.scripts.events[:]
-		else:
-			self._events = []
+	@lazy_attribute
+	def uuid(self):
+		return uuid.uuid4()
 
 	def __int__(self):
 		return self.entity_id
 
+	def __setattr__(self, name, value):
+		if self._journal is not None:
+			self._journal.record(self, name, value)
+		super().__setattr__(name, value)
+		# After the change: setters can update other state (eg. zone lists)
+		self.invalidate_stats()
+		if self._changes is not None:
+			self._changes.add(name)
+		if name in self._death_attributes:
+			self.may_die()
+
+	def touch(self, name):
+		"""
+		Record a change to the attribute \a name made in place (eg. the
+		buffs list), which __setattr__ does not see. Called right before
+		the change.
+		"""
+		if self._journal is not None:
+			self._journal.save_list(getattr(self, name))
+		self.invalidate_stats()
+		if self._changes is not None:
+			self._changes.add(name)
+		if name in self._death_attributes:
+			self.may_die()
+
+	def invalidate_stats(self):
+		"""
+		Invalidate the memoized stats of the entities of the game (see
+		cached_stat()). Called on any entity attribute change and by touch().
+		"""
+		registry = _registry(self)
+		if registry is not None:
+			registry.stats_version += 1
+
+	def may_die(self):
+		"""
+		Called on changes which can make the entity die, so that the next
+		death sweep checks it (see BaseGame.process_deaths()).
+		"""
+		pass
+
+	def track_changes(self):
+		"""
+		Start recording the names of the attributes set on the entity
+		"""
+		self.__dict__["_changes"] = set()
+
+	def pop_changes(self):
+		"""
+		Return the names of the attributes set since the last call
+		"""
+		ret = self._changes
+		self.__dict__["_changes"] = set()
+		return ret
+
 	@property
 	def is_card(self):
 		"""
@@ -43,7 +141,8 @@ class BaseEntity(object):
 		return ret
 
 	def log(self, message, *args):
-		self.logger.info(message, *args)
+		if self.game.verbose:
+			self.logger.info(message, *args)
 
 	def get_actions(self, name):
 		actions = getattr(self.data.scripts, name)
@@ -74,7 +173,10 @@ class BaseEntity(object):
 		# XXX This is racey. Replace with something more solid.
 		source.game.queue_actions(self, actions, event_args=args)
 		if event.once:
-			self._events.remove(event)
+			events = self._events[:]
+			events.remove(event)
+			self._events = events
+			source.game.registry.invalidate()
 
 		return actions
 
@@ -112,8 +214,30 @@ class Entity(BuffableEntity):
 	pass
 
 
+def cached_stat(getter):
+	"""
+	Decorator for a property getter computing a stat (atk, cost...), or
+	a method without arguments computed from the game state.
+	The value is memoized on the entity until the next state change of
+	its game (see EntityRegistry.stats_version).
+	"""
+	def func(self):
+		registry = _registry(self)
+		if registry is None:
+			return getter(self)
+		version = registry.stats_version
+		cached = self._stats.get(getter)
+		if cached is not None and cached[0] == version:
+			return cached[1]
+		ret = getter(self)
+		self._stats[getter] = (version, ret)
+		return ret
+	return func
+
+
 def slot_property(attr, f=any):
 	@property
+	@cached_stat
 	def func(self):
 		return f(getattr(slot, attr, False) for slot in self.slots)
 	return func
@@ -121,6 +245,7 @@ def slot_property(attr, f=any):
 
 def boolean_property(attr):
 	@property
+	@cached_stat
 	def func(self):
 		return (
 			getattr(self, "_" + attr, False) or
@@ -138,6 +263,7 @@ def boolean_property(attr):
 
 def int_property(attr):
 	@property
+	@cached_stat
 	def func(self):
 		ret = self._getattr(attr, 0)
 		return max(0, ret)
@@ -0,0 +1,116 @@
+"""
+Game state cloning (see BaseGame.fork())
+"""
+import random
+from .actions import GenericChoice, MulliganChoice
+from .aura import AuraBuff
+from .entity import BaseEntity
+from .journal import Journal
+from .managers import Manager
+from .registry import EntityRegistry
+
+
+class GameForker:
+	"""
+	Copies the mutable state of a game: every entity (game, players, cards
+	and their buffs), aura buffs, tag managers, open choices and the
+	containers referencing them. Entity references found anywhere in that
+	state (controller, owner, source, target, attack targets...) are
+	remapped to their copy.
+	Anything else (card data and scripts, actions, selectors, event
+	listeners, loggers, uuids) is immutable during a game and is shared.
+	The copy has no journal.
+	"""
+	CLONED_TYPES = (BaseEntity, AuraBuff, GenericChoice, MulliganChoice, Manager)
+	_handlers = {}
+
+	def __init__(self):
+		self.memo = {}
+
+	def fork(self, game):
+		return self.copy(game)
+
+	def copy(self, obj):
+		try:
+			handler = self._handlers[type(obj)]
+		except KeyError:
+			handler = self._handlers[type(obj)] = self._get_handler(type(obj))
+		if handler is None:
+			return obj
+		ret = self.memo.get(id(obj))
+		if ret is None:
+			ret = handler(self, obj)
+		return ret
+
+	@classmethod
+	def _get_handler(cls, type):
+		if issubclass(type, list):
+			return cls._copy_list
+		if issubclass(type, tuple):
+			return cls._copy_tuple
+		if type is dict:
+			return cls._copy_dict
+		if type is set:
+			return cls._copy_set
+		if issubclass(type, cls.CLONED_TYPES):
+			return cls._copy_object
+		if issubclass(type, EntityRegistry):
+			return cls._copy_registry
+		if issubclass(type, random.Random):
+			return cls._copy_random
+		if issubclass(type, Journal):
+			return cls._copy_journal
+		# Immutable or shared
+		return None
+
+	def _copy_list(self, obj):
+		ret = obj.__class__.__new__(obj.__class__)
+		self.memo[id(obj)] = ret
+		shared = self._handlers.get
+		ret.extend([item if shared(type(item), 0) is None else self.copy(item) for item in obj])
+		if getattr(obj, "__dict__", None):
+			# eg. Deck.hero
+			ret.__dict__.update(self._copy_dict(obj.__dict__))
+		return ret
+
+	def _copy_tuple(self, obj):
+		ret = [self.copy(item) for item in obj]
+		if hasattr(obj, "_make"):
+			# namedtuples (eg. memoized Player.legal_actions())
+			return obj._make(ret)
+		return tuple(ret)
+
+	def _copy_dict(self, obj):
+		# Skip the copy() call for the (most common) shared values
+		shared = self._handlers.get
+		return {k: v if shared(type(v), 0) is None else self.copy(v) for k, v in obj.items()}
+
+	def _copy_set(self, obj):
+		# eg. attribute names tracked by BaseEntity.track_changes()
+		return {self.copy(item) for item in obj}
+
+	def _copy_object(self, obj):
+		ret = obj.__class__.__new__(obj.__class__)
+		self.memo[id(obj)] = ret
+		ret.__dict__ = self._copy_dict(obj.__dict__)
+		if isinstance(obj, Manager):
+			# Observers (eg. Kettle) watch the original game only
+			ret.observers = []
+		return ret
+
+	def _copy_registry(self, obj):
+		# Views are rebuilt on demand for the copy. The memoized stats are
+		# copied along with the entities, and stay valid in the copy.
+		ret = EntityRegistry(self.copy(obj.game))
+		ret.stats_version = obj.stats_version
+		self.memo[id(obj)] = ret
+		return ret
+
+	def _copy_journal(self, obj):
+		return None
+
+	def _copy_random(self, obj):
+		ret = obj.__class__()
+		ret.setstate(obj.getstate())
+		self.memo[id(obj)] = ret
+		return ret
@@ -1,12 +1,18 @@
+import logging
 import random
 import time
 from calendar import timegm
 from itertools import chain
 from hearthstone.enums import CardType, PlayState, State, Step, Zone
-from .actions import Attack, BeginTurn, Death, EndTurn, EventListener, Hit
+from .actions import Attack, BeginTurn, Death, EndTurn, EventListener, GameAction, Hit
+from .aura import Refresh
 from .card import THE_COIN
 from .entity import Entity
+from .fork import GameForker
+from .journal import Journal
+from .logging import log
 from .managers import GameManager
+from .registry import EntityRegistry, cached_view
 from .utils import CardList
 from .exceptions import GameOver
 
@@ -16,21 +22,43 @@ class BaseGame(Entity):
 	MAX_MINIONS_ON_FIELD = 7
 	Manager = GameManager
 
-	def __init__(self, players):
+	def __init__(self, players, seed=None, verbose=None, trace=None):
 		self.data = None
+		# Trace records are written to \a trace (see fireplace.logging)
+		# instead of formatted log messages. Formatted messages are only
+		# built in verbose games: by default, games without a trace sink
+		# created while the fireplace logger is enabled for INFO.
+		if verbose is None:
+			verbose = trace is None and log.isEnabledFor(logging.INFO)
+		self.verbose = verbose
+		self.trace = trace
+		if seed is None:
+			# Draw a seed so that any game can be replayed from game.seed
+			seed = random.getrandbits(64)
+		self.seed = seed
+		self.random = random.Random(seed)
+		self.registry = EntityRegistry(self)
 		self.players = players
 		super().__init__()
+		# Numbers the game entity
+		self.manager = self.Manager(self)
 		for player in players:
 			player.game = self
 		self.state = State.INVALID
 		self.step = None
 		self.next_step = None
 		self.turn = 0
-		self.current_player = None
+		self._current_player = None
 		self.minions_killed_this_turn = CardList()
 		self.no_aura_refresh = False
 		self.tick = 0
 		self.active_aura_buffs = CardList()
+		self.refreshed_auras = []
+		# (source, event args) of the action queues being processed
+		self.action_frames = []
+		# Live entities which may have died since the last death sweep,
+		# once per change (cards compare by card id, not by identity)
+		self.pending_deaths = CardList()
 
 	def __repr__(self):
 		return "%s(players=%r)" % (self.__class__.__name__, self.players)
@@ -43,40 +71,92 @@ class BaseGame(Entity):
 		return self
 
 	@property
+	def current_player(self):
+		return self._current_player
+
+	@current_player.setter
+	def current_player(self, value):
+		self._current_player = value
+		# Secrets only listen during the opponent's turn
+		self.registry.invalidate()
+
+	@cached_view
 	def board(self):
 		return CardList(chain(self.players[0].field, self.players[1].field))
 
-	@property
+	@cached_view
 	def decks(self):
 		return CardList(chain(self.players[0].deck, self.players[1].deck))
 
-	@property
+	@cached_view
 	def hands(self):
 		return CardList(chain(self.players[0].hand, self.players[1].hand))
 
-	@property
+	@cached_view
 	def characters(self):
 		return CardList(chain(self.players[0].characters, self.players[1].characters))
 
-	@property
+	@cached_view
 	def all_entities(self):
 		return CardList(chain(self.entities, self.hands, self.decks, self.graveyard))
 
-	@property
+	@cached_view
 	def graveyard(self):
 		return CardList(chain(self.players[0].graveyard, self.players[1].graveyard))
 
-	@property
+	@cached_view
 	def entities(self):
 		return CardList(chain([self], self.players[0].entities, self.players[1].entities))
 
-	@property
+	@cached_view
 	def live_entities(self):
 		return CardList(chain(self.players[0].live_entities, self.players[1].live_entities))
 
 	def filter(self, *args, **kwargs):
 		return self.all_entities.filter(*args, **kwargs)
 
+	def fork(self):
+		"""
+		Returns an independent copy of the game, which can be played
+		separately (eg. to explore moves in a tree search).
+		Card data and scripts are shared with the original game.
+		Games should only be forked between actions.
+		The copy is not traced.
+		"""
+		ret = GameForker().fork(self)
+		ret.trace = None
+		return ret
+
+	def checkpoint(self):
+		"""
+		Returns a checkpoint of the game state, to which rollback() can
+		return the game, eg. to explore moves in place in a tree search.
+		The first checkpoint starts journaling the changes to the game
+		(see fireplace.journal) until stop_journal().
+		Games should only be checkpointed and rolled back between actions.
+		"""
+		if self._journal is None:
+			Journal(self)
+		return self._journal.checkpoint()
+
+	def rollback(self, checkpoint):
+		"""
+		Undo the changes made to the game since \a checkpoint, in time
+		proportional to the number of changes. Checkpoints taken since
+		\a checkpoint are discarded; \a checkpoint can be rolled back to
+		again. Observers (eg. Kettle) are not notified.
+		"""
+		if self._journal is None:
+			raise ValueError("%r has no checkpoint" % (self))
+		self._journal.rollback(checkpoint)
+
+	def stop_journal(self):
+		"""
+		Stop journaling the changes to the game, discarding every checkpoint
+		"""
+		if self._journal is not None:
+			self._journal.release()
+
 	def attack(self, source, target):
 		return self.queue_actions(source, [Attack(source, target)])
 
@@ -106,15 +186,44 @@ class BaseGame(Entity):
 			raise GameOver("The game has ended.")
 
 	def process_deaths(self):
-		actions = []
-		for card in self.live_entities:
-			if card.to_be_destroyed:
-				actions += self._schedule_death(card)
-
-		self.check_for_end_game()
-
-		if actions:
-			self.queue_actions(self, actions)
+		"""
+		Move the cards to be destroyed to the graveyard and trigger their
+		Death actions. The deaths caused by a Death action (eg. by its
+		deathrattle) are processed right after it, before the next Death,
+		from a stack of Death batches rather than by recursion.
+		"""
+		stack = []
+		while True:
+			actions = []
+			pending = self.pending_deaths
+			if pending:
+				# Only the entities changed since the last sweep can have
+				# died. They die in the order of live_entities.
+				self.pending_deaths = CardList()
+				pending = {id(card) for card in pending}
+				for card in self.live_entities:
+					if id(card) in pending and card.to_be_destroyed:
+						actions += self._schedule_death(card)
+
+			self.check_for_end_game()
+
+			if actions:
+				stack.append(iter(actions))
+			while stack:
+				action = next(stack[-1], None)
+				if action is not None:
+					break
+				# End of a batch, as queue_actions() would do
+				stack.pop()
+				self.refresh_auras()
+			else:
+				return
+			if isinstance(action, GameAction):
+				# Without the death sweep of GameAction.trigger(): it is the
+				# next iteration of this loop.
+				action._trigger(self)
+			else:
+				self.trigger_actions(self, [action])
 
 	def _schedule_death(self, card):
 		"""
@@ -136,14 +245,27 @@ class BaseGame(Entity):
 	def queue_actions(self, source, actions, event_args=None):
 		"""
 		Queue a list of \a actions for processing from \a source.
+		\a event_args are the arguments of the event triggering them,
+		if any (see get_event_args()).
 		Triggers an aura refresh afterwards.
 		"""
-		source.event_args = event_args
-		ret = self.trigger_actions(source, actions)
-		source.event_args = None
+		self.action_frames.append((source, event_args))
+		try:
+			ret = self.trigger_actions(source, actions)
+		finally:
+			self.action_frames.pop()
 		self.refresh_auras()
 		return ret
 
+	def get_event_args(self, source):
+		"""
+		Returns the event arguments of the innermost action queue of
+		\a source, or None.
+		"""
+		for frame_source, event_args in reversed(self.action_frames):
+			if frame_source is source:
+				return event_args
+
 	def trigger_actions(self, source, actions):
 		"""
 		Performs a list of `actions` from `source`.
@@ -161,7 +283,8 @@ class BaseGame(Entity):
 					listener = source.controller
 				else:
 					listener = source
-				listener._events.append(action)
+				listener._events = listener._events + [action]
+				self.registry.invalidate()
 			else:
 				ret.append(action.trigger(source))
 		return ret
@@ -174,29 +297,64 @@ class BaseGame(Entity):
 		"""
 		return self.players[0], self.players[1]
 
+	@cached_view
+	def aura_entities(self):
+		"""
+		The entities (in order of self.entities) and hand cards with
+		update scripts, ie. the possible sources of auras.
+		"""
+		entities = [e for e in self.entities if e.data and (e.data.scripts.update or e.data.scripts.enrage)]
+		hands = [e for e in self.hands if e.data.scripts.Hand.update]
+		return entities, hands
+
 	def refresh_auras(self):
 		if self.no_aura_refresh:
 			return
 
 		refresh_queue = []
-		for entity in self.entities:
+		entities, hands = self.aura_entities
+		for entity in entities:
 			for script in entity.update_scripts:
 				refresh_queue.append((entity, script))
 
-		for entity in self.hands:
+		for entity in hands:
 			for script in entity.data.scripts.Hand.update:
 				refresh_queue.append((entity, script))
 
 		# Sort the refresh queue by refresh priority (used by eg. Lightspawn)
 		refresh_queue.sort(key=lambda e: getattr(e[1], "priority", 50))
+
+		# Structural auras have the same effect until the registry changes:
+		# if nothing else is queued, the previous refresh still holds.
+		previous = self.registry.views.get("auras")
+		if previous is not None and len(previous) == len(refresh_queue) and all(
+			a[0] is b[0] and a[1] is b[1] for a, b in zip(previous, refresh_queue)
+		):
+			return
+
+		version = self.registry.version
+		self.refreshed_auras = []
 		for entity, action in refresh_queue:
 			action.trigger(entity)
 
+		order = {}
+		targets = {}
+		for i, (target, aura) in enumerate(self.refreshed_auras):
+			targets[id(target)] = target
+			order[id(aura)] = i
+		for target in targets.values():
+			target.sort_auras(order, self.tick)
+		self.refreshed_auras = []
+
 		for buff in self.active_aura_buffs[:]:
 			if buff.tick < self.tick:
 				buff.destroy()
 
 		self.tick += 1
+		if self.registry.version == version and all(
+			isinstance(action, Refresh) and action.structural for entity, action in refresh_queue
+		):
+			self.registry.views["auras"] = refresh_queue
 
 	def prepare(self):
 		self.players[0].opponent = self.players[1]
@@ -293,7 +451,7 @@ class CoinRules:
 	The second player gets "The Coin" (GAME_005).
 	"""
 	def pick_first_player(self):
-		winner = random.choice(self.players)
+		winner = self.random.choice(self.players)
 		self.log("Tossing the coin... %s wins!", winner)
 		return winner, winner.opponent
 
@@ -0,0 +1,167 @@
+"""
+Game state journaling (see BaseGame.checkpoint() and BaseGame.rollback())
+"""
+from collections import namedtuple
+from .actions import GenericChoice, MulliganChoice
+from .entity import BaseEntity
+from .utils import CardList
+
+
+Checkpoint = namedtuple("Checkpoint", ("index", "random", "counter"))
+
+# Entity attributes which are not game state
+UNJOURNALED_ATTRIBUTES = frozenset(("_changes", "_journal", "_stats", "manager", "registry", "tags", "trace"))
+
+_missing = object()
+
+
+class Journal:
+	"""
+	Undo log of the changes to the state of a game, in the order they
+	were made:
+	- every entity attribute set, by BaseEntity.__setattr__() (which
+	  includes the tags set through the managers and the zone moves)
+	- the content of every CardList (eg. the zones) before its first
+	  in-place change since the last checkpoint, as well as of the lists
+	  changed in place through BaseEntity.touch() (buffs, aura slots)
+	- the attributes of aura slots before their first refresh since the
+	  last checkpoint
+
+	Entities and card lists record their changes once adopted by the
+	journal: the whole game when journaling starts, then each entity as
+	it is created (see GameManager.new_entity()).
+	The random number generator and the entity counter are saved by each
+	checkpoint.
+	"""
+	def __init__(self, game):
+		self.game = game
+		self.entries = []
+		# id() of the lists and aura slots saved since the last checkpoint
+		self.saved = set()
+		self._setters = {}
+		for obj in self._walk(game):
+			self.adopt(obj)
+
+	def __repr__(self):
+		return "<%s (%i entries)>" % (self.__class__.__name__, len(self.entries))
+
+	def __deepcopy__(self, memo):
+		# Deep copies of the game are not journaled, as forks
+		return None
+
+	@staticmethod
+	def _walk(game):
+		"""
+		Yields the entities and card lists of the state of \a game
+		"""
+		seen = set()
+		stack = [game]
+		while stack:
+			obj = stack.pop()
+			if id(obj) in seen:
+				continue
+			seen.add(id(obj))
+			if isinstance(obj, BaseEntity):
+				yield obj
+				stack += [
+					value for name, value in obj.__dict__.items()
+					if name not in UNJOURNALED_ATTRIBUTES
+				]
+			elif isinstance(obj, (list, tuple, set, frozenset)):
+				if isinstance(obj, CardList):
+					yield obj
+				stack += obj
+			elif isinstance(obj, (GenericChoice, MulliganChoice)):
+				stack += obj.cards
+
+	def adopt(self, obj):
+		"""
+		Record the changes to \a obj, an entity (along with its card
+		lists) or a card list
+		"""
+		if obj._journal is self:
+			return
+		obj.__dict__["_journal"] = self
+		if isinstance(obj, BaseEntity):
+			for value in obj.__dict__.values():
+				if isinstance(value, CardList) and value._journal is None:
+					self.adopt(value)
+
+	def release(self):
+		"""
+		Stop recording the changes to the game
+		"""
+		for obj in self._walk(self.game):
+			obj.__dict__.pop("_journal", None)
+		self.entries = []
+		self.saved = set()
+
+	def record(self, obj, name, value=None):
+		"""
+		Record the value of the attribute \a name of \a obj before it is
+		set to \a value
+		"""
+		if name in UNJOURNALED_ATTRIBUTES:
+			return
+		state = obj.__dict__
+		if name in state:
+			self.entries.append((obj, name, state[name]))
+		else:
+			key = (type(obj), name)
+			setter = self._setters.get(key)
+			if setter is None:
+				# Properties record the attributes they set themselves
+				setter = self._setters[key] = hasattr(getattr(type(obj), name, None), "__set__")
+			if not setter:
+				self.entries.append((obj, name, _missing))
+		if isinstance(value, CardList) and value._journal is None:
+			self.adopt(value)
+
+	def save_list(self, cards):
+		"""
+		Save the content of \a cards before an in-place change
+		"""
+		if id(cards) not in self.saved:
+			self.saved.add(id(cards))
+			self.entries.append((cards, None, cards[:]))
+
+	def save_object(self, obj):
+		"""
+		Save the attributes of \a obj (eg. an AuraBuff) before a change
+		"""
+		if id(obj) not in self.saved:
+			self.saved.add(id(obj))
+			self.entries.append((obj, None, obj.__dict__.copy()))
+
+	def checkpoint(self):
+		game = self.game
+		# Lists and aura slots are saved again on their next change
+		self.saved = set()
+		return Checkpoint(len(self.entries), game.random.getstate(), game.manager.counter)
+
+	def rollback(self, checkpoint):
+		entries = self.entries
+		if checkpoint.index > len(entries):
+			raise ValueError("%r was rolled back past %r" % (self, checkpoint))
+		while len(entries) > checkpoint.index:
+			obj, name, value = entries.pop()
+			if name is None:
+				if isinstance(obj, list):
+					list.__setitem__(obj, slice(None), value)
+				else:
+					obj.__dict__.clear()
+					obj.__dict__.update(value)
+				continue
+			if value is _missing:
+				obj.__dict__.pop(name, None)
+			else:
+				obj.__dict__[name] = value
+			if obj._changes is not None:
+				obj._changes.add(name)
+
+		game = self.game
+		self.saved = set()
+		game.random.setstate(checkpoint.random)
+		game.manager.counter = checkpoint.counter
+		game.registry.invalidate()
+		game.invalidate_stats()
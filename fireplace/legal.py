@@ -0,0 +1,83 @@
+"""
+Legal action enumeration (see Player.legal_actions())
+"""
+from collections import namedtuple
+from .actions import MulliganChoice
+
+
+END_TURN, PLAY, POWER, ATTACK, CHOOSE = range(5)
+
+
+class LegalAction(namedtuple("LegalAction", ("kind", "entity", "target", "choose"))):
+	"""
+	A move available to a player:
+	- (END_TURN, player, None, None)
+	- (PLAY, card in hand, target or None, id of the chosen card or None)
+	- (POWER, hero power, target or None, None)
+	- (ATTACK, character, defender, None)
+	- (CHOOSE, card of the player's open choice, None, None)
+	"""
+	__slots__ = ()
+
+	def perform(self):
+		kind, entity, target, choose = self
+		if kind == PLAY:
+			return entity.play(target=target, choose=choose)
+		elif kind == POWER:
+			return entity.use(target=target)
+		elif kind == ATTACK:
+			return entity.attack(target)
+		elif kind == CHOOSE:
+			return entity.controller.choice.choose(entity)
+		return entity.game.end_turn()
+
+
+def _play_actions(card):
+	if card.choose_cards:
+		choices = [(choice, choice.id) for choice in card.choose_cards]
+	else:
+		choices = [(card, None)]
+	ret = []
+	for choice, id in choices:
+		if choice.has_target():
+			# PlayableCard.play() checks the target against the played card
+			targets = card.targets if choice is not card else None
+			for target in choice.targets:
+				if targets is None or target in targets:
+					ret.append(LegalAction(PLAY, card, target, id))
+		else:
+			ret.append(LegalAction(PLAY, card, None, id))
+	return ret
+
+
+def legal_actions(player):
+	"""
+	Returns the moves available to \a player, as a tuple of LegalAction.
+	Empty unless the player is the current player or has an open choice
+	of one card (mulligans pick any number of cards and are not listed).
+	"""
+	choice = player.choice
+	if choice is not None:
+		if isinstance(choice, MulliganChoice):
+			return ()
+		return tuple(LegalAction(CHOOSE, card, None, None) for card in choice.cards)
+	if not player.current_player:
+		return ()
+
+	ret = [LegalAction(END_TURN, player, None, None)]
+	for card in player.hand:
+		if card.is_playable():
+			ret += _play_actions(card)
+
+	power = player.hero.power
+	if power is not None and power.is_usable():
+		if power.has_target():
+			ret += [LegalAction(POWER, power, target, None) for target in power.targets]
+		else:
+			ret.append(LegalAction(POWER, power, None, None))
+
+	for character in player.characters:
+		if character.can_attack():
+			ret += [LegalAction(ATTACK, character, target, None) for target in character.targets]
+
+	return tuple(ret)
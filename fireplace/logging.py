@@ -1,11 +1,17 @@
+import json
 import logging
+from collections import deque, namedtuple
 
 
 def get_logger(name, level=logging.DEBUG):
+	"""
+	Returns the logger \a name, printing its messages from \a level on.
+	Scripts opt in to the log of the games with get_logger("fireplace").
+	"""
 	logger = logging.getLogger(name)
 	logger.setLevel(level)
 
-	if not logger.handlers:
+	if not any(isinstance(handler, logging.StreamHandler) for handler in logger.handlers):
 		ch = logging.StreamHandler()
 		ch.setLevel(level)
 
@@ -20,4 +26,50 @@ def get_logger(name, level=logging.DEBUG):
 	return logger
 
 
-log = get_logger("fireplace")
+# Quiet by default: games are only verbose (see BaseGame) once the
+# application lowers the level.
+log = logging.getLogger("fireplace")
+log.setLevel(logging.WARNING)
+log.addHandler(logging.NullHandler())
+
+
+# One record per action triggered in a traced game: the game tick, the
+# action's class name and the entity ids of its source and targets.
+TraceRecord = namedtuple("TraceRecord", ("tick", "action", "source", "targets"))
+
+
+class TraceSink:
+	"""
+	Receives the TraceRecords of the games created with trace=<sink>.
+	Sinks override record(); the base sink discards the records.
+	"""
+	def record(self, record):
+		pass
+
+
+class RingBufferSink(TraceSink):
+	"""
+	Keeps the last \a maxlen records in memory
+	"""
+	def __init__(self, maxlen=10000):
+		self.records = deque(maxlen=maxlen)
+
+	def __iter__(self):
+		return iter(self.records)
+
+	def __len__(self):
+		return len(self.records)
+
+	def record(self, record):
+		self.records.append(record)
+
+
+class FileSink(TraceSink):
+	"""
+	Writes one JSON object per record to \a stream
+	"""
+	def __init__(self, stream):
+		self.stream = stream
+
+	def record(self, record):
+		self.stream.write(json.dumps(record._asdict()) + "\n")
@@ -66,9 +66,26 @@ class GameManager(Manager):
 	def new_entity(self, entity):
 		self.counter += 1
 		entity.entity_id = self.counter
+		if self.obj._journal is not None:
+			self.obj._journal.adopt(entity)
 		for observer in self.observers:
 			observer.new_entity(entity)
 
+	def new_enchantment(self, entity):
+		"""
+		Enchantments are by far the most created entities. They are only
+		numbered and announced to the observers if there are any; else
+		they get an entity id on first use (see Enchantment.entity_id).
+		"""
+		if self.observers:
+			self.new_entity(entity)
+		elif self.obj._journal is not None:
+			self.obj._journal.adopt(entity)
+
+	def next_id(self):
+		self.counter += 1
+		return self.counter
+
 	def start_game(self):
 		for observer in self.observers:
 			observer.start_game()
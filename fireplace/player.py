@@ -1,4 +1,3 @@
-import random
 from itertools import chain
 from hearthstone.enums import CardType, PlayState, Zone
 from .actions import Concede, Draw, Fatigue, Give, Steal, Summon
@@ -6,8 +5,10 @@ from .aura import TargetableByAuras
 from .card import Card
 from .deck import Deck
 from .entity import Entity
-from .entity import slot_property
+from .entity import cached_stat, slot_property
+from .legal import legal_actions
 from .managers import PlayerManager
+from .registry import cached_view
 from .utils import CardList
 
 
@@ -78,16 +79,17 @@ class Player(Entity, TargetableByAuras):
 		return sum(minion.heropower_damage for minion in self.field)
 
 	@property
+	@cached_stat
 	def spellpower(self):
 		aura_power = self.controller.spellpower_adjustment
 		minion_power = sum(minion.spellpower for minion in self.field)
 		return aura_power + minion_power
 
-	@property
+	@cached_view
 	def characters(self):
 		return CardList(chain([self.hero] if self.hero else [], self.field))
 
-	@property
+	@cached_view
 	def entities(self):
 		ret = []
 		for entity in self.field:
@@ -96,7 +98,7 @@ class Player(Entity, TargetableByAuras):
 		ret += self.buffs
 		return CardList(chain(list(self.hero.entities) if self.hero else [], ret, [self]))
 
-	@property
+	@cached_view
 	def live_entities(self):
 		ret = self.field[:]
 		if self.hero:
@@ -113,10 +115,31 @@ class Player(Entity, TargetableByAuras):
 
 		return ret
 
+	@cached_stat
+	def legal_actions(self):
+		"""
+		Returns the moves available to the player as LegalAction tuples
+		(see fireplace.legal), computed once per game state.
+		"""
+		return legal_actions(self)
+
 	@property
 	def minion_slots(self):
 		return max(0, self.game.MAX_MINIONS_ON_FIELD - len(self.field))
 
+	def enchantment(self, id, source=None):
+		"""
+		Create the enchantment \a id, to be applied with apply().
+		Unlike card(), it is not set aside first, and is only given an
+		entity id once needed (see GameManager.new_enchantment()).
+		"""
+		buff = Card(id)
+		buff.controller = self
+		if source is not None:
+			buff.creator = source
+		self.game.manager.new_enchantment(buff)
+		return buff
+
 	def card(self, id, source=None, zone=Zone.SETASIDE):
 		card = Card(id)
 		card.controller = self
@@ -214,7 +237,8 @@ class Player(Entity, TargetableByAuras):
 
 	def shuffle_deck(self):
 		self.log("%r shuffles their deck", self)
-		random.shuffle(self.deck)
+		self.game.random.shuffle(self.deck)
+		self.game.registry.invalidate()
 
 	def summon(self, card):
 		"""
@@ -0,0 +1,118 @@
+from functools import wraps
+from .utils import CardList
+
+
+class EntityRegistry:
+	"""
+	Index of the entities of a game.
+	Entity views (by zone, card type, controller, as well as the BaseGame
+	and Player entity lists) and the event listener index are built on
+	first access and kept until the next structural change to the game:
+	a card changing zone (which includes buffs being applied and destroyed),
+	a card changing controller, a deck being shuffled, an entity's event
+	listeners changing or the current player changing.
+	Views keep the order of BaseGame.all_entities.
+
+	Views are dropped and rebuilt rather than updated in place: their order
+	comes from the zone lists (a card moving zone or controller moves in
+	every view containing it, and in the positions of the listener index),
+	and between two structural changes games read many more views than
+	they build.
+
+	Views are shared between callers and must not be modified in place.
+
+	stats_version is incremented on any change to the state of the game,
+	structural or not: memoized stats (see cached_stat()) are valid for
+	as long as it has not changed.
+	"""
+	def __init__(self, game):
+		self.game = game
+		self.version = 0
+		self.stats_version = 0
+		self.views = {}
+
+	def __repr__(self):
+		return "<%s (version %i)>" % (self.__class__.__name__, self.version)
+
+	def invalidate(self):
+		"""
+		Drop every view. Called on any structural change to the game.
+		"""
+		self.version += 1
+		if self.views:
+			self.views = {}
+
+	def select(self, zones=None, types=None):
+		"""
+		Returns the entities of the game in any of \a zones and
+		of any of the card \a types (both frozensets, None for any).
+		"""
+		key = (zones, types)
+		ret = self.views.get(key)
+		if ret is None:
+			ret = CardList(
+				e for e in self.game.all_entities
+				if (zones is None or getattr(e, "zone", None) in zones) and
+				(types is None or e.type in types)
+			)
+			self.views[key] = ret
+		return ret
+
+	def by_zone(self, *zones):
+		return self.select(zones=frozenset(zones))
+
+	def by_type(self, *types):
+		return self.select(types=frozenset(types))
+
+	def by_controller(self, controller):
+		key = ("controller", controller)
+		ret = self.views.get(key)
+		if ret is None:
+			ret = CardList(
+				e for e in self.game.all_entities
+				if getattr(e, "controller", None) is controller
+			)
+			self.views[key] = ret
+		return ret
+
+	def listeners(self, name, action, at):
+		"""
+		Returns the positions, in the game's \a name view ("entities" or
+		"hands"), of the entities with an event listener triggered by
+		\a action (an Action subclass) at \a at (ON or AFTER).
+		"""
+		key = ("listeners", name)
+		index = self.views.get(key)
+		if index is None:
+			index = self.views[key] = self._index_listeners(getattr(self.game, name))
+		return index.get((action, at), ())
+
+	@staticmethod
+	def _index_listeners(entities):
+		index = {}
+		for i, entity in enumerate(entities):
+			keys = set()
+			for event in entity.events:
+				# A listener is triggered by its trigger's class and any subclass
+				for cls in type(event.trigger).__mro__:
+					keys.add((cls, event.at))
+			for key in keys:
+				index.setdefault(key, []).append(i)
+		return index
+
+
+def cached_view(func):
+	"""
+	Property caching the result of \a func in the game's registry
+	until the next structural change.
+	"""
+	@property
+	@wraps(func)
+	def view(self):
+		views = self.game.registry.views
+		key = (self, func)
+		ret = views.get(key)
+		if ret is None:
+			ret = views[key] = func(self)
+		return ret
+	return view
@@ -0,0 +1,287 @@
+"""
+Batch game simulation
+
+Plays seeded games between two agents, spread over a process pool, and
+streams the results (winner, turn count and per-turn stats) as JSON lines
+or as a CSV file with one row per turn.
+
+Usage: python -m fireplace.sim --games 1000 --seed 0 --hero1 mage --hero2 warrior \\
+	--deck1 mage.txt --processes 4 --output results.jsonl
+"""
+import argparse
+import csv
+import json
+import logging
+import multiprocessing
+import sys
+import time
+from importlib import import_module
+from hearthstone.enums import PlayState
+from . import cards
+from .cards import heroes
+from .exceptions import GameOver
+from .game import Game
+from .logging import get_logger, log
+from .player import Player
+from .utils import random_draft
+
+
+HEROES = {k.lower(): v for k, v in vars(heroes).items() if k.isupper()}
+
+
+class Agent:
+	"""
+	Decision making of one player. One agent is instantiated per player
+	per game; any randomness must come from the game's random number
+	generator (player.game.random) for games to be reproducible.
+	"""
+	def mulligan(self, player):
+		"""
+		Return the cards of the open mulligan choice to replace
+		"""
+		return []
+
+	def choose(self, player):
+		"""
+		Return the card picked from \a player's open choice (eg. Discover)
+		"""
+		return player.choice.cards[0]
+
+	def play_turn(self, player):
+		"""
+		Play \a player's turn. The turn is ended by the simulation.
+		"""
+		pass
+
+
+class RandomAgent(Agent):
+	"""
+	Plays, attacks and uses the hero power at random.
+	"""
+	def mulligan(self, player):
+		rng = player.game.random
+		cards = player.choice.cards
+		return rng.sample(cards, rng.randint(0, len(cards)))
+
+	def choose(self, player):
+		return player.game.random.choice(player.choice.cards)
+
+	def play_turn(self, player):
+		rng = player.game.random
+		while True:
+			actions = player.legal_actions()
+			# The first action ends the turn
+			if len(actions) < 2 or rng.random() < 0.1:
+				return
+			rng.choice(actions[1:]).perform()
+			while player.choice:
+				player.choice.choose(self.choose(player))
+
+
+def load_agent(path):
+	"""
+	Return the Agent subclass at \a path ("module:Class")
+	"""
+	module, sep, name = path.partition(":")
+	if not sep:
+		raise ValueError("Invalid agent %r, expected module:Class" % (path))
+	return getattr(import_module(module), name)
+
+
+def load_deck(path):
+	"""
+	Read a deck list (one card id per line, # comments allowed) from \a path
+	"""
+	with open(path, "r") as f:
+		lines = (line.split("#", 1)[0].strip() for line in f)
+		return [line for line in lines if line]
+
+
+def get_hero(name):
+	return HEROES.get(name.lower(), name)
+
+
+def turn_stats(game):
+	player1, player2 = game.players
+	return {
+		"turn": game.turn,
+		"player": game.players.index(game.current_player) + 1,
+		"mana_used": game.current_player.used_mana,
+		"health": [player1.hero.health, player2.hero.health],
+		"minions": [len(player1.field), len(player2.field)],
+		"hand": [len(player1.hand), len(player2.hand)],
+		"deck": [len(player1.deck), len(player2.deck)],
+	}
+
+
+def play_game(seed, heroes=(None, None), decks=(None, None), agents=(RandomAgent, RandomAgent), max_turns=100, trace=None):
+	"""
+	Play a game between \a agents (Agent subclasses) and return its result.
+	Missing \a heroes and \a decks are picked at random. The same \a seed
+	always plays the same game. Actions are traced to the \a trace sink.
+	"""
+	players = (Player("Player1"), Player("Player2"))
+	game = Game(players=players, seed=seed, trace=trace)
+	for player, hero, deck in zip(players, heroes, decks):
+		if hero is None:
+			hero = game.random.choice(sorted(HEROES.values()))
+		if deck is None:
+			deck = random_draft(hero, rng=game.random)
+		player.prepare_deck(deck, hero)
+	agents = {player: agent() for player, agent in zip(players, agents)}
+
+	result = {
+		"seed": seed,
+		"heroes": [player.starting_hero for player in players],
+		"winner": None,
+		"turns": 0,
+		"error": None,
+		"stats": [],
+	}
+	try:
+		game.start()
+		for player in players:
+			player.choice.choose(*agents[player].mulligan(player))
+		while game.turn < max_turns:
+			player = game.current_player
+			agents[player].play_turn(player)
+			while player.choice:
+				player.choice.choose(agents[player].choose(player))
+			result["stats"].append(turn_stats(game))
+			game.end_turn()
+	except GameOver:
+		pass
+	except Exception as e:
+		# Keep the batch going; the seed is enough to replay the game
+		log.exception("Error in game with seed %r", seed)
+		result["error"] = "%s: %s" % (e.__class__.__name__, e)
+
+	result["turns"] = game.turn
+	for i, player in enumerate(players, 1):
+		if player.playstate == PlayState.WON:
+			result["winner"] = i
+	return result
+
+
+class JSONWriter:
+	"""
+	Writes one JSON object per game
+	"""
+	def __init__(self, stream):
+		self.stream = stream
+
+	def write(self, result):
+		self.stream.write(json.dumps(result) + "\n")
+
+
+class CSVWriter:
+	"""
+	Writes one row per turn, with the game's result repeated on each row
+	"""
+	COLUMNS = (
+		"seed", "hero1", "hero2", "winner", "turns", "error", "turn", "player", "mana_used",
+		"health1", "health2", "minions1", "minions2", "hand1", "hand2", "deck1", "deck2",
+	)
+
+	def __init__(self, stream):
+		self.writer = csv.writer(stream)
+		self.writer.writerow(self.COLUMNS)
+
+	def write(self, result):
+		game = [result["seed"]] + result["heroes"] + [result["winner"], result["turns"], result["error"]]
+		if not result["stats"]:
+			self.writer.writerow(game + [None] * (len(self.COLUMNS) - len(game)))
+		for stats in result["stats"]:
+			row = [stats["turn"], stats["player"], stats["mana_used"]]
+			for key in ("health", "minions", "hand", "deck"):
+				row += stats[key]
+			self.writer.writerow(game + row)
+
+
+WRITERS = {
+	"jsonl": JSONWriter,
+	"csv": CSVWriter,
+}
+
+
+def _init_worker(verbose=False):
+	# Load the card database once per worker process
+	get_logger("fireplace", logging.DEBUG if verbose else logging.ERROR)
+	cards.db.initialize()
+
+
+def _play(args):
+	seed, heroes, decks, agents, max_turns = args
+	agents = [load_agent(agent) for agent in agents]
+	return play_game(seed, heroes, decks, agents, max_turns)
+
+
+def simulate(seeds, writer, heroes=(None, None), decks=(None, None), agents=None, max_turns=100, processes=None, verbose=False):
+	"""
+	Play a game for each of \a seeds and pass the results to \a writer,
+	in order of \a seeds. Agents are given by path ("module:Class").
+	Games are played over \a processes worker processes (defaults to the
+	number of CPUs), which log the game actions if \a verbose, or in the
+	current process if \a processes is 1, with its own logging setup.
+	Returns the number of games played.
+	"""
+	if agents is None:
+		agents = ("fireplace.sim:RandomAgent", ) * 2
+	tasks = [(seed, heroes, decks, agents, max_turns) for seed in seeds]
+	if processes == 1:
+		cards.db.initialize()
+		for task in tasks:
+			writer.write(_play(task))
+		return len(tasks)
+
+	processes = processes or multiprocessing.cpu_count()
+	chunksize = max(1, len(tasks) // (processes * 8))
+	with multiprocessing.Pool(processes, _init_worker, (verbose, )) as pool:
+		for result in pool.imap(_play, tasks, chunksize):
+			writer.write(result)
+	return len(tasks)
+
+
+def main(argv=None):
+	arguments = argparse.ArgumentParser(prog="fireplace.sim", description=__doc__.split("\n\n")[0])
+	arguments.add_argument("-n", "--games", type=int, default=100, help="Number of games to play")
+	arguments.add_argument("-s", "--seed", type=int, default=0, help="Seed of the first game")
+	arguments.add_argument("-p", "--processes", type=int, help="Number of worker processes")
+	arguments.add_argument("--max-turns", type=int, default=100)
+	for i in (1, 2):
+		arguments.add_argument("--hero%i" % (i), help="Hero name or card id (random if missing)")
+		arguments.add_argument("--deck%i" % (i), help="Deck list file (random draft if missing)")
+		arguments.add_argument(
+			"--agent%i" % (i), default="fireplace.sim:RandomAgent", help="Agent class (module:Class)"
+		)
+	arguments.add_argument("-o", "--output", default="-", help="Output file (default: stdout)")
+	arguments.add_argument("-f", "--format", choices=sorted(WRITERS), help="Output format (default: from extension)")
+	arguments.add_argument("-v", "--verbose", action="store_true", help="Log game actions")
+	args = arguments.parse_args(argv)
+	get_logger("fireplace", logging.DEBUG if args.verbose else logging.ERROR)
+
+	heroes = [get_hero(hero) if hero else None for hero in (args.hero1, args.hero2)]
+	decks = [load_deck(deck) if deck else None for deck in (args.deck1, args.deck2)]
+	agents = (args.agent1, args.agent2)
+	for agent in agents:
+		load_agent(agent)
+	format = args.format or ("csv" if args.output.endswith(".csv") else "jsonl")
+	seeds = range(args.seed, args.seed + args.games)
+
+	stream = sys.stdout if args.output == "-" else open(args.output, "w", newline="")
+	try:
+		start = time.perf_counter()
+		count = simulate(
+			seeds, WRITERS[format](stream), heroes, decks, agents,
+			args.max_turns, args.processes, args.verbose,
+		)
+		elapsed = time.perf_counter() - start
+	finally:
+		if stream is not sys.stdout:
+			stream.close()
+
+	sys.stderr.write("%i games in %.2fs (%.1f games/sec)\n" % (count, elapsed, count / elapsed))
+
+
+if __name__ == "__main__":
+	main()
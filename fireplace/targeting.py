@@ -12,77 +12,163 @@ TARGETING_PREREQUISITES = (
 	PlayReq.REQ_TARGET_IF_AVAILABLE_AND_MINIMUM_FRIENDLY_MINIONS,
 )
 
+FRIENDLY, ENEMY = "source.controller", "source.controller.opponent"
+
+# Candidate targets by kind of characters and controller (None for both players)
+CANDIDATES = {
+	(None, None): "source.game.characters",
+	(None, FRIENDLY): FRIENDLY + ".characters",
+	(None, ENEMY): ENEMY + ".characters",
+	(CardType.MINION, None): "source.game.board",
+	(CardType.MINION, FRIENDLY): FRIENDLY + ".field",
+	(CardType.MINION, ENEMY): ENEMY + ".field",
+	(CardType.HERO, None): "_heroes(source.game.players)",
+	(CardType.HERO, FRIENDLY): "_heroes((%s, ))" % (FRIENDLY),
+	(CardType.HERO, ENEMY): "_heroes((%s, ))" % (ENEMY),
+}
+
+# Conditions on the target of each requirement, formatted with its parameter
+REQUIREMENT_TESTS = {
+	PlayReq.REQ_MINION_TARGET: "target.type == MINION",
+	PlayReq.REQ_FRIENDLY_TARGET: "target.controller == source.controller",
+	PlayReq.REQ_ENEMY_TARGET: "target.controller != source.controller",
+	PlayReq.REQ_DAMAGED_TARGET: "target.damage",
+	PlayReq.REQ_TARGET_MAX_ATTACK: "not target.atk > %s",
+	PlayReq.REQ_TARGET_WITH_RACE: "(target.type == MINION and target.race == %s)",
+	PlayReq.REQ_HERO_TARGET: "target.type == HERO",
+	PlayReq.REQ_TARGET_MIN_ATTACK: "not target.atk < %s",
+	PlayReq.REQ_MUST_TARGET_TAUNTER: "target.taunt",
+	PlayReq.REQ_UNDAMAGED_TARGET: "not target.damage",
+	PlayReq.REQ_LEGENDARY_TARGET: "target.rarity == LEGENDARY",
+	PlayReq.REQ_TARGET_WITH_BATTLECRY: "target.has_battlecry",
+	PlayReq.REQ_TARGET_WITH_DEATHRATTLE: "target.has_deathrattle",
+}
+
+
+def _heroes(players):
+	return [player.hero for player in players if player.hero]
+
+
+class Targeting:
+	"""
+	The targeting of cards of type \a type with the PlayReq \a requirements,
+	compiled into two functions:
+	- is_valid_target(source, target): whether \a source can target \a target
+	- targets(source): the characters \a source can target, in game order
+	"""
+	def __init__(self, requirements, type):
+		self.requirements = requirements
+		self.type = type
+		# Whether the card can ever target other entities
+		self.can_target = any(req in requirements for req in TARGETING_PREREQUISITES)
+		if not self.can_target:
+			self.is_valid_target = lambda source, target: False
+			self.targets = lambda source: []
+			return
+
+		self.namespace = {
+			"_heroes": _heroes,
+			"HERO": CardType.HERO,
+			"MINION": CardType.MINION,
+			"LEGENDARY": Rarity.LEGENDARY,
+		}
+		kind = side = None
+		if PlayReq.REQ_MINION_TARGET in requirements or PlayReq.REQ_TARGET_WITH_RACE in requirements:
+			kind = CardType.MINION
+		elif PlayReq.REQ_HERO_TARGET in requirements:
+			kind = CardType.HERO
+		if PlayReq.REQ_FRIENDLY_TARGET in requirements:
+			side = FRIENDLY
+		elif PlayReq.REQ_ENEMY_TARGET in requirements:
+			side = ENEMY
+
+		self.is_valid_target = eval(
+			"lambda source, target: %s" % (self.compile_test()), self.namespace
+		)
+		# The candidates only hold the characters of the kind and side
+		# required, which need not be checked again.
+		self.targets = eval(
+			"lambda source: [target for target in %s if %s]" % (
+				CANDIDATES[kind, side], self.compile_test(kind, side)
+			),
+			self.namespace
+		)
+
+	def __repr__(self):
+		return "<%s %r>" % (self.__class__.__name__, self.requirements)
+
+	def const(self, value):
+		name = "_k%i" % (len(self.namespace))
+		self.namespace[name] = value
+		return name
+
+	def compile_test(self, kind=None, side=None):
+		"""
+		Returns the source of the test of the targets, knowing that they are
+		characters of type \a kind controlled by the \a side player if set.
+		"""
+		def unless_friendly(test):
+			# The test only applies to the targets of the opponent
+			if side == FRIENDLY:
+				return None
+			if side == ENEMY:
+				return "not %s" % (test)
+			return "(not %s or target.controller == source.controller)" % (test)
+
+		# Battlecries can never target themselves, and only some minions can
+		# be targeted at all.
+		ret = ["target is not source"]
+		minion = ["not target.dead", unless_friendly("target.stealthed"), unless_friendly("target.immune")]
+		if self.type == CardType.SPELL:
+			minion.append("not target.cant_be_targeted_by_abilities")
+		elif self.type == CardType.HERO_POWER:
+			minion.append("not target.cant_be_targeted_by_hero_powers")
+		minion = [test for test in minion if test]
+		if kind == CardType.MINION:
+			ret += minion
+		elif kind is None:
+			ret.append("(target.type != MINION or (%s))" % (" and ".join(minion)))
+		ret.append(unless_friendly("target.cant_be_targeted_by_opponents"))
+		ret = [test for test in ret if test]
+
+		# Requirements implied by the candidates are left out
+		implied = {
+			CardType.MINION: PlayReq.REQ_MINION_TARGET,
+			CardType.HERO: PlayReq.REQ_HERO_TARGET,
+			FRIENDLY: PlayReq.REQ_FRIENDLY_TARGET,
+			ENEMY: PlayReq.REQ_ENEMY_TARGET,
+		}
+		implied = (implied.get(kind), implied.get(side))
+		for req, param in self.requirements.items():
+			test = REQUIREMENT_TESTS.get(req)
+			if test is None or req in implied:
+				continue
+			if "%s" in test:
+				test = test % (self.const(param))
+			ret.append(test)
+
+		return "(%s)" % (" and ".join(ret))
+
+
+_compiled = {}
+
+
+def compile_requirements(requirements, type):
+	"""
+	Returns the Targeting of \a requirements for cards of type \a type,
+	shared by all the cards with the same requirements and type.
+	"""
+	key = (tuple(sorted(requirements.items())), type)
+	ret = _compiled.get(key)
+	if ret is None:
+		ret = _compiled[key] = Targeting(requirements, type)
+	return ret
+
 
 # Requirements-based targeting
 def is_valid_target(self, target, requirements=None):
-	if target is self:
-		# Battlecries can never target themselves
-		return False
-
-	if target.type == CardType.MINION:
-		if target.dead:
-			return False
-		if target.stealthed and self.controller != target.controller:
-			return False
-		if target.immune and self.controller != target.controller:
-			return False
-		if self.type == CardType.SPELL and target.cant_be_targeted_by_abilities:
-			return False
-		if self.type == CardType.HERO_POWER and target.cant_be_targeted_by_hero_powers:
-			return False
-
-	if target.cant_be_targeted_by_opponents and self.controller != target.controller:
-		return False
-
 	if requirements is None:
-		requirements = self.requirements
-
-	# Check if the entity can ever target other entities
-	for req in TARGETING_PREREQUISITES:
-		if req in requirements:
-			break
+		targeting = self.targeting
 	else:
-		return False
-
-	for req, param in requirements.items():
-		if req == PlayReq.REQ_MINION_TARGET:
-			if target.type != CardType.MINION:
-				return False
-		elif req == PlayReq.REQ_FRIENDLY_TARGET:
-			if target.controller != self.controller:
-				return False
-		elif req == PlayReq.REQ_ENEMY_TARGET:
-			if target.controller == self.controller:
-				return False
-		elif req == PlayReq.REQ_DAMAGED_TARGET:
-			if not target.damage:
-				return False
-		elif req == PlayReq.REQ_TARGET_MAX_ATTACK:
-			if target.atk > param or 0:
-				return False
-		elif req == PlayReq.REQ_TARGET_WITH_RACE:
-			if target.type != CardType.MINION or target.race != param:
-				return False
-		elif req == PlayReq.REQ_HERO_TARGET:
-			if target.type != CardType.HERO:
-				return False
-		elif req == PlayReq.REQ_TARGET_MIN_ATTACK:
-			if target.atk < param or 0:
-				return False
-		elif req == PlayReq.REQ_MUST_TARGET_TAUNTER:
-			if not target.taunt:
-				return False
-		elif req == PlayReq.REQ_UNDAMAGED_TARGET:
-			if target.damage:
-				return False
-		elif req == PlayReq.REQ_LEGENDARY_TARGET:
-			if target.rarity != Rarity.LEGENDARY:
-				return False
-		elif req == PlayReq.REQ_TARGET_WITH_BATTLECRY:
-			if not target.has_battlecry:
-				return False
-		elif req == PlayReq.REQ_TARGET_WITH_DEATHRATTLE:
-			if not target.has_deathrattle:
-				return False
-
-	return True
+		targeting = compile_requirements(requirements, self.type)
+	return targeting.is_valid_target(self, target)
@@ -1,4 +1,5 @@
 import os.path
+import random
 from importlib import import_module
 from pkgutil import iter_modules
 
@@ -11,7 +12,37 @@ CARD_SETS = [cs for _, cs, ispkg in iter_modules([_cards_module]) if ispkg]
 _custom_cards = {}
 
 
+def _journaled(name):
+	"""
+	Returns the list method \a name, saving the list to its journal first
+	"""
+	method = getattr(list, name)
+
+	def func(self, *args, **kwargs):
+		if self._journal is not None:
+			self._journal.save_list(self)
+		return method(self, *args, **kwargs)
+	func.__name__ = name
+	return func
+
+
 class CardList(list):
+	# Journal recording the in-place changes to the list, if any
+	# (see fireplace.journal)
+	_journal = None
+
+	append = _journaled("append")
+	clear = _journaled("clear")
+	extend = _journaled("extend")
+	insert = _journaled("insert")
+	pop = _journaled("pop")
+	reverse = _journaled("reverse")
+	sort = _journaled("sort")
+	__delitem__ = _journaled("__delitem__")
+	__iadd__ = _journaled("__iadd__")
+	__imul__ = _journaled("__imul__")
+	__setitem__ = _journaled("__setitem__")
+
 	def __contains__(self, x):
 		for item in self:
 			if x is item:
@@ -58,11 +89,11 @@ class CardList(list):
 		return self.__class__(e for k, v in kwargs.items() for e in self if getattr(e, k, 0) == v)
 
 
-def random_draft(hero, exclude=[]):
+def random_draft(hero, exclude=[], rng=random):
 	"""
 	Return a deck of 30 random cards from the \a hero's collection
+	Cards are picked with \a rng, eg. a game's random number generator.
 	"""
-	import random
 	from . import cards
 	from .deck import Deck
 	from hearthstone.enums import CardType, Rarity
@@ -85,7 +116,7 @@ def random_draft(hero, exclude=[]):
 		collection.append(cls)
 
 	while len(deck) < Deck.MAX_CARDS:
-		card = random.choice(collection)
+		card = rng.choice(collection)
 		if card.rarity == Rarity.LEGENDARY and card.id in deck:
 			continue
 		elif deck.count(card.id) < Deck.MAX_UNIQUE_CARDS:
@@ -1,15 +1,18 @@
 #!/usr/bin/env python
+import asyncio
 import json
 import logging
-import random
-import socketserver
 import struct
 import sys
 from argparse import ArgumentParser
+from itertools import chain
 from hearthstone.enums import CardType, GameTag, OptionType, Zone
+from fireplace import legal
+from fireplace.exceptions import GameOver, InvalidAction
 from fireplace.game import BaseGame as Game
 from fireplace.player import Player
 from fireplace.utils import CardList
+from protocol import BinaryEncoder, FrameBuffer
 
 
 logging.basicConfig(level=logging.DEBUG)
@@ -27,6 +30,26 @@ class KettleSerializer(json.JSONEncoder):
 		return int(o)
 
 
+# Tags of each entity class: (tags by attribute name, tags read from properties)
+_TAG_MAPS = {}
+
+
+def get_tag_map(entity):
+	cls = type(entity)
+	ret = _TAG_MAPS.get(cls)
+	if ret is None:
+		by_attr, derived = {}, []
+		for tag in entity.tags:
+			attr = entity.tags.map[tag]
+			# Property setters store their value in "_" + attr
+			for name in (attr, "_" + attr):
+				by_attr.setdefault(name, []).append(tag)
+			if isinstance(getattr(cls, attr, None), property):
+				derived.append(tag)
+		ret = _TAG_MAPS[cls] = (by_attr, derived)
+	return ret
+
+
 class KettleManager:
 	def __init__(self, game):
 		self.game = game
@@ -41,7 +64,7 @@ class KettleManager:
 
 	def game_step(self, step, next_step):
 		DEBUG("Game.STEP changes to %r (next step is %r)", step, next_step)
-		self.refresh_full_state()
+		self.refresh_changes()
 
 	def add_to_state(self, entity):
 		state = self.game_state[entity.entity_id] = {}
@@ -58,6 +81,7 @@ class KettleManager:
 
 		# Don't have a way of getting entities by ID in fireplace yet
 		state[GameTag.ENTITY_ID] = entity
+		entity.track_changes()
 
 	def refresh_tag(self, entity, tag):
 		state = self.game_state[entity.entity_id]
@@ -84,7 +108,46 @@ class KettleManager:
 		for tag in entity.tags:
 			self.refresh_tag(entity, tag)
 
-		zone_pos = self.get_zone_position(entity)
+		self.refresh_zone_position(entity, self.get_zone_position(entity))
+
+	def refresh_changes(self):
+		"""
+		Queue the tag changes since the last refresh, without reading
+		every tag of every entity:
+		- tags of the attributes set on the entities since then (see
+		  BaseEntity.track_changes()), or all the tags read from
+		  properties if their buffs or aura slots changed
+		- tags read from properties (atk, cost, exhausted...) of the game,
+		  the players and the cards in play or in hand, as those can
+		  depend on the state of any other entity
+		"""
+		game = self.game
+		live = set(map(id, chain(game.entities, game.hands)))
+		positions = self.get_zone_positions()
+		for state in self.game_state.values():
+			entity = state[GameTag.ENTITY_ID]
+			by_attr, derived = get_tag_map(entity)
+			is_live = id(entity) in live
+			changes = entity.pop_changes() if entity._changes else ()
+			if not changes and not is_live and id(entity) not in positions:
+				continue
+
+			tags = set(derived) if is_live else set()
+			for name in changes:
+				if name in ("buffs", "slots"):
+					tags.update(derived)
+				else:
+					tags.update(by_attr.get(name, ()))
+			for tag in sorted(tags):
+				self.refresh_tag(entity, tag)
+
+			zone_pos = positions.get(id(entity))
+			if zone_pos is None and entity.zone == Zone.PLAY:
+				zone_pos = 1
+			self.refresh_zone_position(entity, zone_pos)
+
+	def refresh_zone_position(self, entity, zone_pos):
+		state = self.game_state[entity.entity_id]
 		if zone_pos != state.get(GameTag.ZONE_POSITION):
 			if zone_pos:
 				state[GameTag.ZONE_POSITION] = zone_pos
@@ -92,55 +155,50 @@ class KettleManager:
 				del state[GameTag.ZONE_POSITION]
 			self.tag_change(entity, GameTag.ZONE_POSITION, zone_pos)
 
-	def get_options(self, entity):
-		ret = []
-		if entity.zone == Zone.HAND:
-			if entity.type in (CardType.SPELL, CardType.MINION, CardType.WEAPON):
-				if entity.is_playable():
-					ret.append({
-						"Type": OptionType.POWER,
-						"MainOption": {
-							"ID": entity,
-							"Targets": entity.targets,
-						},
-					})
-
-		elif entity.zone == Zone.PLAY:
-			if entity.type == CardType.HERO_POWER:
-				if entity.is_usable():
-					ret.append({
-						"Type": OptionType.POWER,
-						"MainOption": {
-							"ID": entity,
-							"Targets": entity.targets,
-						}
-					})
-			elif entity.type in (CardType.HERO, CardType.MINION):
-				if entity.can_attack():
-					ret.append({
-						"Type": OptionType.POWER,
-						"MainOption": {
-							"ID": entity,
-							"Targets": entity.attack_targets,
-						}
-					})
-
-		return ret
-
-	def refresh_options(self):
+	def update_options(self):
 		DEBUG("Refreshing options...")
 		self.options = [{"Type": OptionType.END_TURN}]
 
-		for entity in self.game.current_player.actionable_entities:
-			for option in self.get_options(entity):
+		# One option per entity, with the targets of all its legal actions
+		options = {}
+		for action in self.game.current_player.legal_actions():
+			if action.kind not in (legal.PLAY, legal.POWER, legal.ATTACK):
+				continue
+			option = options.get(id(action.entity))
+			if option is None:
+				option = options[id(action.entity)] = {
+					"Type": OptionType.POWER,
+					"MainOption": {
+						"ID": action.entity,
+						"Targets": [],
+					},
+				}
 				self.options.append(option)
+			targets = option["MainOption"]["Targets"]
+			# Choose One cards list their targets once per choice
+			if action.target is not None and all(target is not action.target for target in targets):
+				targets.append(action.target)
 
+	def refresh_options(self):
+		self.update_options()
 		payload = {
 			"Type": "Options",
 			"Options": self.options,
 		}
 		self.queued_data.append(payload)
 
+	def get_zone_positions(self):
+		"""
+		Returns the ZONE_POSITION of the cards in hand and on the field,
+		by id() of the card
+		"""
+		ret = {}
+		for player in self.game.players:
+			for cards in (player.hand, player.field):
+				for i, card in enumerate(cards, 1):
+					ret[id(card)] = i
+		return ret
+
 	def get_zone_position(self, entity):
 		if entity.zone == Zone.HAND:
 			return entity.controller.hand.index(entity) + 1
@@ -233,63 +291,138 @@ class KettleManager:
 		}
 
 
-class Kettle(socketserver.BaseRequestHandler):
-	def handle(self):
-		data = self.read_packet()
-		data = data[0]
+class Kettle:
+	"""
+	Serves one game per connection. Every connection is a coroutine on
+	the same event loop, so a process can hold thousands of games, most
+	of which are idle waiting for their client's next option.
+	* \a timeout: seconds to wait for a client packet before dropping it
+	* \a game_timeout: maximum duration of a game, in seconds
+	* \a max_games: games played at once; new games wait for a free slot
+	* \a max_packet_size: larger client packets close the connection
+	* \a read_size: maximum number of bytes read from a socket at once
+	"""
+	def __init__(self, timeout=300, game_timeout=3600, max_games=10000, max_packet_size=1 << 20, read_size=65536):
+		self.timeout = timeout
+		self.read_size = read_size
+		self.game_timeout = game_timeout
+		self.max_packet_size = max_packet_size
+		self.slots = asyncio.Semaphore(max_games)
+		self.serializer = KettleSerializer()
+		self.games = 0
+
+	async def handle(self, reader, writer):
+		peer = writer.get_extra_info("peername")
+		try:
+			await asyncio.wait_for(self.play(reader, writer), self.game_timeout)
+		except asyncio.TimeoutError:
+			WARN("Game with %r timed out", peer)
+		except ConnectionError:
+			DEBUG("Connection with %r lost", peer)
+		except Exception:
+			KettleLogger.exception("Error in game with %r", peer)
+		finally:
+			writer.close()
+
+	async def play(self, reader, writer):
+		frames = FrameBuffer(max_frame_size=self.max_packet_size)
+		packets = await self.read_packets(reader, frames)
+		if packets is None:
+			return
+		data = packets.pop(0)[0]
 		query_type = data["Type"]
 		payload = data[query_type]
 		DEBUG("Got payload %r", payload)
 		assert query_type == "CreateGame"
 
-		self.serializer = KettleSerializer()
-		manager = self.create_game(payload)
-
+		encode = self.get_encoder(payload.get("Encoding", "json"))
+		async with self.slots:
+			self.games += 1
+			try:
+				manager = self.create_game(payload)
+				await self.play_game(manager, reader, writer, frames, encode, packets)
+			finally:
+				self.games -= 1
+
+	def get_encoder(self, encoding):
+		"""
+		Returns a function encoding payload lists to packet bodies in the
+		\a encoding requested by the client ("Encoding" of CreateGame)
+		"""
+		if encoding == "json":
+			return lambda payloads: self.serializer.encode(payloads).encode("utf-8")
+		elif encoding == "binary":
+			# String table of the connection
+			return BinaryEncoder(self.serializer.default).encode
+		raise NotImplementedError("Unknown encoding: %r" % (encoding))
+
+	async def play_game(self, manager, reader, writer, frames, encode, packets=None):
 		while True:
-			manager.refresh_full_state()
+			manager.refresh_changes()
 			manager.refresh_options()
-			self.send_payload(manager)
-			packet = self.read_packet()
-			if packet is None:
-				break
-
-			if packet["Type"] == "SendOption":
-				manager.process_send_option(packet["SendOption"])
-			else:
-				raise NotImplementedError
-
-			self.send_payload(manager)
-
-	def read_packet(self):
-		header = self.request.recv(4)
-		if not header:
-			return None
-		body_size, = struct.unpack("<i", header)
-		data = self.request.recv(body_size)
-		DEBUG("Got data %r", data)
-		return json.loads(data.decode("utf-8"))
-
-	def send_payload(self, manager):
-		serialized = self.serializer.encode(manager.queued_data).encode("utf-8")
+			await self.send_payload(writer, manager, encode)
+			if not packets:
+				packets = await self.read_packets(reader, frames)
+				if packets is None:
+					break
+
+			# Options pipelined by the client are played in a row, each one
+			# picked from the options left by the previous one. The state is
+			# then sent once for all of them.
+			for i, packet in enumerate(packets):
+				if packet["Type"] != "SendOption":
+					raise NotImplementedError
+				if i:
+					manager.update_options()
+				try:
+					manager.process_send_option(packet["SendOption"])
+				except GameOver:
+					manager.refresh_changes()
+					await self.send_payload(writer, manager, encode)
+					INFO("Game over: %r", manager.game)
+					return
+				except InvalidAction as e:
+					WARN("Invalid option %r: %s", packet["SendOption"], e)
+			packets = None
+
+	async def read_packets(self, reader, frames):
+		"""
+		Returns the packets received from the client, waiting until at
+		least one is complete, or None once the client has disconnected.
+		"""
+		while True:
+			packets = [json.loads(str(frame, "utf-8")) for frame in frames.pop()]
+			if packets:
+				DEBUG("Got packets %r", packets)
+				return packets
+			data = await asyncio.wait_for(reader.read(self.read_size), self.timeout)
+			if not data:
+				if frames:
+					WARN("Client disconnected in the middle of a packet")
+				return None
+			frames.feed(data)
+
+	async def send_payload(self, writer, manager, encode):
+		serialized = encode(manager.queued_data)
 		manager.queued_data = []
-		response_payload = struct.pack("<i", len(serialized)) + serialized
-		DEBUG("Sending %r" % (response_payload))
-		self.request.sendall(response_payload)
+		DEBUG("Sending %r", serialized)
+		writer.write(struct.pack("<i", len(serialized)))
+		writer.write(serialized)
+		# Backpressure: hold the game until a slow client catches up
+		await asyncio.wait_for(writer.drain(), self.timeout)
 
 	def create_game(self, payload):
 		# self.game_id = payload["GameID"]
 		player_data = payload["Players"]
-		players = []
-		for player in player_data:
-			p = Player(player["Name"])
+		players = [Player(player["Name"]) for player in player_data]
+		game = Game(players=players)
+		for p, player in zip(players, player_data):
 			# Shuffle the cards to prevent information leaking
 			cards = player["Cards"]
-			random.shuffle(cards)
+			game.random.shuffle(cards)
 			p.prepare_deck(cards, player["Hero"])
-			players.append(p)
 
 		INFO("Initializing a Kettle game with players=%r", players)
-		game = Game(players=players)
 		manager = KettleManager(game)
 		game.manager.register(manager)
 		game.current_player = game.players[0]  # Dumb.
@@ -302,16 +435,36 @@ class Kettle(socketserver.BaseRequestHandler):
 		return manager
 
 
+async def serve(hostname, port, **kwargs):
+	kettle = Kettle(**kwargs)
+	server = await asyncio.start_server(kettle.handle, hostname, port, backlog=1024, reuse_address=True)
+	INFO("Listening on %s:%i..." % (hostname, port))
+	async with server:
+		await server.serve_forever()
+
+
 def main():
 	arguments = ArgumentParser(prog="kettle")
 	arguments.add_argument("hostname", default="127.0.0.1", nargs="?")
 	arguments.add_argument("port", type=int, default=9111, nargs="?")
+	arguments.add_argument("--timeout", type=float, default=300, help="Idle client timeout, in seconds")
+	arguments.add_argument("--game-timeout", type=float, default=3600, help="Maximum game duration, in seconds")
+	arguments.add_argument("--max-games", type=int, default=10000, help="Maximum number of games played at once")
+	arguments.add_argument("-q", "--quiet", action="store_true", help="Only log warnings and errors")
 	args = arguments.parse_args(sys.argv[1:])
 
-	INFO("Listening on %s:%i..." % (args.hostname, args.port))
-	socketserver.TCPServer.allow_reuse_address = True
-	kettle = socketserver.TCPServer((args.hostname, args.port), Kettle)
-	kettle.serve_forever()
+	if args.quiet:
+		KettleLogger.setLevel(logging.WARNING)
+	else:
+		logging.getLogger("fireplace").setLevel(logging.DEBUG)
+
+	try:
+		asyncio.run(serve(
+			args.hostname, args.port, timeout=args.timeout,
+			game_timeout=args.game_timeout, max_games=args.max_games,
+		))
+	except KeyboardInterrupt:
+		pass
 
 	return 0
 
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+"""
+Kettle load test client
+
+Opens many connections to a Kettle server at once: active games, which
+send random options as fast as they get answers, and idle games, which
+create a game and wait. Reports the connections held and the latency of
+option responses (time from SendOption until the next Options payload).
+"""
+import asyncio
+import json
+import random
+import struct
+import sys
+import time
+from argparse import ArgumentParser
+from fireplace import cards
+from fireplace.cards.heroes import MAGE, WARRIOR
+from fireplace.utils import random_draft
+from protocol import BinaryDecoder
+
+
+class Stats:
+	def __init__(self):
+		self.connections = 0
+		self.max_connections = 0
+		self.games = 0
+		self.errors = 0
+		self.latencies = []
+
+	def connect(self):
+		self.connections += 1
+		self.max_connections = max(self.max_connections, self.connections)
+
+	def disconnect(self):
+		self.connections -= 1
+
+	def percentile(self, p):
+		if not self.latencies:
+			return 0.0
+		latencies = sorted(self.latencies)
+		return latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))]
+
+
+async def read_packet(reader, decoder=None):
+	header = await reader.readexactly(4)
+	body_size, = struct.unpack("<i", header)
+	data = await reader.readexactly(body_size)
+	if decoder is not None:
+		return decoder.decode(data)
+	return json.loads(data.decode("utf-8"))
+
+
+def send_packet(writer, packet):
+	data = json.dumps(packet).encode("utf-8")
+	writer.write(struct.pack("<i", len(data)) + data)
+
+
+async def read_options(reader, decoder):
+	"""
+	Read payloads until the server sends the available options
+	"""
+	while True:
+		for payload in await read_packet(reader, decoder):
+			if payload["Type"] == "Options":
+				return payload["Options"]
+
+
+def create_game(decks, encoding):
+	players = []
+	for i, (hero, deck) in enumerate(decks, 1):
+		players.append({"Name": "Player%i" % (i), "Hero": hero, "Cards": deck[:]})
+	return [{"Type": "CreateGame", "CreateGame": {"Players": players, "Encoding": encoding}}]
+
+
+async def play(host, port, stats, rng, decks, options, idle, encoding):
+	reader, writer = await asyncio.open_connection(host, port)
+	decoder = BinaryDecoder() if encoding == "binary" else None
+	stats.connect()
+	try:
+		send_packet(writer, create_game(decks, encoding))
+		await writer.drain()
+		available = await read_options(reader, decoder)
+		if idle:
+			await idle.wait()
+			return
+
+		for i in range(options):
+			index = rng.randrange(len(available))
+			option = available[index]
+			target = 0
+			targets = option.get("MainOption", {}).get("Targets")
+			if isinstance(targets, list) and targets:
+				target = rng.choice(targets)
+			start = time.perf_counter()
+			send_packet(writer, {"Type": "SendOption", "SendOption": {"Index": index, "Target": target}})
+			await writer.drain()
+			available = await read_options(reader, decoder)
+			stats.latencies.append(time.perf_counter() - start)
+		stats.games += 1
+	except asyncio.IncompleteReadError:
+		# Game over
+		stats.games += 1
+	except (ConnectionError, OSError):
+		stats.errors += 1
+	finally:
+		stats.disconnect()
+		writer.close()
+
+
+async def run(args):
+	stats = Stats()
+	rng = random.Random(args.seed)
+	decks = [(MAGE, random_draft(MAGE, rng=rng)), (WARRIOR, random_draft(WARRIOR, rng=rng))]
+	idle = asyncio.Event()
+	clients = []
+	for i in range(args.idle):
+		clients.append(play(args.hostname, args.port, stats, random.Random(i), decks, 0, idle, args.encoding))
+	active = [
+		play(
+			args.hostname, args.port, stats, random.Random(args.seed + i),
+			decks, args.options, None, args.encoding,
+		)
+		for i in range(args.games)
+	]
+
+	start = time.perf_counter()
+	idle_games = asyncio.ensure_future(asyncio.gather(*clients, return_exceptions=True))
+	results = await asyncio.gather(*active, return_exceptions=True)
+	held = stats.max_connections
+	idle.set()
+	results += await idle_games
+	elapsed = time.perf_counter() - start
+	stats.errors += sum(1 for result in results if isinstance(result, Exception))
+
+	print("connections: %i (max held: %i), errors: %i" % (args.games + args.idle, held, stats.errors))
+	print("games: %i in %.2fs, options: %i (%.1f options/sec)" % (
+		stats.games, elapsed, len(stats.latencies), len(stats.latencies) / elapsed
+	))
+	print("option latency: p50 %.1fms, p99 %.1fms, max %.1fms" % (
+		stats.percentile(50) * 1000, stats.percentile(99) * 1000, stats.percentile(100) * 1000
+	))
+
+
+def main():
+	arguments = ArgumentParser(prog="kettle.loadtest", description=__doc__.strip().split("\n\n")[0])
+	arguments.add_argument("hostname", default="127.0.0.1", nargs="?")
+	arguments.add_argument("port", type=int, default=9111, nargs="?")
+	arguments.add_argument("-n", "--games", type=int, default=100, help="Number of active games")
+	arguments.add_argument("-i", "--idle", type=int, default=0, help="Number of idle games")
+	arguments.add_argument("-o", "--options", type=int, default=50, help="Options sent per active game")
+	arguments.add_argument("-s", "--seed", type=int, default=0)
+	arguments.add_argument("-e", "--encoding", choices=("json", "binary"), default="json")
+	args = arguments.parse_args(sys.argv[1:])
+
+	cards.db.initialize()
+	asyncio.run(run(args))
+	return 0
+
+
+if __name__ == "__main__":
+	exit(main())
@@ -0,0 +1,290 @@
+"""
+Kettle packet framing and binary payload encoding
+
+Packets are framed by their length (int32 little-endian) followed by
+their body (see FrameBuffer).
+A binary packet body is the same list of payloads as a JSON packet, as a
+sequence of records, each starting with its kind (uint8). Integers are
+little-endian int32 unless noted otherwise.
+
+- STRING: uint16 length, utf-8 bytes. Adds a string to the table of the
+  connection; later records refer to it by its index in the table.
+- TAG_CHANGES: uint32 count, then (entity id, tag, value) triples.
+  A value of NULL stands for null (eg. a removed ZONE_POSITION).
+- ENTITY: uint8 payload type (FullEntity, GameEntity, Player), entity id,
+  card id string index (FullEntity only), uint16 count, (tag, value) pairs.
+- OPTIONS: uint16 count, then per option its type, uint8 1 if it has a
+  main option, followed by the entity id and uint16 count of targets and
+  their entity ids.
+- JSON: uint32 length, utf-8 JSON of one payload that does not fit the
+  records above.
+
+Decoding gives the payloads as json.loads() would from the JSON packet,
+including tag numbers as string keys.
+"""
+import json
+import struct
+
+
+STRING, TAG_CHANGES, ENTITY, OPTIONS, JSON = range(1, 6)
+ENTITY_TYPES = ("FullEntity", "GameEntity", "Player")
+NULL = -0x80000000
+
+_int = struct.Struct("<i")
+_uint16 = struct.Struct("<H")
+_uint32 = struct.Struct("<I")
+_triple = struct.Struct("<iii")
+_pair = struct.Struct("<ii")
+_header = struct.Struct("<BB")
+
+
+class BinaryEncoder:
+	"""
+	Encodes payload lists to binary packet bodies for one connection.
+	Objects other than ints (entities) are converted by \a default,
+	as by json.JSONEncoder.default().
+	"""
+	def __init__(self, default=int):
+		self.default = default
+		self.strings = {}
+		# Serializes payloads not fitting any record
+		self.json = json.JSONEncoder(default=default)
+
+	def int(self, value):
+		if value is None:
+			return NULL
+		if type(value) is not int:
+			return int(self.default(value))
+		return value
+
+	def string(self, buf, s):
+		index = self.strings.get(s)
+		if index is None:
+			data = s.encode("utf-8")
+			index = self.strings[s] = len(self.strings)
+			buf.append(STRING)
+			buf += _uint16.pack(len(data))
+			buf += data
+		return index
+
+	def encode(self, payloads):
+		buf = bytearray()
+		changes = []
+		for payload in payloads:
+			type = payload["Type"]
+			if type == "TagChange":
+				change = payload["TagChange"]
+				changes.append((change["EntityID"], change["Tag"], change["Value"]))
+				continue
+			if changes:
+				self.encode_tag_changes(buf, changes)
+				changes = []
+			try:
+				record = bytearray()
+				if type in ENTITY_TYPES:
+					self.encode_entity(record, type, payload[type], buf)
+				elif type == "Options":
+					self.encode_options(record, payload["Options"])
+				else:
+					raise ValueError(type)
+			except (AttributeError, KeyError, TypeError, ValueError, struct.error):
+				record = self.encode_json(payload)
+			buf += record
+		if changes:
+			self.encode_tag_changes(buf, changes)
+		return bytes(buf)
+
+	def encode_json(self, payload):
+		data = self.json.encode(payload).encode("utf-8")
+		return bytearray([JSON]) + _uint32.pack(len(data)) + data
+
+	def encode_tag_changes(self, buf, changes):
+		record = bytearray([TAG_CHANGES])
+		record += _uint32.pack(len(changes))
+		pack = _triple.pack
+		try:
+			for entity, tag, value in changes:
+				record += pack(self.int(entity), self.int(tag), self.int(value))
+		except (TypeError, ValueError, struct.error):
+			for entity, tag, value in changes:
+				record = self.encode_json({
+					"Type": "TagChange",
+					"TagChange": {"EntityID": entity, "Tag": tag, "Value": value},
+				})
+				buf += record
+			return
+		buf += record
+
+	def encode_entity(self, buf, type, entity, strings):
+		string = None
+		if type == "FullEntity":
+			# Strings go to the packet before the record using them, even if
+			# the record falls back to JSON: the decoder adds them all.
+			string = self.string(strings, entity["CardID"])
+		buf += _header.pack(ENTITY, ENTITY_TYPES.index(type))
+		buf += _int.pack(self.int(entity["EntityID"]))
+		if string is not None:
+			buf += _uint32.pack(string)
+		tags = entity["Tags"]
+		buf += _uint16.pack(len(tags))
+		for tag, value in tags.items():
+			buf += _pair.pack(self.int(tag), self.int(value))
+
+	def encode_options(self, buf, options):
+		buf.append(OPTIONS)
+		buf += _uint16.pack(len(options))
+		for option in options:
+			main = option.get("MainOption")
+			if set(option) - {"Type", "MainOption"}:
+				raise ValueError(option)
+			buf += _int.pack(self.int(option["Type"]))
+			if main is None:
+				buf.append(0)
+				continue
+			targets = main["Targets"]
+			if not isinstance(targets, list) or set(main) != {"ID", "Targets"}:
+				raise ValueError(main)
+			buf.append(1)
+			buf += _int.pack(self.int(main["ID"]))
+			buf += _uint16.pack(len(targets))
+			for target in targets:
+				buf += _int.pack(self.int(target))
+
+
+class BinaryDecoder:
+	"""
+	Decodes the binary packet bodies of one connection
+	"""
+	def __init__(self):
+		self.strings = []
+
+	def decode(self, data):
+		data = memoryview(data)
+		ret = []
+		offset = 0
+		while offset < len(data):
+			kind = data[offset]
+			offset += 1
+			if kind == STRING:
+				size, = _uint16.unpack_from(data, offset)
+				offset += 2
+				self.strings.append(str(data[offset:offset + size], "utf-8"))
+				offset += size
+			elif kind == TAG_CHANGES:
+				count, = _uint32.unpack_from(data, offset)
+				offset += 4
+				for entity, tag, value in _triple.iter_unpack(data[offset:offset + count * 12]):
+					ret.append({"Type": "TagChange", "TagChange": {
+						"EntityID": entity,
+						"Tag": tag,
+						"Value": None if value == NULL else value,
+					}})
+				offset += count * 12
+			elif kind == ENTITY:
+				offset = self.decode_entity(data, offset, ret)
+			elif kind == OPTIONS:
+				offset = self.decode_options(data, offset, ret)
+			elif kind == JSON:
+				size, = _uint32.unpack_from(data, offset)
+				offset += 4
+				ret.append(json.loads(str(data[offset:offset + size], "utf-8")))
+				offset += size
+			else:
+				raise ValueError("Unknown record kind %r at offset %i" % (kind, offset - 1))
+		return ret
+
+	def decode_entity(self, data, offset, ret):
+		type = ENTITY_TYPES[data[offset]]
+		entity_id, = _int.unpack_from(data, offset + 1)
+		offset += 5
+		entity = {"EntityID": entity_id}
+		if type == "FullEntity":
+			string, = _uint32.unpack_from(data, offset)
+			entity["CardID"] = self.strings[string]
+			offset += 4
+		count, = _uint16.unpack_from(data, offset)
+		offset += 2
+		tags = entity["Tags"] = {}
+		for tag, value in _pair.iter_unpack(data[offset:offset + count * 8]):
+			# JSON object keys are strings
+			tags[str(tag)] = None if value == NULL else value
+		ret.append({"Type": type, type: entity})
+		return offset + count * 8
+
+	def decode_options(self, data, offset, ret):
+		count, = _uint16.unpack_from(data, offset)
+		offset += 2
+		options = []
+		for i in range(count):
+			type, = _int.unpack_from(data, offset)
+			has_main = data[offset + 4]
+			offset += 5
+			option = {"Type": type}
+			if has_main:
+				entity_id, size = struct.unpack_from("<iH", data, offset)
+				offset += 6
+				targets = [target for target, in _int.iter_unpack(data[offset:offset + size * 4])]
+				offset += size * 4
+				option["MainOption"] = {"ID": entity_id, "Targets": targets}
+			options.append(option)
+		ret.append({"Type": "Options", "Options": options})
+		return offset
+
+
+class FrameBuffer:
+	"""
+	Receive buffer splitting a byte stream into packet bodies. Data can
+	be fed in any pieces: frames split over several reads are kept until
+	complete, and several frames read at once are all returned.
+	The buffer grows to fit the largest frame and is reused.
+	"""
+	def __init__(self, size=4096, max_frame_size=1 << 20):
+		self.buffer = bytearray(size)
+		self.max_frame_size = max_frame_size
+		# Unread data is buffer[start:end]
+		self.start = 0
+		self.end = 0
+
+	def __len__(self):
+		return self.end - self.start
+
+	def reserve(self, size):
+		"""
+		Make room for \a size more bytes after the unread data
+		"""
+		if self.end + size <= len(self.buffer):
+			return
+		pending = self.end - self.start
+		if pending + size > len(self.buffer):
+			buffer = bytearray(max(len(self.buffer) * 2, pending + size))
+		else:
+			buffer = self.buffer
+		buffer[:pending] = self.buffer[self.start:self.end]
+		self.buffer = buffer
+		self.start, self.end = 0, pending
+
+	def feed(self, data):
+		size = len(data)
+		self.reserve(size)
+		self.buffer[self.end:self.end + size] = data
+		self.end += size
+
+	def pop(self):
+		"""
+		Returns the bodies of the complete frames received, as memoryviews
+		of the buffer that are valid until the next feed().
+		"""
+		ret = []
+		view = memoryview(self.buffer)
+		while self.end - self.start >= 4:
+			size, = _int.unpack_from(self.buffer, self.start)
+			if not 0 <= size <= self.max_frame_size:
+				raise ValueError("Invalid frame size: %i" % (size))
+			if self.end - self.start - 4 < size:
+				break
+			start = self.start + 4
+			self.start = start + size
+			ret.append(view[start:self.start])
+		if self.start == self.end:
+			self.start = self.end = 0
+		return ret
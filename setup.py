@@ -13,7 +13,7 @@ CLASSIFIERS = [
 	"License :: OSI Approved :: GNU Affero General Public License v3 or later (AGPLv3+)"
 	"Programming Language :: Python",
 	"Programming Language :: Python :: 3",
-	"Programming Language :: Python :: 3.4",
+	"Programming Language :: Python :: 3.7",
 	"Topic :: Games/Entertainment :: Simulation",
 ]
 
@@ -23,7 +23,9 @@ setup(
 	packages=find_packages(exclude="tests"),
 	package_data={"": ["CardDefs.xml"]},
 	include_package_data=True,
+	python_requires=">=3.7",
 	tests_require=["pytest"],
+	extras_require={"encoder": ["numpy"]},
 	author=fireplace.__author__,
 	author_email=fireplace.__email__,
 	description="Pure-python Hearthstone re-implementation and simulator",
@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+"""
+Benchmark of the card database startup time, in a fresh process each
+time: without the cache, writing the cache and loading the cache.
+"""
+import sys; sys.path.append("..")
+import os
+import subprocess
+import tempfile
+import timeit
+
+
+STARTUP = """
+import sys; sys.path.append("..")
+from fireplace import cards
+cards.db.initialize()
+"""
+
+
+def startup(cache_dir):
+	env = dict(os.environ, FIREPLACE_CACHE_DIR=cache_dir)
+	subprocess.check_call([sys.executable, "-c", STARTUP], env=env, stderr=subprocess.DEVNULL)
+
+
+def main():
+	number = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+	with tempfile.TemporaryDirectory() as cache_dir:
+		cache = os.path.join(cache_dir, "carddb.pickle")
+
+		def cold():
+			if os.path.exists(cache):
+				os.unlink(cache)
+			startup(cache_dir)
+
+		print("%-12s %10s" % ("startup", "seconds"))
+		print("%-12s %10.3f" % ("no cache", timeit.timeit(lambda: startup(""), number=number) / number))
+		print("%-12s %10.3f" % ("cold cache", timeit.timeit(cold, number=number) / number))
+		startup(cache_dir)
+		print("%-12s %10.3f" % ("warm cache", timeit.timeit(lambda: startup(cache_dir), number=number) / number))
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+"""
+Benchmark of long death and trigger chains: Unstable Ghouls killing each
+other one by one, and Knife Jugglers reacting to the summons of the
+Ghoul deathrattles. Reports the time per chain and the deepest Python
+stack reached, and the time of the death sweep following every game
+action on a full board where nothing dies.
+"""
+import sys; sys.path.append("..")
+import timeit
+from utils import *
+
+
+UNSTABLE_GHOUL = "FP1_024"
+KNIFE_JUGGLER = "NEW1_019"
+HAUNTED_CREEPER = "FP1_002"
+
+
+def prepare_board():
+	game = prepare_empty_game()
+	for player in game.players:
+		player.summon(KNIFE_JUGGLER)
+		player.summon(HAUNTED_CREEPER)
+		for health in (1, 1, 2, 3, 4):
+			ghoul = player.summon(UNSTABLE_GHOUL)
+			ghoul.max_health = health
+	return game
+
+
+def chain():
+	game = prepare_board()
+	game.player1.give(MOONFIRE).play(target=game.player1.field[2])
+	return game
+
+
+def stack_depth(func):
+	depth = [0, 0]
+
+	def profile(frame, event, arg):
+		if event == "call":
+			depth[0] += 1
+			depth[1] = max(depth)
+		elif event == "return":
+			depth[0] -= 1
+
+	sys.setprofile(profile)
+	try:
+		func()
+	finally:
+		sys.setprofile(None)
+	return depth[1]
+
+
+def main():
+	number = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+	elapsed = timeit.timeit(chain, number=number)
+	print("%-24s %12.1f" % ("chains/s", number / elapsed))
+	print("%-24s %12i" % ("max stack depth", stack_depth(chain)))
+
+	game = prepare_board()
+	for player in game.players:
+		while len(player.field) < 7:
+			player.summon(WISP)
+	elapsed = timeit.timeit(game.process_deaths, number=number * 100)
+	print("%-24s %12.1f" % ("idle sweeps/s", number * 100 / elapsed))
+
+
+if __name__ == "__main__":
+	main()
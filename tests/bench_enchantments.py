@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+"""
+Benchmark of enchantment-heavy turns: buffs applied by spells and by
+auras, with and without a game observer (such as Kettle) which needs
+every enchantment to be numbered and announced as it is created, and
+with enchantments created as full cards, as before Player.enchantment().
+"""
+import sys; sys.path.append("..")
+import timeit
+import tracemalloc
+from utils import *
+from fireplace.player import Player
+
+
+BLESSING_OF_KINGS = "CS2_092"
+RAID_LEADER = "CS2_122"
+STORMWIND_CHAMPION = "CS2_222"
+
+
+def play_turns(observed):
+	game = prepare_empty_game()
+	if observed:
+		game.manager.register(EntityObserver())
+	for i in range(4):
+		player = game.current_player
+		for id in (RAID_LEADER, STORMWIND_CHAMPION, WISP):
+			player.summon(id)
+		for minion in player.field[-3:]:
+			player.used_mana = 0
+			player.give(BLESSING_OF_KINGS).play(target=minion)
+		game.end_turn()
+	return game
+
+
+def full_card_enchantment(self, id, source=None):
+	# Set aside and numbered on creation, then moved into play by apply()
+	return self.card(id, source)
+
+
+def apply_buffs(observed, number):
+	# Blessing of Kings enchantments applied to a Wisp then destroyed
+	game = prepare_empty_game()
+	if observed:
+		game.manager.register(EntityObserver())
+	wisp = game.player1.summon(WISP)
+
+	def func():
+		wisp.buff(wisp, BLESSING_OF_KINGS + "e").destroy()
+	return timeit.timeit(func, number=number)
+
+
+def main():
+	number = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+	enchantment = Player.enchantment
+	print("%-24s %12s %12s %12s" % ("", "games/s", "KiB/game", "buffs/s"))
+	for name, observed, path in (
+		("full card", False, full_card_enchantment),
+		("observed", True, enchantment),
+		("unobserved", False, enchantment),
+	):
+		Player.enchantment = path
+		elapsed = timeit.timeit(lambda: play_turns(observed), number=number)
+		tracemalloc.start()
+		game = play_turns(observed)
+		size, peak = tracemalloc.get_traced_memory()
+		tracemalloc.stop()
+		buffs = number * 100 / apply_buffs(observed, number * 100)
+		print("%-24s %12.1f %12.1f %12.1f" % (name, number / elapsed, size / 1024, buffs))
+	Player.enchantment = enchantment
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+"""
+Benchmark of the state encoding for ML agents: one dict of tags per
+entity, game by game, versus StateEncoder batches of 1, 64 and 1024 games.
+"""
+import sys; sys.path.append("..")
+import timeit
+from utils import *
+from fireplace.encoder import StateEncoder
+
+
+RAID_LEADER = "CS2_122"
+CHILLWIND_YETI = "CS2_182"
+
+
+def prepare_games(count):
+	games = []
+	for i in range(count):
+		game = prepare_game()
+		for player in game.players:
+			for id in (RAID_LEADER, KOBOLD_GEOMANCER, CHILLWIND_YETI, WISP)[:i % 4 + 1]:
+				player.summon(id)
+		games.append(game)
+	return games
+
+
+def encode_dicts(game):
+	ret = []
+	for player in (game.current_player, game.current_player.opponent):
+		ret.append({
+			"player": dict(player.tags.items()),
+			"hero": dict(player.hero.tags.items()),
+			"board": [dict(minion.tags.items()) for minion in player.field],
+		})
+	ret.append([card.id for card in game.current_player.hand])
+	return ret
+
+
+def main():
+	number = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+	games = prepare_games(8)
+	print("%-24s %12s" % ("", "games/s"))
+	for batch_size in (1, 64, 1024):
+		batch = [games[i % len(games)] for i in range(batch_size)]
+		encoder = StateEncoder(batch_size)
+
+		def dicts():
+			for game in batch:
+				encode_dicts(game)
+
+		elapsed = timeit.timeit(dicts, number=number)
+		print("%-24s %12.1f" % ("dicts (%i)" % (batch_size), number * batch_size / elapsed))
+		elapsed = timeit.timeit(lambda: encoder.encode(batch), number=number)
+		print("%-24s %12.1f" % ("encoder (%i)" % (batch_size), number * batch_size / elapsed))
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+"""
+Benchmark of card entity construction: time and memory per card created
+from its shared prototype (Card()) versus a card holding its own copy of
+the card data, tags, event listeners, tag manager and uuid.
+"""
+import sys; sys.path.append("..")
+import timeit
+import tracemalloc
+from utils import *
+from fireplace.card import Card, _prototypes
+
+
+IDS = (WISP, MOONFIRE, KOBOLD_GEOMANCER, "CS2_122", "CS2_182", "CS2_106", "CS2_092e")
+
+
+def unshared(id):
+	# A card of the base class: every attribute is set on the card
+	data = fireplace.cards.db[id]
+	card = _prototypes[id].__mro__[1](data)
+	# Created with every card before the prototypes
+	card.tags
+	card.uuid
+	return card
+
+
+def measure(func, count):
+	tracemalloc.start()
+	start = tracemalloc.take_snapshot()
+	cards = [func(IDS[i % len(IDS)]) for i in range(count)]
+	size = sum(stat.size_diff for stat in tracemalloc.take_snapshot().compare_to(start, "filename"))
+	tracemalloc.stop()
+	assert len(cards) == count
+	return size / count
+
+
+def main():
+	number = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+	for id in IDS:
+		Card(id)
+
+	print("%-24s %12s %12s" % ("", "cards/s", "bytes/card"))
+	for name, func in (("unshared", unshared), ("prototype", Card)):
+		elapsed = timeit.timeit(lambda: [func(id) for id in IDS], number=number // len(IDS))
+		print("%-24s %12.1f %12.1f" % (name, number / elapsed, measure(func, number)))
+
+
+if __name__ == "__main__":
+	main()
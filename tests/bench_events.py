@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark of event trigger dispatch: matching the arguments of a
+broadcast against common triggers through selector evaluation versus the
+compiled matchers of Action.matches().
+"""
+import sys; sys.path.append("..")
+import timeit
+from utils import *
+from fireplace.actions import Damage, EventListener, Play, Summon
+from fireplace.dsl import CONTROLLER, MINION, MURLOC, SELF
+
+
+def evaluate(trigger, source, args):
+	# Selector evaluation of each argument, as matched before compilation
+	for arg, match in zip(args, trigger._args):
+		if match is None:
+			continue
+		if arg is None:
+			return False
+		res = match.eval([arg], source)
+		if not res or res[0] is not arg:
+			return False
+	return True
+
+
+def main():
+	number = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+	game = prepare_game()
+	wisp = game.player1.give(WISP)
+	wisp.play()
+	other = game.player1.give(WISP)
+	other.play()
+	player = game.player1
+
+	cases = (
+		("Damage(MINION, None, SELF)", Damage(MINION, None, SELF), (other, 1, other)),
+		("Play(CONTROLLER, MINION)", Play(CONTROLLER, MINION), (player, other, None)),
+		("Summon(CONTROLLER, MURLOC)", Summon(CONTROLLER, MURLOC), (player, other)),
+	)
+	print("%-32s %12s %12s %8s" % ("trigger", "evaluated", "compiled", "speedup"))
+	for name, trigger, args in cases:
+		assert trigger.matches(wisp, args) == evaluate(trigger, wisp, args)
+		evaluated = timeit.timeit(lambda: evaluate(trigger, wisp, args), number=number)
+		compiled = timeit.timeit(lambda: trigger.matches(wisp, args), number=number)
+		print("%-32s %10.2fus %10.2fus %7.1fx" % (
+			name, evaluated * 1e6 / number, compiled * 1e6 / number, evaluated / compiled
+		))
+
+	# A full broadcast to a board of Murloc Tidecallers, not triggering them
+	for i in range(5):
+		player.summon("EX1_509")
+	action = Summon(player, WISP)
+	elapsed = timeit.timeit(lambda: action.broadcast(player, EventListener.ON, player, other), number=number // 10)
+	print("%-32s %10.2fus" % ("Summon broadcast", elapsed * 1e6 / (number // 10)))
+
+
+if __name__ == "__main__":
+	main()
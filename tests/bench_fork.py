@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+"""
+Benchmark of Game.fork() on mid-game boards, compared to copy.deepcopy(),
+and of searching one move ahead by forking or by rolling back the game.
+"""
+import sys; sys.path.append("..")
+import copy
+import logging
+import timeit
+from fireplace.cards.heroes import *
+from fireplace.exceptions import GameOver
+from fireplace.game import Game
+from fireplace.player import Player
+from fireplace.utils import random_draft
+
+
+def prepare_midgame(seed, turns=10):
+	"""
+	Play random moves from both players for \a turns turns
+	"""
+	player1 = Player("Player1")
+	player2 = Player("Player2")
+	game = Game(players=(player1, player2), seed=seed)
+	player1.prepare_deck(random_draft(MAGE, rng=game.random), MAGE)
+	player2.prepare_deck(random_draft(WARRIOR, rng=game.random), WARRIOR)
+	game.start()
+	for player in game.players:
+		player.choice.choose()
+
+	while game.turn < turns:
+		player = game.current_player
+		for card in player.hand[:]:
+			if card.is_playable() and game.random.random() < 0.7:
+				if card.choose_cards:
+					card = game.random.choice(card.choose_cards)
+				target = None
+				if card.has_target():
+					target = game.random.choice(card.targets)
+				card.play(target=target)
+				if player.choice:
+					player.choice.choose(game.random.choice(player.choice.cards))
+		for character in player.characters[:]:
+			if character.can_attack() and game.random.random() < 0.5:
+				character.attack(game.random.choice(character.targets))
+		game.end_turn()
+	return game
+
+
+def main():
+	number = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+	logging.getLogger("fireplace").setLevel(logging.WARNING)
+
+	games = []
+	seed = 0
+	while len(games) < 5:
+		try:
+			games.append(prepare_midgame(seed))
+		except GameOver:
+			pass
+		seed += 1
+
+	print("%-6s %9s %12s %12s %12s %12s" % (
+		"seed", "entities", "fork/s", "deepcopy/s", "fork+turn/s", "undo+turn/s"
+	))
+	for game in games:
+		entities = len(game.all_entities)
+		fork = timeit.timeit(game.fork, number=number)
+		deepcopy = timeit.timeit(lambda: copy.deepcopy(game), number=max(1, number // 20))
+		forked_turn = timeit.timeit(lambda: game.fork().end_turn(), number=number)
+		checkpoint = game.checkpoint()
+
+		def undone_turn():
+			game.end_turn()
+			game.rollback(checkpoint)
+
+		undone_turn = timeit.timeit(undone_turn, number=number)
+		game.stop_journal()
+		print("%-6i %9i %12.1f %12.1f %12.1f %12.1f" % (
+			game.seed, entities, number / fork, max(1, number // 20) / deepcopy,
+			number / forked_turn, number / undone_turn
+		))
+
+
+if __name__ == "__main__":
+	main()
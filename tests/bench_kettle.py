@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""
+Benchmark of the per-option state refresh of KettleManager on a full
+board: reading every tag of every entity (refresh_full_state) versus
+sending the tracked changes (refresh_changes).
+"""
+import sys; sys.path.append(".."); sys.path.append("../kettle")
+import logging
+import timeit
+from fireplace import cards
+from fireplace.cards.heroes import MAGE, WARRIOR
+from fireplace.game import BaseGame
+from fireplace.player import Player
+from fireplace.utils import random_draft
+from kettle import KettleManager
+
+
+RAID_LEADER = "CS2_122"
+CHILLWIND_YETI = "CS2_182"
+
+
+def prepare_board():
+	players = (Player("Player1"), Player("Player2"))
+	game = BaseGame(players=players, seed=0)
+	players[0].prepare_deck(random_draft(MAGE, rng=game.random), MAGE)
+	players[1].prepare_deck(random_draft(WARRIOR, rng=game.random), WARRIOR)
+	manager = KettleManager(game)
+	game.manager.register(manager)
+	game.current_player = players[0]
+	game.start()
+	for player in players:
+		player.choice = None
+		for i in range(6):
+			player.summon(CHILLWIND_YETI)
+		player.summon(RAID_LEADER)
+		for i in range(5):
+			player.give(CHILLWIND_YETI)
+	manager.refresh_full_state()
+	manager.queued_data = []
+	return game, manager
+
+
+def main():
+	number = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+	logging.getLogger("kettle").setLevel(logging.WARNING)
+	cards.db.initialize()
+	game, manager = prepare_board()
+	minions = game.board
+
+	def option(refresh):
+		# A small change, as made by most options (eg. a minion attacks)
+		def func():
+			minion = minions[option.i % len(minions)]
+			minion.num_attacks = 1 - minion.num_attacks
+			option.i += 1
+			refresh()
+			manager.queued_data = []
+		return func
+	option.i = 0
+
+	print("%d entities, %d on the board" % (len(manager.game_state), len(minions)))
+	for name in ("refresh_full_state", "refresh_changes"):
+		elapsed = timeit.timeit(option(getattr(manager, name)), number=number)
+		print("%-20s %10.1f us/option" % (name, elapsed / number * 1e6))
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+"""
+Benchmark of move enumeration on a full board: the ad-hoc enumeration
+(is_playable, targets, is_usable, can_attack) versus Player.legal_actions(),
+recomputed after a state change and cached.
+"""
+import sys; sys.path.append("..")
+import timeit
+from utils import *
+
+
+RAID_LEADER = "CS2_122"
+FROSTBOLT = "CS2_024"
+
+
+def prepare_board():
+	game = prepare_empty_game()
+	for player in game.players:
+		for id in (RAID_LEADER, KOBOLD_GEOMANCER, WISP, WISP, WISP):
+			player.give(id).play()
+		for id in (MOONFIRE, FROSTBOLT, WISP):
+			player.give(id)
+		game.end_turn()
+	game.end_turn()
+	return game
+
+
+def enumerate_moves(player):
+	ret = []
+	for card in player.hand:
+		if card.is_playable():
+			if card.has_target():
+				ret += [(card, target) for target in card.targets]
+			else:
+				ret.append((card, None))
+	power = player.hero.power
+	if power.is_usable():
+		if power.has_target():
+			ret += [(power, target) for target in power.targets]
+		else:
+			ret.append((power, None))
+	for character in player.characters:
+		if character.can_attack():
+			ret += [(character, target) for target in character.targets]
+	return ret
+
+
+def main():
+	number = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+	game = prepare_board()
+	player = game.current_player
+
+	def adhoc():
+		game.invalidate_stats()
+		enumerate_moves(player)
+
+	def uncached():
+		game.invalidate_stats()
+		player.legal_actions()
+
+	print("%d moves" % (len(player.legal_actions())))
+	print("%-24s %12s" % ("", "calls/s"))
+	print("%-24s %12.1f" % ("ad-hoc", number / timeit.timeit(adhoc, number=number)))
+	print("%-24s %12.1f" % ("legal_actions", number / timeit.timeit(uncached, number=number)))
+	print("%-24s %12.1f" % ("legal_actions (cached)", number / timeit.timeit(player.legal_actions, number=number)))
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+"""
+Benchmark of simulated games per second with formatted logging (verbose),
+without logging (fast mode) and with a structured trace sink.
+"""
+import sys; sys.path.append("..")
+import io
+import logging
+import time
+from fireplace import cards
+from fireplace.logging import RingBufferSink, log
+from fireplace.sim import play_game
+
+
+def games_per_sec(seeds, trace=None):
+	start = time.perf_counter()
+	for seed in seeds:
+		play_game(seed, trace=trace() if trace else None)
+	return len(seeds) / (time.perf_counter() - start)
+
+
+def main():
+	number = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+	cards.db.initialize()
+	seeds = range(number)
+
+	# Formatted messages go to a buffer rather than to the terminal
+	handler = logging.StreamHandler(io.StringIO())
+	log.addHandler(handler)
+	log.setLevel(logging.DEBUG)
+	verbose = games_per_sec(seeds)
+	log.setLevel(logging.WARNING)
+	log.removeHandler(handler)
+	fast = games_per_sec(seeds)
+	traced = games_per_sec(seeds, trace=RingBufferSink)
+
+	print("%-12s %10s %8s" % ("mode", "games/s", "speedup"))
+	for name, value in (("verbose", verbose), ("fast", fast), ("trace", traced)):
+		print("%-12s %10.2f %7.2fx" % (name, value, value / verbose))
+
+
+if __name__ == "__main__":
+	main()
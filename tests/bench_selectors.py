@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark of Selector evaluation: the reference interpreter versus
+the compiled programs, over the selector constants of fireplace.dsl.
+"""
+import sys; sys.path.append("..")
+import timeit
+from utils import *
+from fireplace.dsl import selector as selectors
+
+
+def prepare_board():
+	game = prepare_game()
+	for i in range(4):
+		game.player1.give(WISP).play()
+	game.player1.give("CS2_122").play()
+	game.end_turn()
+	for i in range(3):
+		game.player2.give("CS2_122").play()
+	game.player2.give(MOONFIRE).play(target=game.player2.field[0])
+	return game
+
+
+def main():
+	number = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+	game = prepare_board()
+	source = game.player1.field[0]
+	total_interpreted = total_compiled = 0.0
+
+	print("%-32s %12s %12s %8s" % ("selector", "interpreted", "compiled", "speedup"))
+	for name, selector in sorted(vars(selectors).items()):
+		if not isinstance(selector, selectors.Selector) or not selector.program:
+			continue
+		try:
+			selector.interpret(game, source)
+		except Exception:
+			# Needs a different source (eg. OWNER)
+			continue
+		func = selector.compile()
+		interpreted = timeit.timeit(lambda: selector.interpret(game, source), number=number)
+		compiled = timeit.timeit(lambda: func(game, source), number=number)
+		total_interpreted += interpreted
+		total_compiled += compiled
+		print("%-32s %10.2fus %10.2fus %7.1fx" % (
+			name, interpreted * 1e6 / number, compiled * 1e6 / number, interpreted / compiled
+		))
+
+	print("%-32s %10.2fus %10.2fus %7.1fx" % (
+		"TOTAL", total_interpreted * 1e6 / number, total_compiled * 1e6 / number,
+		total_interpreted / total_compiled
+	))
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""
+Benchmark of stat reads (atk, health, cost, spellpower...) on buff-heavy
+boards, with and without the memoized stats of unchanged entities.
+"""
+import sys; sys.path.append("..")
+import timeit
+from utils import *
+
+
+DIRE_WOLF_ALPHA = "EX1_162"
+RAID_LEADER = "CS2_122"
+STORMWIND_CHAMPION = "CS2_222"
+
+
+def prepare_board():
+	game = prepare_empty_game()
+	for i in range(2):
+		player = game.current_player
+		for id in (RAID_LEADER, DIRE_WOLF_ALPHA, STORMWIND_CHAMPION, DIRE_WOLF_ALPHA, KOBOLD_GEOMANCER, WISP, WISP):
+			player.used_mana = 0
+			player.give(id).play()
+		for i in range(3):
+			player.give(MOONFIRE)
+		game.end_turn()
+	return game
+
+
+def read_stats(game):
+	for player in game.players:
+		player.spellpower
+		for card in player.hand:
+			card.cost
+		for character in player.characters:
+			character.atk
+			character.health
+			character.windfury
+		for minion in player.field:
+			minion.taunt
+			minion.cant_be_targeted_by_abilities
+
+
+def main():
+	number = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+	game = prepare_board()
+
+	def uncached():
+		game.invalidate_stats()
+		read_stats(game)
+
+	def targets():
+		for card in game.current_player.hand:
+			card.targets
+
+	cached = timeit.timeit(lambda: read_stats(game), number=number)
+	fresh = timeit.timeit(uncached, number=number)
+	print("%-24s %12s" % ("", "reads/s"))
+	print("%-24s %12.1f" % ("uncached", number / fresh))
+	print("%-24s %12.1f" % ("cached", number / cached))
+	print("%-24s %12.1f" % ("hand targets", number / timeit.timeit(targets, number=number)))
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+"""
+Benchmark of target enumeration over the collectible card pool: checking
+the PlayReq requirements of each card against every character, versus the
+targeting compiled for each card (see fireplace.targeting).
+"""
+import sys; sys.path.append("..")
+import timeit
+from hearthstone.enums import CardType, PlayReq, Rarity
+from utils import *
+from fireplace import cards
+from fireplace.targeting import TARGETING_PREREQUISITES
+
+
+RAID_LEADER = "CS2_122"
+CHILLWIND_YETI = "CS2_182"
+WORGEN_INFILTRATOR = "EX1_010"
+SENJIN_SHIELDMASTA = "CS2_179"
+
+
+def is_valid_target(self, target):
+	# The requirement checks of each call, as before their compilation
+	if target is self:
+		return False
+	if target.type == CardType.MINION:
+		if target.dead:
+			return False
+		if target.stealthed and self.controller != target.controller:
+			return False
+		if target.immune and self.controller != target.controller:
+			return False
+		if self.type == CardType.SPELL and target.cant_be_targeted_by_abilities:
+			return False
+		if self.type == CardType.HERO_POWER and target.cant_be_targeted_by_hero_powers:
+			return False
+	if target.cant_be_targeted_by_opponents and self.controller != target.controller:
+		return False
+	requirements = self.requirements
+	for req in TARGETING_PREREQUISITES:
+		if req in requirements:
+			break
+	else:
+		return False
+	for req, param in requirements.items():
+		if req == PlayReq.REQ_MINION_TARGET:
+			if target.type != CardType.MINION:
+				return False
+		elif req == PlayReq.REQ_FRIENDLY_TARGET:
+			if target.controller != self.controller:
+				return False
+		elif req == PlayReq.REQ_ENEMY_TARGET:
+			if target.controller == self.controller:
+				return False
+		elif req == PlayReq.REQ_DAMAGED_TARGET:
+			if not target.damage:
+				return False
+		elif req == PlayReq.REQ_TARGET_MAX_ATTACK:
+			if target.atk > param:
+				return False
+		elif req == PlayReq.REQ_TARGET_WITH_RACE:
+			if target.type != CardType.MINION or target.race != param:
+				return False
+		elif req == PlayReq.REQ_HERO_TARGET:
+			if target.type != CardType.HERO:
+				return False
+		elif req == PlayReq.REQ_TARGET_MIN_ATTACK:
+			if target.atk < param:
+				return False
+		elif req == PlayReq.REQ_MUST_TARGET_TAUNTER:
+			if not target.taunt:
+				return False
+		elif req == PlayReq.REQ_UNDAMAGED_TARGET:
+			if target.damage:
+				return False
+		elif req == PlayReq.REQ_LEGENDARY_TARGET:
+			if target.rarity != Rarity.LEGENDARY:
+				return False
+		elif req == PlayReq.REQ_TARGET_WITH_BATTLECRY:
+			if not target.has_battlecry:
+				return False
+		elif req == PlayReq.REQ_TARGET_WITH_DEATHRATTLE:
+			if not target.has_deathrattle:
+				return False
+	return True
+
+
+def prepare_board():
+	game = prepare_empty_game()
+	for player in game.players:
+		for id in (RAID_LEADER, CHILLWIND_YETI, WORGEN_INFILTRATOR, SENJIN_SHIELDMASTA, WISP):
+			player.summon(id)
+	game.player1.give(MOONFIRE).play(target=game.player2.field[1])
+	return game
+
+
+def main():
+	number = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+	game = prepare_board()
+	pool = [game.player1.card(id) for id in cards.filter(collectible=True)]
+	characters = game.characters
+
+	def evaluated():
+		return [[target for target in characters if is_valid_target(card, target)] for card in pool]
+
+	def compiled():
+		return [card.targets for card in pool]
+
+	assert evaluated() == compiled()
+	print("%-24s %12i" % ("cards", len(pool)))
+	print("%-24s %12i" % ("targeting cards", sum(1 for card in pool if card.targeting.can_target)))
+	for name, func in (("evaluated", evaluated), ("compiled", compiled)):
+		elapsed = timeit.timeit(func, number=number)
+		print("%-24s %10.2fms" % (name, elapsed * 1000 / number))
+
+
+if __name__ == "__main__":
+	main()
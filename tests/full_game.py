@@ -4,6 +4,7 @@ import random
 from fireplace.cards.heroes import *
 from fireplace.exceptions import GameOver
 from fireplace.game import Game
+from fireplace.logging import get_logger
 from fireplace.player import Player
 from fireplace.utils import random_draft
 
@@ -71,6 +72,7 @@ def test_full_game():
 
 
 def main():
+	get_logger("fireplace")
 	if len(sys.argv) > 1:
 		numgames = sys.argv[1]
 		if not numgames.isdigit():
@@ -1,6 +1,8 @@
-from hearthstone.enums import CardType, GameTag, Rarity
+import os
+from hearthstone.enums import CardClass, CardType, GameTag, Race, Rarity
 
 import utils
+from fireplace.cards import CardDB
 
 
 CARDS = utils.fireplace.cards.db
@@ -37,3 +39,53 @@ def test_play_scripts():
 			assert card.type == CardType.HERO_POWER
 		elif card.scripts.play:
 			assert card.type not in (CardType.HERO, CardType.HERO_POWER, CardType.ENCHANTMENT)
+
+
+def test_cache(tmpdir):
+	db = CardDB(CARDS.filename, cache_dir=str(tmpdir))
+	db.initialize()
+	assert os.path.exists(os.path.join(str(tmpdir), "carddb.pickle"))
+
+	cached = CardDB(CARDS.filename, cache_dir=str(tmpdir))
+	cached.initialize()
+	assert sorted(cached) == sorted(db)
+	for id, card in db.items():
+		assert cached[id].tags == card.tags
+		assert cached[id].xml.attrib == card.xml.attrib
+		assert cached[id].requirements == card.requirements
+		assert cached[id].entourage == card.entourage
+		assert cached[id].scripts.__bases__ == card.scripts.__bases__
+
+
+def test_filter():
+	def scan(**kwargs):
+		kwargs.setdefault("type", [CardType.SPELL, CardType.WEAPON, CardType.MINION])
+		ret = []
+		for card in CARDS.values():
+			for attr, value in kwargs.items():
+				if value is None:
+					continue
+				if isinstance(value, list):
+					if getattr(card, attr) not in value:
+						break
+				elif getattr(card, attr) != value:
+					break
+			else:
+				ret.append(card.id)
+		return ret
+
+	queries = [
+		{},
+		{"collectible": True},
+		{"collectible": True, "type": CardType.MINION, "race": Race.BEAST},
+		{"collectible": True, "type": CardType.MINION, "cost": 3},
+		{"collectible": True, "type": CardType.MINION, "rarity": Rarity.LEGENDARY},
+		{"card_class": CardClass.MAGE, "type": CardType.SPELL},
+		{"card_class": CardClass.MAGE, "collectible": True, "cost": [1, 2]},
+		{"spare_part": True},
+		{"type": CardType.HERO, "collectible": True, "race": None},
+		{"type": CardType.MINION, "cost": 1, "atk": 1, "health": 1},
+	]
+	for query in queries:
+		assert CARDS.filter(**query) == scan(**query)
+		assert CARDS.filter(**query) is CARDS.filter(**query)
@@ -35,3 +35,81 @@ def test_random_card_picker():
 		assert card.type is not CardType.HERO
 		assert card.type is not CardType.ENCHANTMENT
 		assert card.type is not CardType.HERO_POWER
+
+
+def _selectors():
+	from fireplace.dsl import selector
+	for name, value in vars(selector).items():
+		if isinstance(value, Selector) and value.program:
+			yield name, value
+
+
+def test_compiled_selectors():
+	game = prepare_game()
+	for i in range(3):
+		game.player1.give(WISP).play()
+	game.end_turn()
+	for i in range(2):
+		game.player2.give("CS2_122").play()
+	game.player2.give(MOONFIRE).play(target=game.player2.field[0])
+	source = game.player1.field[0]
+
+	for name, selector in _selectors():
+		if any(isinstance(op, (RandomSelector.SelectRandom, MinMaxSelector.SelectFunc)) for op in selector.program):
+			continue
+		try:
+			expected = selector.interpret(game, source)
+		except Exception:
+			# Not meaningful for this source (eg. OWNER)
+			continue
+		compiled = selector.compile()
+		assert compiled(game, source) == expected, name
+		hand = game.player1.hand
+		assert compiled(hand, source) == selector.interpret(hand, source), name
+
+
+def test_selector_matchers():
+	game = prepare_game()
+	for i in range(3):
+		game.player1.give(WISP).play()
+	game.end_turn()
+	game.player2.give("CS2_122").play()
+	source = game.player1.field[0]
+	entities = list(game) + list(game.player1.hand)
+
+	for name, selector in _selectors():
+		if any(isinstance(op, RandomSelector.SelectRandom) for op in selector.program):
+			continue
+		match = selector.matcher()
+		for entity in entities:
+			try:
+				res = selector.eval([entity], source)
+			except Exception:
+				continue
+			assert match(entity, source) == (bool(res) and res[0] is entity), (name, entity)
+
+
+def test_event_matchers():
+	from fireplace.actions import Damage, Play
+
+	game = prepare_game()
+	wisp = game.player1.give(WISP)
+	wisp.play()
+	other = game.player1.give(WISP)
+	other.play()
+	spell = game.player1.give(MOONFIRE)
+
+	trigger = Damage(MINION, None, SELF)
+	assert trigger.matches(wisp, (wisp, 1, wisp))
+	assert trigger.matches(wisp, (other, 1, wisp))
+	assert not trigger.matches(wisp, (wisp, 1, other))
+	assert not trigger.matches(wisp, (game.player1.hero, 1, wisp))
+	assert not trigger.matches(wisp, (None, 1, wisp))
+
+	trigger = Play(CONTROLLER, MINION)
+	assert trigger.matches(wisp, (game.player1, other, None))
+	assert not trigger.matches(wisp, (game.player2, other, None))
+	assert not trigger.matches(wisp, (game.player1, spell, None))
+	# Arguments missing from the broadcast are not matched
+	assert trigger.matches(wisp, (game.player1, ))
+	assert Play(None).matches(wisp, (game.player2, spell, None))
@@ -0,0 +1,69 @@
+import pytest
+from utils import *
+from fireplace import legal
+
+
+np = pytest.importorskip("numpy")
+encoder = pytest.importorskip("fireplace.encoder")
+
+
+def test_encode_game():
+	game = prepare_empty_game(WARRIOR, WARRIOR)
+	player = game.player1
+	wisp = player.give(WISP)
+	moonfire = player.give(MOONFIRE)
+	wisp.play()
+	game.player2.summon(WISP)
+
+	state = encoder.StateEncoder().encode_game(game)
+	vocabulary = encoder.card_vocabulary()
+	assert state["board"].shape == (1, 2, encoder.MAX_MINIONS, len(encoder.MINION_TAGS))
+	assert list(state["board_ids"][0, :, 0]) == [vocabulary[WISP]] * 2
+	assert not state["board_ids"][0, :, 1:].any()
+	assert list(state["hand_ids"][0, :2]) == [vocabulary[MOONFIRE], 0]
+	atk = encoder.MINION_TAGS.index(GameTag.ATK)
+	assert state["board"][0, 0, 0, atk] == 1
+	health = encoder.HERO_TAGS.index(GameTag.HEALTH)
+	assert list(state["hero"][0, :, health]) == [30, 30]
+	assert not state["weapon"].any()
+
+	mask = state["mask"][0]
+	actions = player.legal_actions()
+	assert mask.sum() == len(actions)
+	for action in actions:
+		index = encoder.action_index(action, player)
+		assert mask[index]
+		assert encoder.find_action(player, index) == action
+	# Moonfire the enemy Wisp
+	index = encoder.action_index((legal.PLAY, moonfire, game.player2.field[0], None), player)
+	assert index == encoder.PLAY_OFFSET + 3 + encoder.MAX_MINIONS
+	assert mask[index]
+
+	# Seen by the opponent, who has no legal action
+	state = encoder.StateEncoder().encode_game(game, game.player2)
+	assert not state["mask"].any()
+	assert state["board_ids"][0, 0, 0] == vocabulary[WISP]
+
+
+def test_encode_batch():
+	games = []
+	for i in range(3):
+		game = prepare_game()
+		for j in range(i):
+			game.end_turn()
+		games.append(game)
+
+	batch = encoder.StateEncoder(batch_size=4)
+	single = encoder.StateEncoder()
+	state = batch.encode(games)
+	assert state["player"].shape[0] == 3
+	for i, game in enumerate(games):
+		expected = single.encode_game(game)
+		for name, array in state.items():
+			assert (array[i] == expected[name][0]).all(), name
+
+	# Arrays are reused and cleared between batches
+	state = batch.encode(games[:1])
+	assert (state["mask"][0] == single.encode_game(games[0])["mask"][0]).all()
+	with pytest.raises(ValueError):
+		batch.encode(games * 2)
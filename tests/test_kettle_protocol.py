@@ -0,0 +1,253 @@
+import sys; sys.path.append("../kettle")
+import asyncio
+import json
+import struct
+import pytest
+from protocol import BinaryDecoder, BinaryEncoder, FrameBuffer
+
+
+class FakeEntity:
+	def __init__(self, entity_id):
+		self.entity_id = entity_id
+
+	def __int__(self):
+		return self.entity_id
+
+
+def _default(o):
+	return int(o)
+
+
+def assert_round_trip(*packets):
+	"""
+	Encode \a packets in order over one connection and check that each
+	decodes to the same payloads as its JSON encoding
+	"""
+	encoder = BinaryEncoder(_default)
+	decoder = BinaryDecoder()
+	serializer = json.JSONEncoder(default=_default)
+	sizes = []
+	for payloads in packets:
+		data = encoder.encode(payloads)
+		expected = json.loads(serializer.encode(payloads))
+		assert decoder.decode(data) == expected
+		sizes.append((len(data), len(serializer.encode(payloads))))
+	return sizes
+
+
+def _tag_change(entity, tag, value):
+	return {"Type": "TagChange", "TagChange": {"EntityID": entity, "Tag": tag, "Value": value}}
+
+
+def test_tag_changes():
+	wisp = FakeEntity(5)
+	assert_round_trip([
+		_tag_change(4, 44, 3),
+		_tag_change(wisp, 49, 1),
+		_tag_change(5, 263, None),
+		_tag_change(5, 45, -1),
+	])
+
+
+def test_entities():
+	game, player, wisp = FakeEntity(1), FakeEntity(2), FakeEntity(5)
+	assert_round_trip([
+		{"Type": "GameEntity", "GameEntity": {"EntityID": game, "Tags": {204: 1, 198: 4, 53: game}}},
+		{"Type": "Player", "Player": {"EntityID": 2, "Tags": {50: 1, 53: player}}},
+		{"Type": "FullEntity", "FullEntity": {"CardID": "CS2_231", "EntityID": 5, "Tags": {47: 1, 53: wisp}}},
+		_tag_change(5, 49, 1),
+		{"Type": "FullEntity", "FullEntity": {"CardID": "CS2_231", "EntityID": 6, "Tags": {}}},
+		{"Type": "FullEntity", "FullEntity": {"CardID": "CS2_122", "EntityID": 7, "Tags": {45: 2}}},
+	])
+
+
+def test_options():
+	assert_round_trip([
+		{"Type": "Options", "Options": [
+			{"Type": 2},
+			{"Type": 3, "MainOption": {"ID": FakeEntity(5), "Targets": []}},
+			{"Type": 3, "MainOption": {"ID": 6, "Targets": [FakeEntity(4), 7, 8]}},
+		]},
+	])
+
+
+def test_string_interning():
+	card = {"Type": "FullEntity", "FullEntity": {"CardID": "EX1_001", "EntityID": 8, "Tags": {45: 2}}}
+	(first, _), (second, _) = assert_round_trip([card], [card])
+	# The card id is only sent once per connection
+	assert second == first - len("EX1_001") - 3
+
+
+def test_json_fallback():
+	assert_round_trip([
+		{"Type": "GameOver", "GameOver": {"Winner": 2}},
+		_tag_change(5, 49, 1 << 40),
+		{"Type": "FullEntity", "FullEntity": {"CardID": "CS2_231", "EntityID": 5, "Tags": {47: "x"}}},
+		{"Type": "FullEntity", "FullEntity": {"CardID": None, "EntityID": 5, "Tags": {}}},
+		{"Type": "Options", "Options": [{"Type": 3, "MainOption": {"ID": 5, "Targets": 2}}]},
+		_tag_change(5, 49, 2),
+		{"Type": "FullEntity", "FullEntity": {"CardID": "CS2_231", "EntityID": 6, "Tags": {}}},
+	])
+
+
+def test_burst_size():
+	payloads = [_tag_change(i, 49, i % 3) for i in range(4, 200)]
+	(binary, text), = assert_round_trip(payloads)
+	assert binary * 5 < text
+
+
+def _frame(packet):
+	data = json.dumps(packet).encode("utf-8")
+	return struct.pack("<i", len(data)) + data
+
+
+def _read_frames(frames, chunks):
+	ret = []
+	for chunk in chunks:
+		frames.feed(chunk)
+		ret += [json.loads(str(frame, "utf-8")) for frame in frames.pop()]
+	return ret
+
+
+def test_frame_buffer_fragmented():
+	packets = [{"Type": "SendOption", "SendOption": {"Index": i, "Target": 0}} for i in range(5)]
+	stream = b"".join(_frame(packet) for packet in packets)
+
+	# One byte at a time
+	frames = FrameBuffer(size=8)
+	assert _read_frames(frames, [stream[i:i + 1] for i in range(len(stream))]) == packets
+	assert not len(frames)
+
+	# Split across the length prefix and the body
+	for cut in range(1, len(stream)):
+		frames = FrameBuffer(size=16)
+		assert _read_frames(frames, [stream[:cut], stream[cut:]]) == packets
+
+
+def test_frame_buffer_coalesced():
+	packets = [[{"Type": "CreateGame", "CreateGame": {"Players": []}}]]
+	packets += [{"Type": "SendOption", "SendOption": {"Index": i, "Target": i}} for i in range(50)]
+	stream = b"".join(_frame(packet) for packet in packets)
+
+	frames = FrameBuffer(size=4)
+	frames.feed(stream)
+	assert [json.loads(str(frame, "utf-8")) for frame in frames.pop()] == packets
+	assert not frames.pop()
+	assert frames.start == frames.end == 0
+
+	# Uneven chunks: several frames and a partial one per read
+	frames = FrameBuffer(size=32)
+	chunks = [stream[i:i + 97] for i in range(0, len(stream), 97)]
+	assert _read_frames(frames, chunks) == packets
+	# The buffer is reused once read, and only grew to fit the data
+	assert len(frames.buffer) < len(stream)
+
+
+def test_frame_buffer_large_frame():
+	packet = {"Type": "SendOption", "SendOption": {"Index": 0, "Data": "x" * 100000}}
+	stream = _frame(packet) + _frame(packet)
+	frames = FrameBuffer(size=64)
+	chunks = [stream[i:i + 4096] for i in range(0, len(stream), 4096)]
+	assert _read_frames(frames, chunks) == [packet, packet]
+
+
+def test_frame_buffer_empty_frame():
+	frames = FrameBuffer()
+	frames.feed(struct.pack("<i", 0) + struct.pack("<i", 2) + b"{}")
+	assert [bytes(frame) for frame in frames.pop()] == [b"", b"{}"]
+
+
+def test_frame_buffer_invalid_size():
+	frames = FrameBuffer(max_frame_size=1000)
+	frames.feed(struct.pack("<i", 1001))
+	with pytest.raises(ValueError):
+		frames.pop()
+	frames = FrameBuffer()
+	frames.feed(struct.pack("<i", -1))
+	with pytest.raises(ValueError):
+		frames.pop()
+
+
+def test_kettle_game():
+	from utils import MAGE, MOONFIRE, WARRIOR, WISP
+	from kettle import Kettle
+
+	kettle = Kettle()
+	manager = kettle.create_game({"Players": [
+		{"Name": "Player1", "Hero": MAGE, "Cards": [WISP] * 30},
+		{"Name": "Player2", "Hero": WARRIOR, "Cards": [MOONFIRE] * 30},
+	]})
+	game = manager.game
+	encode_json = kettle.get_encoder("json")
+	encode_binary = kettle.get_encoder("binary")
+	decoder = BinaryDecoder()
+
+	def check():
+		manager.refresh_changes()
+		manager.refresh_options()
+		payloads = manager.queued_data
+		manager.queued_data = []
+		expected = json.loads(encode_json(payloads).decode("utf-8"))
+		assert decoder.decode(encode_binary(payloads)) == expected
+
+	check()
+	wisp = game.player1.give(WISP)
+	wisp.play()
+	check()
+	game.end_turn()
+	check()
+	game.player2.give(MOONFIRE).play(target=wisp)
+	check()
+	game.end_turn()
+	check()
+
+
+def test_kettle_pipelined_options():
+	from utils import MAGE, WARRIOR, WISP
+	from kettle import Kettle
+
+	kettle = Kettle()
+	create = [{"Type": "CreateGame", "CreateGame": {"Players": [
+		{"Name": "Player1", "Hero": MAGE, "Cards": [WISP] * 30},
+		{"Name": "Player2", "Hero": WARRIOR, "Cards": [WISP] * 30},
+	]}}]
+	end_turn = {"Type": "SendOption", "SendOption": {"Index": 0, "Target": 0}}
+	stream = _frame(create) + _frame(end_turn) * 3
+
+	class Writer:
+		def __init__(self):
+			self.data = bytearray()
+
+		def write(self, data):
+			self.data += data
+
+		async def drain(self):
+			pass
+
+		def close(self):
+			pass
+
+		def get_extra_info(self, name):
+			return None
+
+	async def play():
+		reader = asyncio.StreamReader()
+		# Fragmented and coalesced: the end turns arrive with the game
+		for i in range(0, len(stream), 7):
+			reader.feed_data(stream[i:i + 7])
+		reader.feed_eof()
+		writer = Writer()
+		await kettle.handle(reader, writer)
+		return writer.data
+
+	frames = FrameBuffer()
+	frames.feed(asyncio.run(play()))
+	packets = [json.loads(str(frame, "utf-8")) for frame in frames.pop()]
+	# The initial state, then one combined state push for the three options
+	assert len(packets) == 2
+	turns = [
+		change["TagChange"]["Value"] for change in packets[1]
+		if change["Type"] == "TagChange" and change["TagChange"]["Tag"] == 20
+	]
+	assert turns[-1] == 4
+	assert packets[1][-1]["Type"] == "Options"
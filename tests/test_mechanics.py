@@ -63,6 +63,91 @@ def test_auras():
 	assert webspinner.atk == 2
 
 
+def test_aura_buffs_kept():
+	game = prepare_empty_game()
+	wisp = game.player1.give(WISP)
+	wisp.play()
+	raidleader = game.player1.give("CS2_122")
+	raidleader.play()
+	champion = game.player1.give("CS2_222")
+	champion.play()
+	buffs = wisp.buffs[:]
+	assert [buff.id for buff in buffs] == ["CS2_122e", "CS2_222o"]
+	assert wisp.atk == 1 + 1 + 1
+	assert wisp.health == 1 + 1
+
+	game.player1.give(MOONFIRE).play(target=game.player2.hero)
+	game.player1.give(WISP).play()
+	game.refresh_auras()
+	assert len(wisp.buffs) == 2
+	assert all(a is b for a, b in zip(wisp.buffs, buffs))
+	assert wisp.atk == 3
+
+	for i in range(3):
+		game.player1.give(MOONFIRE).play(target=raidleader)
+	assert raidleader.dead
+	assert len(wisp.buffs) == 1
+	assert wisp.buffs[0] is buffs[1]
+	assert wisp.atk == 1 + 1
+	assert buffs[0] not in game.active_aura_buffs
+
+
+def test_cached_stats():
+	game = prepare_empty_game()
+	wisp = game.player1.give(WISP)
+	wisp.play()
+	assert wisp.atk == 1
+	assert wisp.atk == 1
+	raidleader = game.player1.give("CS2_122")
+	raidleader.play()
+	assert wisp.atk == 1 + 1
+	wisp.atk = 3
+	assert wisp.atk == 3 + 1
+	fork = game.fork()
+	raidleader.destroy()
+	assert wisp.atk == 3
+	assert fork.player1.field[0].atk == 3 + 1
+
+	frostbolt = game.player1.give("CS2_024")
+	assert frostbolt.cost == 2
+	game.player1.give(KOBOLD_GEOMANCER).play()
+	assert game.player1.spellpower == 1
+	game.player1.give("EX1_608").play()
+	assert frostbolt.cost == 2 - 1
+	game.player1.field[-1].destroy()
+	assert frostbolt.cost == 2
+
+
+def test_pending_deaths():
+	game = prepare_empty_game()
+	wisp = game.player1.give(WISP)
+	wisp.play()
+	champion = game.player1.give("CS2_222")
+	champion.play()
+	assert wisp.health == 2
+	game.player1.give(MOONFIRE).play(target=wisp)
+	assert wisp.health == 1
+	assert not wisp.dead
+	assert wisp in game.player1.field
+
+	# Killed by the loss of the aura
+	champion.destroy()
+	assert champion.dead
+	game.end_turn()
+	assert wisp.dead
+	assert not game.player1.field
+
+	# Killed by a change to its health from outside any action
+	wisp = game.player2.summon(WISP)
+	other = game.player2.summon(WISP)
+	wisp.max_health = 0
+	assert any(card is wisp for card in game.pending_deaths)
+	assert not any(card is other for card in game.pending_deaths)
+	game.process_deaths()
+	assert wisp.dead
+	assert not other.dead
+
+
 def test_bounce():
 	game = prepare_empty_game()
 	wisp = game.player1.give(WISP)
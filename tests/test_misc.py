@@ -1,4 +1,15 @@
+import io
+import json
+import pytest
 from utils import *
+from copy import deepcopy
+from fireplace import legal
+from fireplace.actions import Damage, EventListener, Hit
+from fireplace.card import Minion
+from fireplace.entity import BaseEntity
+from fireplace.exceptions import GameOver
+from fireplace.logging import FileSink, RingBufferSink
+from fireplace.targeting import is_valid_target
 
 
 def test_cheat_destroy_deck():
@@ -56,3 +67,411 @@ def test_event_queue_summon():
 	assert reaver in game.player2.hand
 	assert buzzard.health == 1
 	assert len(game.player2.field) == 1
+
+
+def test_entity_registry():
+	game = prepare_game()
+	registry = game.registry
+	wisp = game.player1.give(WISP)
+	assert wisp in registry.by_zone(Zone.HAND)
+	assert wisp in registry.by_controller(game.player1)
+	assert wisp not in registry.by_zone(Zone.PLAY)
+	assert wisp not in game.board
+
+	wisp.play()
+	assert wisp not in registry.by_zone(Zone.HAND)
+	assert wisp in registry.by_zone(Zone.PLAY)
+	assert wisp in registry.by_type(CardType.MINION)
+	assert wisp in game.board
+	assert wisp in game.player1.characters
+
+	# Buffs are part of the game's entities
+	buff = game.player1.hero.buff(wisp, "CS2_122e")
+	assert buff in game.entities
+	assert buff in registry.select(frozenset([Zone.PLAY]), frozenset([CardType.ENCHANTMENT]))
+	buff.destroy()
+	assert buff not in game.entities
+
+	game.end_turn()
+	game.player2.give("CS1_113").play(target=wisp)
+	assert wisp not in registry.by_controller(game.player1)
+	assert wisp in registry.by_controller(game.player2)
+	assert wisp in game.player2.characters
+
+	# Views match the entities found by walking the whole game
+	for zone in (Zone.PLAY, Zone.HAND, Zone.DECK, Zone.GRAVEYARD):
+		assert registry.by_zone(zone) == [e for e in game if getattr(e, "zone", None) == zone]
+
+
+def test_listener_index():
+	game = prepare_game()
+	game.player1.discard_hand()
+	registry = game.registry
+	acolyte = game.player1.give("EX1_007")
+	acolyte.play()
+
+	def listeners(action, at=EventListener.ON):
+		return [game.entities[i] for i in registry.listeners("entities", action, at)]
+
+	assert acolyte in listeners(Damage)
+	assert acolyte not in listeners(Hit)
+	assert acolyte not in listeners(Damage, EventListener.AFTER)
+
+	game.player1.give(MOONFIRE).play(target=acolyte)
+	assert len(game.player1.hand) == 1
+
+	game.player1.give(SILENCE).play(target=acolyte)
+	assert acolyte not in listeners(Damage)
+	game.player1.give(MOONFIRE).play(target=acolyte)
+	assert len(game.player1.hand) == 1
+
+
+def _play_random_turns(game, turns):
+	"""
+	Play random moves drawn from the game's own random number generator
+	until \a turns is reached.
+	Returns a trace of the board at the end of each turn.
+	"""
+	trace = []
+	try:
+		while game.turn < turns:
+			player = game.current_player
+			for card in player.hand[:]:
+				if card.is_playable() and game.random.random() < 0.5:
+					if card.choose_cards:
+						card = game.random.choice(card.choose_cards)
+					target = None
+					if card.has_target():
+						target = game.random.choice(card.targets)
+					card.play(target=target)
+					if player.choice:
+						player.choice.choose(game.random.choice(player.choice.cards))
+			for character in player.characters[:]:
+				if character.can_attack():
+					character.attack(game.random.choice(character.targets))
+			trace.append([
+				(p.hero.health, [(m.id, m.atk, m.health) for m in p.field], [c.id for c in p.hand])
+				for p in game.players
+			])
+			game.end_turn()
+	except GameOver:
+		pass
+	return trace
+
+
+def _seeded_game(seed):
+	"""
+	Start a game with random decks and mulligans drawn from the game's
+	own random number generator.
+	"""
+	player1 = Player("Player1")
+	player2 = Player("Player2")
+	game = Game(players=(player1, player2), seed=seed)
+	player1.prepare_deck(random_draft(MAGE, rng=game.random), MAGE)
+	player2.prepare_deck(random_draft(WARRIOR, rng=game.random), WARRIOR)
+	game.start()
+	for player in game.players:
+		player.choice.choose(*game.random.sample(player.choice.cards, 2))
+	return game
+
+
+def _play_seeded_game(seed, turns=12):
+	"""
+	Play a game with random decks and random moves all drawn from the
+	game's own random number generator.
+	"""
+	return _play_random_turns(_seeded_game(seed), turns)
+
+
+def test_seeded_game():
+	game = Game(players=(Player("Player1"), Player("Player2")), seed=1234)
+	assert game.seed == 1234
+	assert Game(players=(Player("Player1"), Player("Player2"))).seed is not None
+
+	for seed in (1, 2, 3):
+		assert _play_seeded_game(seed) == _play_seeded_game(seed)
+
+
+def test_game_fork():
+	game = prepare_game()
+	wisp = game.player1.give(WISP)
+	wisp.play()
+	game.player1.give("CS2_122").play()
+	game.player1.give(LIGHTS_JUSTICE).play()
+	game.end_turn()
+	game.player2.give("EX1_130").play()
+	game.player2.give(MOONFIRE).play(target=game.player1.hero)
+
+	fork = game.fork()
+	assert fork is not game
+	assert fork.seed == game.seed
+	for entity, copy in zip(game, fork):
+		assert copy is not entity
+		assert copy.game is fork
+		if entity.is_card:
+			assert copy.id == entity.id
+			assert copy.data is entity.data
+			assert copy.zone == entity.zone
+			assert copy.controller is fork.players[game.players.index(entity.controller)]
+	for buff in fork.active_aura_buffs:
+		assert buff.source.game is fork
+	fwisp = fork.player1.field[0]
+	assert fwisp.atk == wisp.atk == 2
+	assert len(fork.player2.secrets) == 1
+	assert fork.player1.weapon.id == LIGHTS_JUSTICE
+	assert fork.player1.hero.health == game.player1.hero.health == 29
+
+	# The fork is played independently
+	fork.player2.give(MOONFIRE).play(target=fwisp)
+	assert fwisp.dead
+	assert not wisp.dead
+	assert len(game.player1.field) == 2
+
+	# Both games play out identically from the same state
+	fork = game.fork()
+	assert _play_random_turns(fork, 16) == _play_random_turns(game, 16)
+
+
+def _game_state(game):
+	"""
+	The state of \a game: its random number generator, then the tags,
+	buffs and aura slots of its entities and its zones
+	"""
+	def value(v):
+		if isinstance(v, BaseEntity):
+			return v.entity_id
+		if isinstance(v, list):
+			return len(v)
+		return v
+
+	def tags(entity):
+		return [(tag, value(v)) for tag, v in entity.tags.items()]
+
+	# Entity ids first: reading them numbers the enchantments (see
+	# Enchantment.entity_id), which moves the counter.
+	ret = []
+	for entity in game:
+		ret.append((
+			entity.entity_id, tags(entity),
+			[buff.entity_id for buff in getattr(entity, "buffs", ())],
+			[(slot.source.entity_id, tags(slot)) for slot in getattr(entity, "slots", ())],
+		))
+	for player in game.players:
+		for zone in (player.hand, player.deck, player.field, player.graveyard, player.secrets):
+			ret.append([card.entity_id for card in zone])
+	ret.append(sorted(e.entity_id for e in game.pending_deaths))
+	return [game.random.getstate(), game.manager.counter] + ret
+
+
+def test_game_rollback():
+	for seed in range(1, 7):
+		game = _seeded_game(seed)
+		_play_random_turns(game, 4)
+		if game.state == State.COMPLETE:
+			continue
+		reference = deepcopy(game)
+		checkpoint = game.checkpoint()
+		_play_random_turns(game, 8)
+		inner_reference = deepcopy(game)
+		inner = game.checkpoint()
+		_play_random_turns(game, 14)
+		assert game.fork()._journal is None
+
+		game.rollback(inner)
+		assert _game_state(game) == _game_state(inner_reference)
+		game.rollback(checkpoint)
+		assert _game_state(game) == _game_state(reference)
+		with pytest.raises(ValueError):
+			game.rollback(inner)
+
+		# The game plays on as the reference did, and can be rolled back again
+		expected = _game_state(reference)
+		assert _play_random_turns(game, 10) == _play_random_turns(reference, 10)
+		game.rollback(checkpoint)
+		assert _game_state(game) == expected
+		game.stop_journal()
+		assert game._journal is None
+		assert not [card for card in game if card._journal is not None]
+
+
+def test_game_trace():
+	sink = RingBufferSink()
+	player1 = Player("Player1")
+	player1.prepare_deck([], MAGE)
+	player2 = Player("Player2")
+	player2.prepare_deck([], WARRIOR)
+	game = BaseTestGame(players=(player1, player2), trace=sink)
+	assert game.trace is sink
+	assert not game.verbose
+	game.start()
+	wisp = game.player1.give(WISP)
+	wisp.play()
+	moonfire = game.player1.give(MOONFIRE)
+	sink.records.clear()
+	moonfire.play(target=wisp)
+	assert wisp.dead
+	actions = [record.action for record in sink]
+	assert actions[0] == "Play"
+	assert "Hit" in actions
+	hit = sink.records[actions.index("Hit")]
+	assert hit.targets == (wisp.entity_id, )
+	assert hit.tick <= game.tick
+	assert game.fork().trace is None
+
+	# Traces are written as JSON lines
+	stream = io.StringIO()
+	game.trace = FileSink(stream)
+	game.end_turn()
+	records = [json.loads(line) for line in stream.getvalue().splitlines()]
+	assert records[0]["action"] == "EndTurn"
+	assert records[0]["source"] == game.entity_id
+
+	quiet = BaseTestGame(players=(Player("Player1"), Player("Player2")), verbose=False)
+	assert not quiet.verbose
+	assert quiet.trace is None
+
+
+def test_track_changes():
+	game = prepare_empty_game()
+	wisp = game.player1.give(WISP)
+	wisp.play()
+	assert wisp.pop_changes() is None
+	wisp.track_changes()
+	assert not wisp.pop_changes()
+
+	wisp.frozen = True
+	assert "frozen" in wisp.pop_changes()
+	assert not wisp.pop_changes()
+
+	game.player1.give("CS2_122").play()
+	assert "buffs" in wisp.pop_changes()
+	game.player1.give(MOONFIRE).play(target=wisp)
+	changes = wisp.pop_changes()
+	assert "damage" in changes
+	assert "_zone" in changes
+
+
+def test_legal_actions():
+	game = prepare_empty_game(WARRIOR, WARRIOR)
+	player = game.player1
+	wisp = player.give(WISP)
+	moonfire = player.give(MOONFIRE)
+	actions = player.legal_actions()
+	assert actions is player.legal_actions()
+	assert actions[0] == (legal.END_TURN, player, None, None)
+	assert (legal.PLAY, wisp, None, None) in actions
+	assert (legal.PLAY, moonfire, player.hero, None) in actions
+	assert (legal.PLAY, moonfire, game.player2.hero, None) in actions
+	assert (legal.POWER, player.hero.power, None, None) in actions
+	assert not [action for action in actions if action.kind == legal.ATTACK]
+	assert game.player2.legal_actions() == ()
+
+	actions[actions.index((legal.PLAY, wisp, None, None))].perform()
+	actions = player.legal_actions()
+	assert wisp.zone == Zone.PLAY
+	assert (legal.PLAY, wisp, None, None) not in actions
+	assert (legal.PLAY, moonfire, wisp, None) in actions
+
+	fork = game.fork()
+	fplayer = fork.player1
+	for action in fplayer.legal_actions():
+		assert action.entity.game is fork
+		assert action.target is None or action.target.game is fork
+
+	player.legal_actions()[0].perform()
+	assert game.current_player is game.player2
+	assert player.legal_actions() == ()
+	assert game.player2.legal_actions()[0] == (legal.END_TURN, game.player2, None, None)
+
+
+def test_card_prototypes():
+	game = prepare_empty_game()
+	wisp1 = game.player1.give(WISP)
+	wisp2 = game.player1.give(WISP)
+	assert type(wisp1) is type(wisp2)
+	assert isinstance(wisp1, Minion)
+	assert type(wisp1).__name__ == "Minion"
+	# Card data and tags are shared, only the game state is on the card
+	assert "data" not in wisp1.__dict__
+	assert "_atk" not in wisp1.__dict__
+	assert "requirements" not in wisp1.__dict__
+	assert wisp1.requirements is wisp2.requirements
+	assert wisp1.atk == wisp1.health == 1
+	assert wisp1.tags[GameTag.ATK] == 1
+
+	wisp1.play()
+	game.player1.give(MOONFIRE).play(target=wisp2.controller.hero)
+	wisp1.atk = 3
+	assert wisp1.atk == 3
+	assert wisp2.atk == 1
+	assert wisp1.uuid != wisp2.uuid
+
+	fork = game.fork()
+	assert type(fork.player1.field[0]) is type(wisp1)
+	assert fork.player1.field[0].atk == 3
+
+
+def test_enchantment_entity_ids():
+	game = prepare_empty_game()
+	wisp = game.player1.give(WISP)
+	wisp.play()
+	game.player1.give("CS2_092").play(target=wisp)
+	buff = wisp.buffs[0]
+	assert buff.zone == Zone.PLAY
+	assert wisp.atk == wisp.health == 5
+	# Numbered on first use only
+	assert "entity_id" not in buff.__dict__
+	counter = game.manager.counter
+	assert buff.entity_id == counter + 1
+	assert buff.entity_id == counter + 1
+	assert int(game.player1.give(WISP)) == counter + 2
+
+	# Announced to the observers as they are created
+	observer = EntityObserver()
+	game.manager.register(observer)
+	game.player1.give("CS2_092").play(target=wisp)
+	buff = wisp.buffs[1]
+	assert buff in observer.entities
+	assert buff.__dict__["entity_id"] == game.manager.counter
+
+
+def test_death_chain():
+	game = prepare_empty_game()
+	ghouls = []
+	for health in (1, 1, 2, 3, 4, 5, 6):
+		ghoul = game.player2.summon("FP1_024")
+		ghoul.max_health = health
+		ghouls.append(ghoul)
+	for i in range(7):
+		game.player1.summon(WISP)
+	assert len(game.board) == 14
+
+	# Each deathrattle kills the next Ghoul (the first with the Wisps)
+	game.player1.give(MOONFIRE).play(target=ghouls[0])
+	assert not game.board
+	# Cards compare by id: the order is checked on the entity ids
+	assert [card.entity_id for card in game.player2.graveyard] == [ghoul.entity_id for ghoul in ghouls]
+	assert not game.action_frames
+
+
+def test_targeting():
+	game = prepare_empty_game()
+	wisp = game.player1.summon(WISP)
+	yeti = game.player2.summon("CS2_182")
+	worgen = game.player2.summon("EX1_010")
+	moonfire = game.player1.give(MOONFIRE)
+	execute = game.player1.give("CS2_108")
+	assert moonfire.targeting is game.player1.give(MOONFIRE).targeting
+	assert not game.player1.give(WISP).targeting.can_target
+
+	# The stealthed Worgen can only be targeted by its controller
+	hero1, hero2 = game.player1.hero, game.player2.hero
+	assert set(moonfire.targets) == {hero1, wisp, hero2, yeti}
+	assert execute.targets == []
+	moonfire.play(target=yeti)
+	assert execute.targets == [yeti]
+
+	for card in (execute, game.player1.give(MOONFIRE), game.player2.give(MOONFIRE)):
+		for target in game.characters:
+			assert is_valid_target(card, target) == (target in card.targets)
+	assert worgen in game.player2.give(MOONFIRE).targets
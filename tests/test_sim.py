@@ -0,0 +1,37 @@
+import csv
+import io
+import json
+from utils import *
+from fireplace import sim
+
+
+def test_play_game():
+	result = sim.play_game(1, heroes=(MAGE, WARRIOR))
+	assert result["seed"] == 1
+	assert result["heroes"] == [MAGE, WARRIOR]
+	assert result["turns"] >= len(result["stats"])
+	assert [stats["turn"] for stats in result["stats"]] == list(range(1, len(result["stats"]) + 1))
+	assert result["error"] is None
+	assert result["winner"] in (1, 2, None)
+
+	assert sim.play_game(1, heroes=(MAGE, WARRIOR)) == result
+
+
+def test_simulate():
+	seeds = range(4)
+	stream = io.StringIO()
+	assert sim.simulate(seeds, sim.JSONWriter(stream), processes=1) == 4
+	results = [json.loads(line) for line in stream.getvalue().splitlines()]
+	assert [result["seed"] for result in results] == list(seeds)
+	assert [result["error"] for result in results] == [None] * len(seeds)
+
+	# Games are the same in worker processes
+	pooled = io.StringIO()
+	sim.simulate(seeds, sim.JSONWriter(pooled), processes=2)
+	assert pooled.getvalue() == stream.getvalue()
+
+	stream = io.StringIO()
+	sim.simulate(seeds, sim.CSVWriter(stream), processes=1)
+	rows = list(csv.DictReader(io.StringIO(stream.getvalue())))
+	assert len(rows) == sum(max(1, len(result["stats"])) for result in results)
+	assert rows[0]["seed"] == "0"
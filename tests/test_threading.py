@@ -0,0 +1,72 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from utils import *
+
+
+class OrderedTestGame(BaseGame):
+	"""
+	A test game without any random decision (no coin flip, empty decks)
+	so that every run of the same script ends in the same state.
+	"""
+	def start(self):
+		super().start()
+		self.player1.max_mana = 10
+		self.player2.max_mana = 10
+
+
+def _snapshot(game):
+	ret = []
+	for player in game.players:
+		ret.append((
+			player.hero.health,
+			player.hero.armor,
+			[(minion.id, minion.atk, minion.health) for minion in player.field],
+			[card.id for card in player.hand],
+			[card.id for card in player.graveyard],
+		))
+	return ret
+
+
+def _play_game():
+	"""
+	Play a scripted game heavy on shared selectors, auras, deathrattles and
+	nested triggers, and return a snapshot of the board after each turn.
+	"""
+	game = prepare_empty_game(WARRIOR, PRIEST, game_class=OrderedTestGame)
+	snapshots = []
+	for i in range(3):
+		game.player1.give("CS2_122").play()
+		game.player1.give("EX1_007").play()
+		game.player1.give("NEW1_020").play()
+		game.player1.give("EX1_400").play()
+		game.player1.give("EX1_400").play()
+		snapshots.append(_snapshot(game))
+		game.end_turn()
+
+		game.player2.give("EX1_097").play()
+		game.player2.give("CS1_112").play()
+		snapshots.append(_snapshot(game))
+		game.end_turn()
+	return snapshots
+
+
+def test_concurrent_games():
+	"""
+	Run the same games concurrently in several threads and make sure they
+	all end exactly as the same games run one after the other.
+	"""
+	games = 16
+	expected = [_play_game() for i in range(games)]
+	assert all(result == expected[0] for result in expected)
+
+	interval = sys.getswitchinterval()
+	# Switch threads as often as possible to shake out shared state
+	sys.setswitchinterval(1e-6)
+	try:
+		with ThreadPoolExecutor(max_workers=8) as executor:
+			futures = [executor.submit(_play_game) for i in range(games)]
+			results = [future.result() for future in futures]
+	finally:
+		sys.setswitchinterval(interval)
+
+	assert results == expected
@@ -68,6 +68,30 @@ class BaseTestGame(CoinRules, BaseGame):
 		self.player2.max_mana = 10
 
 
+class EntityObserver:
+	"""
+	Game observer (see Manager.register()) keeping the entities
+	announced to it, as Kettle does
+	"""
+	def __init__(self):
+		self.entities = []
+
+	def new_entity(self, entity):
+		self.entities.append(entity)
+
+	def action(self, type, args):
+		pass
+
+	def action_end(self, type, args):
+		pass
+
+	def start_game(self):
+		pass
+
+	def game_step(self, step, next_step):
+		pass
+
+
 def _select_heroes(hero1=None, hero2=None):
 	if hero1 is None:
 		hero1 = random.choice(_heroes)